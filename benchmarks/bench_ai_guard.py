@@ -0,0 +1,72 @@
+"""Exercise the AI fallback guards against the fake OpenAI server.
+
+Runs three phases: a healthy upstream, a slow upstream (past the deadline)
+and a failing upstream. For each it reports how long the handler took,
+how many calls reached the server and what the circuit breaker did.
+
+Run from the repository root:
+    python -m benchmarks.bench_ai_guard
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import OpenAI
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from utils.ai_handler import AI_CALL_SECONDS, AIResponseHandler
+from utils.circuit_breaker import CircuitBreaker
+
+ROUNDS = 4
+CONCURRENCY = 16
+REQUESTS = ROUNDS * CONCURRENCY
+
+
+def run_phase(name: str, handler: AIResponseHandler, fake: FakeOpenAIServer) -> None:
+    before = fake.requests
+    latencies = []
+
+    def ask(i: int):
+        start = time.perf_counter()
+        answer = handler.get_ai_response(f"question number {i} for {name}")
+        latencies.append(time.perf_counter() - start)
+        return answer
+
+    # Bursts of concurrent questions with a short pause, like a busy channel
+    answers = []
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        for round_number in range(ROUNDS):
+            start = round_number * CONCURRENCY
+            answers.extend(pool.map(ask, range(start, start + CONCURRENCY)))
+            time.sleep(0.5)
+
+    latencies.sort()
+    print(f"{name:<8} | answered {sum(a is not None for a in answers):>3}/{REQUESTS} | "
+          f"upstream calls {fake.requests - before:>3} | "
+          f"p50 {latencies[len(latencies) // 2] * 1000:7.1f} ms | max {latencies[-1] * 1000:7.1f} ms | "
+          f"breaker {handler.circuit_breaker.stats()}")
+
+
+def main() -> None:
+    with FakeOpenAIServer(delay=0.05) as fake:
+        client = OpenAI(api_key="test", base_url=fake.base_url, max_retries=0)
+        breaker = CircuitBreaker(failure_threshold=5, slow_call_seconds=0.5, reset_timeout=60)
+        handler = AIResponseHandler({}, client, max_concurrency=8, timeout=1.0, circuit_breaker=breaker)
+
+        run_phase("healthy", handler, fake)
+
+        fake.delay = 3.0
+        run_phase("slow", handler, fake)
+
+        fake.delay = 0.0
+        fake.error_rate = 1.0
+        breaker.state, breaker.failures = breaker.CLOSED, 0
+        run_phase("failing", handler, fake)
+
+        for outcome in ("ok", "error"):
+            print(f"\nAI call latency histogram, {outcome} (seconds -> cumulative count):")
+            for bound, count in AI_CALL_SECONDS.labels(outcome).snapshot()["buckets"].items():
+                print(f"  <= {bound:<8} {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Memory and lookup latency of a JSON knowledge base against an answer store.
+
+A synthetic knowledge base with long answers (ANSWER_BYTES each) is
+written as JSON and converted with utils.answer_store. Each variant then
+runs in a fresh interpreter that loads it the way bot_basic does
+(load_knowledge_base, then EnhancedResponseHandler with its keyword index)
+and reports:
+
+- load time, and resident memory after loading: anonymous (heap, what
+  each bot process pays for itself) and file-backed (mapped pages of the
+  store, shared and reclaimable by the kernel)
+- find_best_match plus reading the answer, for keyword questions about
+  random topics: each answer read for the first time, then again
+
+Run from the repository root:
+    python -m benchmarks.bench_answer_store [kb sizes...]
+"""
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import make_knowledge_base
+from utils.answer_store import convert_knowledge_base
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ANSWER_BYTES = 2000
+LOOKUPS = 2000
+
+CHILD = """
+import json, random, sys, time
+start = time.perf_counter()
+from utils.helpers import load_knowledge_base
+from utils.enhanced_handler import EnhancedResponseHandler
+from utils.metrics import REGISTRY
+REGISTRY.enabled = False
+knowledge_base = load_knowledge_base(sys.argv[1])
+handler = EnhancedResponseHandler(knowledge_base)
+load_seconds = time.perf_counter() - start
+
+def rss():
+    fields = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("RssAnon", "RssFile"):
+                fields[name] = int(value.split()[0])
+    return fields
+
+memory = rss()
+rng = random.Random(0)
+topics = rng.sample([topic for topic in knowledge_base if topic.startswith("topic_")], int(sys.argv[2]))
+questions = [f"does anyone know about {knowledge_base[topic]['keywords'][0]}" for topic in topics]
+
+def timings():
+    samples = []
+    for question in questions:
+        start = time.perf_counter()
+        match = handler.find_best_match(question)
+        len(match["answer"])
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return [samples[len(samples) // 2] * 1e6, samples[int(len(samples) * 0.99)] * 1e6]
+
+first = timings()
+again = timings()
+print(json.dumps({"load": load_seconds, "memory": memory, "first": first, "again": again}))
+"""
+
+
+def long_answers(knowledge_base, rng: random.Random):
+    words = "please contact the helpdesk with your ticket number and a screenshot of the error".split()
+    for data in knowledge_base.values():
+        filler = []
+        length = len(data["answer"])
+        while length < ANSWER_BYTES:
+            word = rng.choice(words)
+            filler.append(word)
+            length += len(word) + 1
+        data["answer"] = data["answer"] + " " + " ".join(filler)
+    return knowledge_base
+
+
+def measure(path: str) -> dict:
+    output = subprocess.run([sys.executable, "-c", CHILD, path, str(LOOKUPS)], cwd=REPO_ROOT,
+                            env=dict(os.environ, PYTHONPATH=REPO_ROOT), capture_output=True, text=True, check=True)
+    return json.loads(output.stdout)
+
+
+def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    print(f"answers of ~{ANSWER_BYTES} bytes, {LOOKUPS} keyword lookups of random topics (p50/p99 us)")
+    print(f"{'entries':>8} {'format':<6} {'file MB':>8} {'convert':>9} {'load':>8} {'anon MB':>8} {'file RSS':>9} "
+          f"{'first read':>15} {'read again':>15}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            json_path = os.path.join(directory, "knowledge_base.json")
+            store_path = os.path.join(directory, "knowledge_base.kbstore")
+            with open(json_path, "w") as f:
+                json.dump(long_answers(make_knowledge_base(size), random.Random(size)), f)
+            summary = convert_knowledge_base(json_path, store_path)
+
+            for name, path in (("json", json_path), ("store", store_path)):
+                result = measure(path)
+                convert = f"{summary['seconds']:>7.1f} s" if name == "store" else f"{'':>9}"
+                memory = result["memory"]
+                print(f"{size:>8} {name:<6} {os.path.getsize(path) / 1e6:>8.0f} {convert} {result['load']:>6.2f} s "
+                      f"{memory['RssAnon'] / 1024:>8.0f} {memory['RssFile'] / 1024:>6.0f} MB "
+                      f"{result['first'][0]:>7.1f}/{result['first'][1]:<7.1f} {result['again'][0]:>7.1f}/{result['again'][1]:<7.1f}")
+
+
+if __name__ == "__main__":
+    main()
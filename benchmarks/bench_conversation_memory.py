@@ -0,0 +1,152 @@
+"""Resident memory of ConversationMemory at up to 1M users.
+
+Each variant runs in its own process, adds CONVERSATIONS_PER_USER
+exchanges for every user (questions and answers from the bot's real
+EnhancedResponseHandler, so knowledge base answers, greetings and unknown
+replies mix as in production) and reports the memory retained by the
+history (every reachable object counted once), RSS growth, the cost of
+an add and of reading a history back.
+
+- legacy: the original layout, a dict of lists of dicts holding full text
+- compact: ConversationMemory records in ring buffers, every user in memory
+- compact+lru: the same with MEMORY_MAX_USERS users in memory, the rest
+  evicted and read back from the sqlite store on access
+
+All three write through SQLiteStore, as a deployment would, flushed every
+FLUSH_EVERY adds so its write-behind queue stays small.
+
+Run from the repository root (1M users takes a few minutes):
+    python -m benchmarks.bench_conversation_memory [users] [max users]
+"""
+import gc
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.synthetic import make_knowledge_base, make_questions
+from utils.conversation_memory import ConversationMemory
+from utils.enhanced_handler import EnhancedResponseHandler
+from utils.memory_store import SQLiteStore
+
+CONVERSATIONS_PER_USER = 3
+READS = 2000
+FLUSH_EVERY = 5000
+
+
+class LegacyMemory:
+    """ConversationMemory's original in-memory layout, writing through the same store"""
+
+    def __init__(self, store):
+        self.store = store
+        self.memory = {}
+
+    def add_conversation(self, user_id, question, response):
+        record = {"timestamp": datetime.now().isoformat(), "question": question, "response": response}
+        if user_id not in self.memory:
+            self.memory[user_id] = []
+        self.memory[user_id].append(record)
+        if len(self.memory[user_id]) > 10:
+            self.memory[user_id] = self.memory[user_id][-10:]
+        self.store.append(user_id, record)
+
+    def get_user_history(self, user_id):
+        return self.memory.get(user_id, [])
+
+    def close(self):
+        self.store.close()
+
+
+def retained_mb(root) -> float:
+    """Size of everything reachable from root, each object counted once"""
+    seen = set()
+    stack = [root]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, type):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return total / 1024 / 1024
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def run_variant(variant: str, users: int, max_users: int, results) -> None:
+    random.seed(0)
+    knowledge_base = make_knowledge_base(200)
+    handler = EnhancedResponseHandler(knowledge_base)
+    questions = make_questions(knowledge_base, 1000)
+    # Answers are built on the fly: only what the memory keeps should show up in RSS
+    answers = [(question, handler.get_natural_response(question, "UTEMPLATE")) for question in questions]
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = SQLiteStore(os.path.join(directory, "memory.db"), batch_size=5000)
+        if variant == "legacy":
+            memory = LegacyMemory(store)
+        else:
+            memory = ConversationMemory(store, False, knowledge_base, max_users if variant == "compact+lru" else 0)
+
+        gc.collect()
+        before = rss_mb()
+        start = time.perf_counter()
+        for round_ in range(CONVERSATIONS_PER_USER):
+            for i in range(users):
+                user_id = f"U{i:09d}"
+                question, response = answers[(i * 7 + round_) % len(answers)]
+                memory.add_conversation(user_id, question, response.replace("UTEMPLATE", user_id))
+                if i % FLUSH_EVERY == 0:
+                    # A tight loop outruns the flusher thread; keep its queue out of the RSS numbers
+                    store.flush()
+        add_us = (time.perf_counter() - start) / (users * CONVERSATIONS_PER_USER) * 1e6
+        store.flush()
+        gc.collect()
+        grown = rss_mb() - before
+        retained = retained_mb(memory.memory if variant == "legacy" else (memory.memory, memory._pool))
+
+        rng = random.Random(1)
+        recent = [f"U{i:09d}" for i in range(users - min(users, max_users), users)]
+        start = time.perf_counter()
+        for _ in range(READS):
+            assert len(memory.get_user_history(rng.choice(recent))) == CONVERSATIONS_PER_USER
+        warm_us = (time.perf_counter() - start) / READS * 1e6
+
+        start = time.perf_counter()
+        for _ in range(READS):
+            assert len(memory.get_user_history(f"U{rng.randrange(users):09d}")) == CONVERSATIONS_PER_USER
+        any_us = (time.perf_counter() - start) / READS * 1e6
+
+        memory.close()
+    results.put((variant, retained, grown, add_us, warm_us, any_us))
+
+
+def main() -> None:
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    max_users = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    print(f"{users:,} users x {CONVERSATIONS_PER_USER} conversations, LRU keeps {max_users:,} users")
+    print(f"{'variant':<13} {'retained':>10} {'per user':>9} {'RSS growth':>11} {'add':>9} {'read recent':>12} {'read any':>10}")
+
+    context = multiprocessing.get_context("spawn")
+    for variant in ("legacy", "compact", "compact+lru"):
+        results = context.Queue()
+        process = context.Process(target=run_variant, args=(variant, users, max_users, results))
+        process.start()
+        name, retained, grown, add_us, warm_us, any_us = results.get()
+        process.join()
+        print(f"{name:<13} {retained:>7.0f} MB {retained * 1024 * 1024 / users:>7.0f} B {grown:>8.0f} MB "
+              f"{add_us:>7.1f}us {warm_us:>10.1f}us {any_us:>8.1f}us")
+
+
+if __name__ == "__main__":
+    main()
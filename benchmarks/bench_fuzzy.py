@@ -0,0 +1,140 @@
+"""Typo tolerance of the matchers, and the cost of finding corrections.
+
+Accuracy: questions built from the real knowledge base (keyword and
+question phrasings) get one or two typos in their knowledge base words.
+Both handlers answer them with and without a FuzzyIndex; the report shows
+how many still reach the right topic, and how many questions that should
+not match anything picked up an answer through a correction.
+
+Latency: suggest() on the deletion dictionary against the naive
+alternative, an edit distance to every vocabulary word, as the
+vocabulary grows.
+
+Run from the repository root:
+    python -m benchmarks.bench_fuzzy
+"""
+import random
+import string
+import time
+
+from utils.enhanced_handler import EnhancedResponseHandler
+from utils.fuzzy_index import FuzzyIndex, MIN_WORD_LENGTH, edit_distance, max_edits
+from utils.helpers import clean_text, load_knowledge_base
+from utils.metrics import REGISTRY
+from utils.response_handler import ResponseHandler
+
+TEMPLATES = [
+    "i need help with {}", "{} is not working", "does anyone know about {}", "question about {} please",
+    "how do i fix my {}?",
+]
+UNRELATED = [
+    "what time is the standup today", "who is bringing cake on friday", "the coffee machine smells funny",
+    "has anyone seen my blue umbrella", "lunch order closes at noon", "great demo yesterday everyone",
+    "can we move the retro to thursday", "the elevator music changed again", "welcome aboard to the new folks",
+    "reminder the quarterly planning starts soon", "my wife is sick today", "the parking garage smells like paint",
+    "anyone up for board games at lunch",
+]
+VOCABULARY_SIZES = (1000, 10000, 100000)
+
+
+def typo(word: str, rng: random.Random) -> str:
+    i = rng.randrange(len(word))
+    kind = rng.randrange(4)
+    if kind == 0:
+        return word[:i] + word[i + 1:]
+    if kind == 1:
+        return word[:i] + rng.choice(string.ascii_lowercase) + word[i:]
+    if kind == 2:
+        return word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:]
+    i = min(i, len(word) - 2)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def misspell(text: str, rng: random.Random) -> str:
+    words = text.split()
+    candidates = [i for i, word in enumerate(words) if len(word) >= MIN_WORD_LENGTH and word.isalpha()]
+    for i in candidates:
+        word = typo(words[i], rng)
+        if max_edits(word) == 2 and rng.random() < 0.5:
+            word = typo(word, rng)
+        words[i] = word
+    return " ".join(words)
+
+
+def labeled_questions(knowledge_base, rng: random.Random):
+    questions = []
+    for topic, data in knowledge_base.items():
+        for phrase in [data["question"], *data["keywords"]]:
+            if any(len(word) >= MIN_WORD_LENGTH and word.isalpha() for word in phrase.lower().split()):
+                template = rng.choice(TEMPLATES)
+                questions.append((template.format(phrase.lower()), template.format(misspell(phrase.lower(), rng)), topic))
+    return questions
+
+
+def accuracy(knowledge_base) -> None:
+    rng = random.Random(3)
+    questions = labeled_questions(knowledge_base, rng)
+    print(f"{len(questions)} labeled questions, each also misspelled; {len(UNRELATED)} unrelated chit-chat lines")
+    print(f"{'handler':<24} {'clean':>7} {'typos':>7} {'+fuzzy':>7} {'unrelated matched':>18} {'+fuzzy':>7}")
+
+    fuzzy_index = FuzzyIndex(knowledge_base)
+    for name, build in (("ResponseHandler", lambda fuzzy: ResponseHandler(knowledge_base, fuzzy_index=fuzzy)),
+                        ("EnhancedResponseHandler", lambda fuzzy: EnhancedResponseHandler(knowledge_base, fuzzy_index=fuzzy))):
+        row = []
+        for fuzzy in (None, fuzzy_index):
+            handler = build(fuzzy)
+
+            def topic(question):
+                match = handler.find_best_match(clean_text(question))
+                return match["topic"] if match else None
+
+            if fuzzy is None:
+                row.append(sum(topic(clean) == label for clean, _, label in questions))
+            row.append(sum(topic(misspelled) == label for _, misspelled, label in questions))
+            row.append(sum(topic(line) is not None for line in UNRELATED))
+        clean, typos, unrelated, typos_fuzzy, unrelated_fuzzy = row
+        total = len(questions)
+        print(f"{name:<24} {clean / total:>7.0%} {typos / total:>7.0%} {typos_fuzzy / total:>7.0%} "
+              f"{unrelated:>18} {unrelated_fuzzy:>7}")
+
+
+def latency() -> None:
+    rng = random.Random(4)
+    print(f"\n{'vocabulary':>10} {'build':>9} {'suggest':>9} {'naive scan':>11}  same answers")
+    for size in VOCABULARY_SIZES:
+        words = set()
+        while len(words) < size:
+            words.add("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 12))))
+        words = sorted(words)
+        knowledge_base = {f"t{i}": {"question": word, "answer": "", "keywords": []} for i, word in enumerate(words)}
+        queries = [typo(rng.choice(words), rng) for _ in range(500)]
+
+        start = time.perf_counter()
+        index = FuzzyIndex(knowledge_base)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        suggested = [index.suggest(query) for query in queries]
+        suggest_us = (time.perf_counter() - start) / len(queries) * 1e6
+
+        sample = queries[:50]
+        start = time.perf_counter()
+        naive = []
+        for query in sample:
+            limit = max_edits(query)
+            best = min(((edit_distance(query, word, limit), -index.counts[word], word) for word in words))
+            naive.append((best[2], best[0]) if best[0] <= limit else None)
+        naive_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+        print(f"{size:>10} {build_ms:>6.0f} ms {suggest_us:>6.1f} us {naive_us / 1000:>8.1f} ms  "
+              f"{'yes' if suggested[:len(sample)] == naive else 'NO'}")
+
+
+def main() -> None:
+    REGISTRY.enabled = False
+    accuracy(load_knowledge_base("knowledge_base.json"))
+    latency()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Throughput of the help-request check on a synthetic channel firehose.
+
+Checks that the compiled classifier makes the same decision as the
+original implementations for every message, then reports messages/second.
+
+Run from the repository root:
+    python -m benchmarks.bench_help_classifier [message count]
+"""
+import random
+import re
+import sys
+import time
+
+from utils.enhanced_handler import EnhancedResponseHandler
+from utils.response_handler import ResponseHandler
+
+FRAGMENTS = [
+    "lunch at noon", "deploy went fine", "how do I", "reset my password", "anyone know",
+    "<@U123ABC>", "<#C99|general>", "https://example.com/a?b=c", "http://wiki/page", "lol",
+    "is the wifi down", "problem with", "the printer", "thanks!", "can't find", "cant find",
+    "what's up", "help", "h.e.l.p", "how, to", "wh<@U1>ere is", "ht<#C1>tp://x", "?", "...",
+    "Straße", "Kelvin K", "İstanbul", "need  help", "so broken", "error: 500", "  ",
+]
+
+
+def legacy_clean_text(text: str) -> str:
+    text = re.sub(r'<@[^>]+>', '', text)
+    text = re.sub(r'<#[^>]+>', '', text)
+    text = re.sub(r'http\S+', '', text)
+    text = re.sub(r'[^\w\s?]', '', text)
+    return text.lower().strip()
+
+
+def legacy_enhanced(handler, text: str) -> bool:
+    if not text:
+        return False
+    clean = legacy_clean_text(text)
+    if any(keyword in clean for keyword in handler.help_keywords):
+        return True
+    if '?' in text and '://' not in text:
+        non_rhetorical = ["how", "what", "where", "when", "why", "can", "does", "is"]
+        if any(word in clean for word in non_rhetorical):
+            return True
+    return False
+
+
+def legacy_basic(handler, text: str) -> bool:
+    if not text:
+        return False
+    clean = legacy_clean_text(text)
+    if any(keyword in clean for keyword in handler.help_keywords):
+        return True
+    if '?' in text and '://' not in text:
+        return True
+    return False
+
+
+def make_messages(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    return ["".join(rng.choice([" ", "", ", "]) + rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 8)))
+            for _ in range(count)]
+
+
+def measure(name: str, fn, messages) -> None:
+    start = time.perf_counter()
+    fn(messages)
+    elapsed = time.perf_counter() - start
+    print(f"  {name:<22} {len(messages) / elapsed:>12,.0f} msgs/s")
+
+
+def main(count: int) -> None:
+    messages = make_messages(count)
+
+    for label, handler, legacy in [
+        ("EnhancedResponseHandler", EnhancedResponseHandler({}), legacy_enhanced),
+        ("ResponseHandler", ResponseHandler({}), legacy_basic),
+    ]:
+        expected = [legacy(handler, m) for m in messages]
+        actual = handler.help_classifier.classify_batch(messages)
+        if actual != expected:
+            bad = next(m for m, a, e in zip(messages, actual, expected) if a != e)
+            raise AssertionError(f"{label} decision differs for {bad!r}")
+
+        print(f"{label} ({sum(expected) / len(expected):.0%} help requests)")
+        measure("original", lambda ms: [legacy(handler, m) for m in ms], messages)
+        measure("is_help_request", lambda ms: [handler.is_help_request(m) for m in ms], messages)
+        measure("classify_batch", handler.help_classifier.classify_batch, messages)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
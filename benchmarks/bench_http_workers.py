@@ -0,0 +1,176 @@
+"""Throughput of bot_http.py under gunicorn with 1, 2 and 4 worker processes.
+
+Each run starts gunicorn (gunicorn_conf.py) against a local FakeSlackServer
+and a synthetic knowledge base with a fresh SQLite state directory, then
+posts signed /ask commands and @mentions to /slack/events from many client
+threads. Every mention is delivered twice, as Slack does on retries, to
+check that the shared event table lets only one worker answer it.
+
+Throughput counts completed work: /ask answers posted to response_url and
+mention replies posted with chat.postMessage. Worker scaling is bounded by
+the cores available (printed first); on one core the extra processes only
+add overhead.
+
+Run from the repository root:
+    python -m benchmarks.bench_http_workers
+"""
+import hashlib
+import hmac
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import requests
+
+from benchmarks.fake_slack import BOT_USER_ID, TEAM_ID, FakeSlackServer
+from benchmarks.synthetic import make_knowledge_base, make_questions
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIGNING_SECRET = "bench-secret"
+WORKER_COUNTS = (1, 2, 4)
+ASKS = 400
+MENTIONS = 100
+CLIENT_THREADS = 32
+SLACK_DELAY = 0.01
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def signed_headers(body: str, content_type: str) -> dict:
+    timestamp = str(int(time.time()))
+    basestring = f"v0:{timestamp}:{body}".encode("utf-8")
+    signature = "v0=" + hmac.new(SIGNING_SECRET.encode("utf-8"), basestring, hashlib.sha256).hexdigest()
+    return {
+        "Content-Type": content_type,
+        "X-Slack-Request-Timestamp": timestamp,
+        "X-Slack-Signature": signature,
+    }
+
+
+def make_requests(slack: FakeSlackServer, questions):
+    payloads = []
+    for i, question in enumerate(questions[:ASKS]):
+        body = urlencode({"command": "/ask", "text": question, "user_id": f"U{i % 50:05d}",
+                          "channel_id": f"C{i % 10:04d}", "team_id": TEAM_ID,
+                          "response_url": slack.response_url(f"ask-{i}"), "trigger_id": f"trigger-{i}"})
+        payloads.append((body, "application/x-www-form-urlencoded"))
+    for i, question in enumerate(questions[ASKS:ASKS + MENTIONS]):
+        event = {"type": "app_mention", "user": f"U{i % 50:05d}", "channel": f"C{i % 10:04d}",
+                 "ts": f"{1700000000 + i}.000100", "text": f"<@{BOT_USER_ID}> {question}",
+                 "client_msg_id": f"mention-{i}"}
+        body = json.dumps({"type": "event_callback", "team_id": TEAM_ID, "api_app_id": "ABENCH",
+                           "event_id": f"Ev{i:08d}", "event_time": 1700000000 + i, "event": event})
+        # Slack retries deliveries it thinks failed; both copies go to whichever worker accepts them
+        payloads.extend([(body, "application/json")] * 2)
+    return payloads
+
+
+def start_gunicorn(workers: int, port: int, slack: FakeSlackServer, kb_file: str, state_dir: str):
+    env = dict(
+        os.environ,
+        SLACK_BOT_TOKEN="xoxb-bench",
+        SLACK_SIGNING_SECRET=SIGNING_SECRET,
+        SLACK_API_URL=slack.base_url,
+        KNOWLEDGE_BASE_FILE=kb_file,
+        SHARED_STATE_FILE=os.path.join(state_dir, "shared.db"),
+        AI_CACHE_FILE="",
+        LOG_LEVEL="ERROR",
+        KB_RELOAD_INTERVAL="0",
+        PORT=str(port),
+        HTTP_WORKERS=str(workers),
+        PYTHONPATH=REPO_ROOT,
+    )
+    env.pop("OPENAI_API_KEY", None)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", os.path.join(REPO_ROOT, "gunicorn_conf.py"),
+         "--log-level", "warning", "bot_http:application"],
+        cwd=state_dir, env=env,
+    )
+    health = f"http://127.0.0.1:{port}/health"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(health, timeout=1).status_code == 200:
+                # Let every worker finish importing before timing starts
+                time.sleep(1.0 + 0.5 * workers)
+                return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("gunicorn did not come up")
+
+
+def run(workers: int, questions, kb_file: str) -> dict:
+    slack = FakeSlackServer(delay=SLACK_DELAY).start()
+    port = free_port()
+    with tempfile.TemporaryDirectory() as state_dir:
+        process = start_gunicorn(workers, port, slack, kb_file, state_dir)
+        try:
+            url = f"http://127.0.0.1:{port}/slack/events"
+            payloads = make_requests(slack, questions)
+            session = requests.Session()
+            session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=CLIENT_THREADS))
+
+            def post(item):
+                body, content_type = item
+                return session.post(url, data=body.encode("utf-8"),
+                                    headers=signed_headers(body, content_type), timeout=30).status_code
+
+            expected = ASKS + MENTIONS
+            start = time.perf_counter()
+            with ThreadPoolExecutor(CLIENT_THREADS) as pool:
+                statuses = list(pool.map(post, payloads))
+            deadline = time.monotonic() + 60
+            while slack.calls["response_url"] + slack.calls["chat.postMessage"] < expected and time.monotonic() < deadline:
+                time.sleep(0.01)
+            elapsed = time.perf_counter() - start
+            # Give any duplicate mention replies a moment to show up before counting them
+            time.sleep(1.0)
+
+            rejected = requests.post(url, data=b"command=/ask&text=hi", timeout=5,
+                                     headers={"Content-Type": "application/x-www-form-urlencoded"}).status_code
+            return {
+                "workers": workers,
+                "seconds": elapsed,
+                "per_second": (slack.calls["response_url"] + slack.calls["chat.postMessage"]) / elapsed,
+                "non_200": sum(1 for status in statuses if status != 200),
+                "asks_answered": slack.calls["response_url"],
+                "mention_replies": slack.calls["chat.postMessage"],
+                "unsigned_status": rejected,
+            }
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+            slack.stop()
+
+
+def main() -> None:
+    knowledge_base = make_knowledge_base(200)
+    questions = make_questions(knowledge_base, ASKS + MENTIONS)
+    print(f"cpu cores: {os.cpu_count()}, {ASKS} /ask + {MENTIONS} mentions (each delivered twice), "
+          f"{CLIENT_THREADS} client threads, Slack latency {SLACK_DELAY * 1000:.0f} ms")
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(knowledge_base, f)
+    try:
+        for workers in WORKER_COUNTS:
+            result = run(workers, questions, f.name)
+            print(f"{result['workers']} worker(s): {result['per_second']:7.1f} answers/s "
+                  f"({result['seconds']:.2f}s), /ask answered {result['asks_answered']}/{ASKS}, "
+                  f"mention replies {result['mention_replies']}/{MENTIONS}, non-200 {result['non_200']}, "
+                  f"unsigned request -> {result['unsigned_status']}")
+    finally:
+        os.unlink(f.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Per-channel knowledge base partitions: load and evict times, memory, lookups.
+
+PARTITIONS department knowledge bases of ENTRIES entries each are written
+to disk, each serving CHANNELS_PER_PARTITION channels, and routed with a
+KnowledgeBaseRouter on top of the real knowledge_base.json. Reports:
+
+- estimated against measured (tracemalloc) size of one loaded partition
+- a skewed stream of channel questions (a few busy departments, a long
+  tail, BURST questions in a row from one department) with a memory
+  budget that fits BUDGET_PARTITIONS partitions: hits, loads, evictions,
+  mean load and evict times, and lookup latency, separately for the
+  lookups that had to load their partition
+- the same questions against one handler over every department merged
+  into a single knowledge base: index build time and estimated memory
+
+Run from the repository root:
+    python -m benchmarks.bench_kb_router [partitions] [entries per partition] [questions]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.replay import percentiles
+from utils.enhanced_handler import EnhancedResponseHandler
+from utils.helpers import load_knowledge_base
+from utils.kb_router import KnowledgeBaseRouter, PartitionSpec, estimate_partition_bytes
+from utils.metrics import REGISTRY
+
+WORDS = ["account", "badge", "benefits", "billing", "laptop", "payroll", "parking", "travel", "vpn", "license"]
+CHANNELS_PER_PARTITION = 3
+BUDGET_PARTITIONS = 4
+BURST = 25
+
+
+def department(name: str, size: int, rng: random.Random):
+    knowledge_base = {}
+    for i in range(size):
+        words = rng.sample(WORDS, 3)
+        knowledge_base[f"{name}_{i}"] = {
+            "question": f"{name} {words[0]} {words[1]} {i}",
+            "answer": f"{name} answer {i} about {' '.join(words)}. " * 4,
+            "keywords": [f"{name}{word}{i}" for word in words],
+        }
+    return knowledge_base
+
+
+def build_handler(knowledge_base):
+    return EnhancedResponseHandler(knowledge_base)
+
+
+def main() -> None:
+    partitions = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    entries = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 10000
+    REGISTRY.enabled = False
+    rng = random.Random(0)
+    directory = tempfile.mkdtemp(prefix="helpbot-partitions-")
+
+    specs, departments = [], {}
+    for p in range(partitions):
+        name = f"dept{p}"
+        departments[name] = department(name, entries, rng)
+        path = os.path.join(directory, f"{name}.json")
+        with open(path, "w") as f:
+            json.dump(departments[name], f)
+        specs.append(PartitionSpec(name, path, tuple(f"C{p}_{c}" for c in range(CHANNELS_PER_PARTITION)), ()))
+
+    tracemalloc.start()
+    handler = build_handler(load_knowledge_base(specs[0].path))
+    measured, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    estimate = estimate_partition_bytes(handler.knowledge_base)
+    del handler
+    print(f"{partitions} partitions x {entries} entries, {CHANNELS_PER_PARTITION} channels each")
+    print(f"one partition: estimated {estimate / 1e6:.1f} MB, measured {measured / 1e6:.1f} MB")
+
+    # A few busy departments and a long tail (Zipf-like weights)
+    weights = [1 / (rank + 1) for rank in range(partitions)]
+    questions = []
+    for i in range(count):
+        if i % BURST == 0:
+            name = rng.choices(specs, weights)[0].name
+        topic = f"{name}_{rng.randrange(entries)}"
+        channel = f"C{name[4:]}_{rng.randrange(CHANNELS_PER_PARTITION)}"
+        questions.append((f"does anyone know about {departments[name][topic]['keywords'][0]}", channel))
+
+    global_handler = build_handler(load_knowledge_base("knowledge_base.json"))
+    router = KnowledgeBaseRouter(specs, build_handler, memory_budget=BUDGET_PARTITIONS * estimate + estimate // 2)
+    global_handler.kb_router = router
+
+    warm, cold, wrong = [], [], 0
+    for question, channel in questions:
+        loads = router.loads
+        start = time.perf_counter()
+        match = global_handler.find_best_match(question, channel)
+        elapsed = time.perf_counter() - start
+        (cold if router.loads != loads else warm).append(elapsed)
+        wrong += match is None or match.get("partition") != f"dept{channel[1:].split('_')[0]}"
+
+    stats = router.stats()
+    warm, cold = percentiles(warm), percentiles(cold)
+    print(f"\nrouted, budget {BUDGET_PARTITIONS} partitions ({router.memory_budget / 1e6:.0f} MB), {count} questions")
+    print(f"  hits {stats['hits']}  loads {stats['loads']}  evictions {stats['evictions']}  wrong answers {wrong}")
+    print(f"  load {stats['load_seconds'] / max(1, stats['loads']) * 1000:.0f} ms per partition, evict "
+          f"{stats['evict_seconds'] / max(1, stats['evictions']) * 1000:.1f} ms per partition")
+    print(f"  lookup p50 {warm['p50'] * 1000:.1f} us  p99 {warm['p99'] * 1000:.1f} us; "
+          f"{cold['count']} lookups that loaded their partition p50 {cold['p50']:.0f} ms")
+
+    merged = dict(load_knowledge_base("knowledge_base.json"))
+    for knowledge_base in departments.values():
+        merged.update(knowledge_base)
+    start = time.perf_counter()
+    single = build_handler(merged)
+    startup = time.perf_counter() - start
+    latencies = []
+    for question, _ in questions:
+        start = time.perf_counter()
+        single.find_best_match(question)
+        latencies.append(time.perf_counter() - start)
+    merged_stats = percentiles(latencies)
+    print(f"\none merged knowledge base of {len(merged)} entries: index built in {startup * 1000:.0f} ms, "
+          f"estimated {estimate_partition_bytes(merged) / 1e6:.0f} MB")
+    print(f"  lookup p50 {merged_stats['p50'] * 1000:.1f} us  p99 {merged_stats['p99'] * 1000:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
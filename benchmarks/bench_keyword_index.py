@@ -0,0 +1,67 @@
+"""Compare the keyword automaton with the original per-entry keyword loop.
+
+Run from the repository root:
+    python -m benchmarks.bench_keyword_index [sizes...]
+"""
+import sys
+import time
+from typing import Dict, Optional
+
+from benchmarks.synthetic import make_knowledge_base, make_questions
+from utils.enhanced_handler import EnhancedResponseHandler
+
+
+def legacy_find_best_match(knowledge_base: Dict, question: str) -> Optional[Dict]:
+    """The matcher as it was before the automaton, kept as a reference"""
+    question_lower = question.lower()
+
+    for key, data in knowledge_base.items():
+        for keyword in data["keywords"]:
+            if keyword.lower() in question_lower:
+                return {"answer": data["answer"], "score": 1.0, "topic": key}
+
+    best_match = None
+    best_score = 0
+    for key, data in knowledge_base.items():
+        score = 0
+        for keyword in data["keywords"]:
+            if keyword.lower() in question_lower:
+                score += 0.3
+        if data["question"].lower() in question_lower:
+            score += 0.5
+        score = min(score, 1.0)
+        if score > best_score and score > 0.3:
+            best_score = score
+            best_match = {"answer": data["answer"], "score": score, "topic": key}
+
+    return best_match
+
+
+def run(size: int, question_count: int = 300) -> None:
+    knowledge_base = make_knowledge_base(size)
+    questions = make_questions(knowledge_base, question_count)
+
+    start = time.perf_counter()
+    handler = EnhancedResponseHandler(knowledge_base)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    expected = [legacy_find_best_match(knowledge_base, q) for q in questions]
+    legacy_us = (time.perf_counter() - start) / len(questions) * 1e6
+
+    start = time.perf_counter()
+    actual = [handler.find_best_match(q) for q in questions]
+    index_us = (time.perf_counter() - start) / len(questions) * 1e6
+
+    if actual != expected:
+        raise AssertionError(f"Automaton results differ from legacy matcher at size {size}")
+
+    print(f"{size:>8} entries | build {build_ms:8.1f} ms | "
+          f"legacy {legacy_us:10.1f} us/msg | automaton {index_us:8.1f} us/msg | "
+          f"speedup {legacy_us / index_us:6.1f}x")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 100, 1000, 10000]
+    for size in sizes:
+        run(size)
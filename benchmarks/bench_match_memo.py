@@ -0,0 +1,75 @@
+"""Knowledge base lookups with and without the match memo.
+
+Traffic is skewed like a help channel: questions are drawn from a pool
+with Zipf-like weights, so a few of them make up most of the requests.
+Each handler answers the same stream with and without a MatchMemo; the
+report shows the cost per lookup (clean_text included), the memo's hit
+rate, and checks that every answer is the same either way.
+
+Run from the repository root:
+    python -m benchmarks.bench_match_memo [kb size] [lookups]
+"""
+import random
+import sys
+import time
+
+from benchmarks.synthetic import make_knowledge_base, make_questions
+from utils.enhanced_handler import EnhancedResponseHandler
+from utils.match_memo import MatchMemo
+from utils.metrics import REGISTRY
+from utils.response_handler import ResponseHandler
+
+POOL = 2000
+ZIPF_S = 1.1
+MEMO_SIZE = 10000
+
+
+def traffic(knowledge_base, lookups: int):
+    pool = [f"<@U123> {question}" for question in make_questions(knowledge_base, POOL)]
+    weights = [1 / (rank + 1) ** ZIPF_S for rank in range(POOL)]
+    return random.Random(2).choices(pool, weights, k=lookups)
+
+
+def run(find, questions):
+    start = time.perf_counter()
+    results = [find(question) for question in questions]
+    return (time.perf_counter() - start) / len(questions) * 1e6, results
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    # Measure matching itself, not the stage timers around it
+    REGISTRY.enabled = False
+    knowledge_base = make_knowledge_base(size)
+    questions = traffic(knowledge_base, lookups)
+    print(f"{len(knowledge_base)} entries, {lookups} lookups over {len(set(questions))} distinct questions")
+    print(f"{'handler':<22} {'no memo':>9} {'memo':>9} {'speedup':>8} {'hit rate':>9}  same answers")
+
+    handlers = [
+        ("ResponseHandler", lambda memo: ResponseHandler(knowledge_base, match_memo=memo), "find_best_match"),
+        ("ResponseHandler tfidf", lambda memo: ResponseHandler(knowledge_base, retrieval="tfidf", match_memo=memo),
+         "find_best_match"),
+        ("EnhancedResponseHandler", lambda memo: EnhancedResponseHandler(knowledge_base, match_memo=memo),
+         "find_best_match"),
+    ]
+    for name, build, method in handlers:
+        plain = getattr(build(None), method)
+        memo = MatchMemo(MEMO_SIZE)
+        memoized_handler = build(memo)
+        memoized = getattr(memoized_handler, method)
+        if isinstance(memoized_handler, EnhancedResponseHandler):
+            # get_natural_response cleans the question before matching
+            plain = (lambda find: lambda question: find(memoized_handler.clean_text(question)))(plain)
+            memoized = (lambda find: lambda question: find(memoized_handler.clean_text(question)))(memoized)
+
+        # Only the slow path is sampled for large runs
+        plain_us, plain_results = run(plain, questions[:max(2000, lookups // 10)])
+        memo_us, memo_results = run(memoized, questions)
+        same = plain_results == memo_results[:len(plain_results)]
+        print(f"{name:<22} {plain_us:>7.1f}us {memo_us:>7.1f}us {plain_us / memo_us:>7.1f}x "
+              f"{memo.stats()['hit_rate']:>8.1%}  {'yes' if same else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Compare conversation memory backends as the number of users grows.
+
+For each backend the store is pre-filled with one conversation per user,
+then a burst of new conversations is timed as the Slack handler sees it
+(the cost of add_conversation), followed by the final flush and a reload.
+
+Run from the repository root (1M users takes a while and a few GB of disk):
+    python -m benchmarks.bench_memory_store [user counts...]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from utils.conversation_memory import ConversationMemory
+from utils.memory_store import AppendLogStore, SQLiteStore
+
+BURST = 1000
+
+
+def record(i: int) -> dict:
+    return {"timestamp": datetime.now().isoformat(), "question": f"how to reset password {i}",
+            "response": "You can reset your password at https://company.com/reset-password."}
+
+
+def prefill_json(path: str, users: int) -> ConversationMemory:
+    with open(path, 'w') as f:
+        json.dump({f"U{i}": [record(i)] for i in range(users)}, f, indent=2)
+    memory = ConversationMemory()
+    memory.memory_file = path
+    memory.memory = memory.load_memory()
+    return memory
+
+
+def prefill_store(store, users: int) -> ConversationMemory:
+    for i in range(users):
+        store.append(f"U{i}", record(i))
+    store.flush()
+    return ConversationMemory(store)
+
+
+def run_backend(name: str, memory: ConversationMemory, path: str, users: int) -> None:
+    start = time.perf_counter()
+    for i in range(BURST):
+        memory.add_conversation(f"U{i * 7919 % users}", f"wifi password {i}", "The office WiFi network is 'Company-Guest'.")
+    add_us = (time.perf_counter() - start) / BURST * 1e6
+
+    start = time.perf_counter()
+    memory.close()
+    close_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    if memory.store:
+        reloaded = type(memory.store)(path=path).load()
+    else:
+        reloaded = memory.load_memory()
+    reload_ms = (time.perf_counter() - start) * 1000
+    assert len(reloaded) == users
+
+    size_mb = os.path.getsize(path) / 1e6
+    print(f"{users:>8} users | {name:<7} | add {add_us:10.1f} us | close {close_ms:8.1f} ms | "
+          f"reload {reload_ms:9.1f} ms | {size_mb:8.1f} MB")
+
+
+def run(users: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "memory.json")
+        # The JSON backend rewrites the whole file per message, so only time a short burst
+        memory = prefill_json(path, users)
+        start = time.perf_counter()
+        memory.add_conversation("U0", "wifi", "The office WiFi network is 'Company-Guest'.")
+        print(f"{users:>8} users | json    | add {(time.perf_counter() - start) * 1e6:10.1f} us (single message)")
+
+        path = os.path.join(tmp, "memory.log")
+        run_backend("log", prefill_store(AppendLogStore(path=path), users), path, users)
+
+        path = os.path.join(tmp, "memory.db")
+        run_backend("sqlite", prefill_store(SQLiteStore(path=path), users), path, users)
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000]
+    for count in counts:
+        run(count)
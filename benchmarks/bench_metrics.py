@@ -0,0 +1,71 @@
+"""Measure what the stage timers and answer counters cost.
+
+Times an empty timed() block, then the full get_natural_response path on
+the real knowledge base with instrumentation switched on and off, and how
+long rendering /metrics takes once many label combinations exist.
+
+Run from the repository root:
+    python -m benchmarks.bench_metrics
+"""
+import random
+import time
+
+from benchmarks.synthetic import make_knowledge_base, make_questions
+from utils.enhanced_handler import EnhancedResponseHandler
+from utils.metrics import REGISTRY, set_handler, start_metrics_server, timed
+
+ITERATIONS = 200_000
+QUESTIONS = 20_000
+
+
+def time_empty_blocks() -> float:
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        with timed("noop"):
+            pass
+    return (time.perf_counter() - start) / ITERATIONS
+
+
+def time_responses(handler: EnhancedResponseHandler, questions) -> float:
+    random.seed(0)
+    start = time.perf_counter()
+    for question in questions:
+        handler.get_natural_response(question, "U123")
+    return (time.perf_counter() - start) / len(questions)
+
+
+def main() -> None:
+    set_handler("bench")
+
+    REGISTRY.enabled = True
+    enabled = time_empty_blocks()
+    REGISTRY.enabled = False
+    disabled = time_empty_blocks()
+    print(f"empty timed() block    | on {enabled * 1e6:6.2f} us | off {disabled * 1e6:6.2f} us")
+
+    for size in (100, 5000):
+        knowledge_base = make_knowledge_base(size)
+        handler = EnhancedResponseHandler(knowledge_base)
+        questions = make_questions(knowledge_base, QUESTIONS)
+        time_responses(handler, questions[:1000])  # warm up
+
+        REGISTRY.enabled = False
+        off = time_responses(handler, questions)
+        REGISTRY.enabled = True
+        on = time_responses(handler, questions)
+        print(f"get_natural_response   | {size:>5} entries | on {on * 1e6:7.2f} us | off {off * 1e6:7.2f} us | "
+              f"overhead {(on - off) * 1e6:+.2f} us ({(on - off) / off * 100:+.1f}%)")
+
+    start = time.perf_counter()
+    body = REGISTRY.render()
+    elapsed = time.perf_counter() - start
+    series = sum(1 for line in body.splitlines() if line and not line.startswith("#"))
+    print(f"render /metrics        | {series} series, {len(body) / 1024:.0f} KiB in {elapsed * 1000:.1f} ms")
+
+    server = start_metrics_server(0)
+    print(f"endpoint               | http://127.0.0.1:{server.server_address[1]}/metrics")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Compare ResponseHandler's Jaccard loop with the sparse retrieval engine.
+
+Run from the repository root:
+    python -m benchmarks.bench_retrieval [sizes...]
+"""
+import sys
+import time
+
+from benchmarks.synthetic import make_knowledge_base, make_questions
+from utils.response_handler import ResponseHandler
+
+
+def time_per_call(fn, questions):
+    start = time.perf_counter()
+    results = [fn(q) for q in questions]
+    return (time.perf_counter() - start) / len(questions) * 1e6, results
+
+
+def run(size: int, question_count: int = 200) -> None:
+    knowledge_base = make_knowledge_base(size)
+    questions = make_questions(knowledge_base, question_count)
+
+    loop_handler = ResponseHandler(knowledge_base)
+    start = time.perf_counter()
+    jaccard_handler = ResponseHandler(knowledge_base, retrieval="jaccard")
+    build_ms = (time.perf_counter() - start) * 1000
+    tfidf_handler = ResponseHandler(knowledge_base, retrieval="tfidf")
+
+    # The loop is slow on big knowledge bases, so time it on fewer questions
+    loop_questions = questions[: max(10, question_count * 1000 // size)]
+    loop_us, expected = time_per_call(loop_handler.find_best_match, loop_questions)
+    jaccard_us, actual = time_per_call(jaccard_handler.find_best_match, questions)
+    tfidf_us, _ = time_per_call(tfidf_handler.find_best_match, questions)
+
+    if actual[: len(expected)] != expected:
+        raise AssertionError(f"Jaccard engine results differ from the loop at size {size}")
+
+    print(f"{size:>8} entries | build {build_ms:8.1f} ms | loop {loop_us:10.1f} us | "
+          f"jaccard {jaccard_us:7.1f} us | tfidf {tfidf_us:7.1f} us")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000, 100000]
+    for size in sizes:
+        run(size)
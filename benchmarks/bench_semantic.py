@@ -0,0 +1,126 @@
+"""Recall and latency of the semantic stage at 10k and 100k entries.
+
+The real knowledge base entries are mixed into a synthetic one of the
+given size. Hand-written paraphrases of the real topics (worded so the
+keyword pass mostly misses them) and unrelated chit-chat go through
+ResponseHandler (jaccard engine for the keyword pass) with and without a
+SemanticIndex. Reported per size:
+
+- build time of the index, and load time and size from a snapshot
+  (the matrix comes back memory-mapped)
+- recall@1 of the full handler without and with the semantic stage, and
+  recall@3 of the index alone
+- unrelated lines that got an answer
+- search latency per question, alone and in batches of BATCH
+
+Run from the repository root:
+    python -m benchmarks.bench_semantic [kb sizes...]
+"""
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import make_knowledge_base
+from utils.helpers import clean_text
+from utils.kb_snapshot import load_knowledge_base_snapshot
+from utils.metrics import REGISTRY
+from utils.response_handler import ResponseHandler
+
+BATCH = 64
+PARAPHRASES = [
+    ("my wifi keeps dropping every hour", "wifi"),
+    ("the wireless in building b is down again", "wifi"),
+    ("networking problems on the guest wifi", "wifi"),
+    ("i forgot my login credentials", "password"),
+    ("locked out after too many password attempts", "password"),
+    ("resetting passwords for my account", "password"),
+    ("how many vacation days do i get", "vacation"),
+    ("requesting some time off next month", "vacation"),
+    ("holidays left this year", "vacation"),
+    ("how do i get reimbursed for a taxi", "expense"),
+    ("where do receipts for expenses go", "expense"),
+    ("submitting expenses from my conference trip", "expense"),
+    ("need to book a conference room for friday", "meeting_rooms"),
+    ("reserving meeting space for twelve people", "meeting_rooms"),
+    ("booking rooms for the offsite", "meeting_rooms"),
+    ("when is payroll processed", "hr"),
+    ("talk to someone in human resources about benefits", "hr"),
+    ("installing applications on my laptop", "software"),
+    ("requesting a software license for design tools", "software"),
+    ("my computer will not boot need technical help", "it_support"),
+    ("contacting the helpdesk after hours", "it_support"),
+]
+UNRELATED = [
+    "what time is the standup today", "who is bringing cake on friday", "the coffee machine smells funny",
+    "has anyone seen my blue umbrella", "lunch order closes at noon", "great demo yesterday everyone",
+    "can we move the retro to thursday", "the elevator music changed again", "welcome aboard to the new folks",
+    "reminder the quarterly planning starts soon",
+]
+
+
+def recall(handler, questions) -> float:
+    hits = 0
+    for question, topic in questions:
+        match = handler.find_best_match(question)
+        hits += bool(match and match["topic"] == topic)
+    return hits / len(questions)
+
+
+def run(size: int, directory: str) -> None:
+    kb_file = os.path.join(directory, f"kb_{size}.json")
+    snapshot_file = kb_file + ".snapshot"
+    with open(kb_file, "w") as f:
+        json.dump(make_knowledge_base(size), f)
+
+    start = time.perf_counter()
+    built = load_knowledge_base_snapshot(kb_file, snapshot_file, scoring="jaccard", semantic=True)
+    build_s = time.perf_counter() - start
+    start = time.perf_counter()
+    loaded = load_knowledge_base_snapshot(kb_file, snapshot_file, scoring="jaccard", semantic=True)
+    load_ms = (time.perf_counter() - start) * 1000
+    assert loaded.from_snapshot and not loaded.semantic_index.matrix.flags.writeable
+    index = loaded.semantic_index
+    matrix_mb = index.matrix.nbytes / 1024 / 1024
+
+    knowledge_base = loaded.knowledge_base
+    keyword_only = ResponseHandler(knowledge_base, retrieval="jaccard", retrieval_engine=loaded.retrieval_engine)
+    with_semantic = ResponseHandler(knowledge_base, retrieval="jaccard", retrieval_engine=loaded.retrieval_engine,
+                                    semantic_index=index)
+    cleaned = [(clean_text(question), topic) for question, topic in PARAPHRASES]
+    top3 = sum(topic in [t for t, _ in index.search(question, top_k=3)] for question, topic in cleaned) / len(cleaned)
+    unrelated = [clean_text(line) for line in UNRELATED]
+    false_keyword = sum(keyword_only.find_best_match(line) is not None for line in unrelated)
+    false_semantic = sum(with_semantic.find_best_match(line) is not None for line in unrelated)
+
+    queries = [question for question, _ in cleaned] + unrelated
+    queries = (queries * (BATCH // len(queries) + 1))[:BATCH]
+    single = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query)
+        single.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    index.search_batch(queries)
+    batched_us = (time.perf_counter() - start) / len(queries) * 1e6
+
+    print(f"{len(knowledge_base):>8} {build_s:>7.1f} s {load_ms:>7.0f} ms {matrix_mb:>6.0f} MB "
+          f"{recall(keyword_only, cleaned):>8.0%} {recall(with_semantic, cleaned):>8.0%} {top3:>6.0%} "
+          f"{false_keyword:>4} -> {false_semantic:<3} {statistics.median(single) * 1e6:>8.0f} us {batched_us:>8.0f} us")
+
+
+def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    REGISTRY.enabled = False
+    print(f"{len(PARAPHRASES)} paraphrases of real topics, {len(UNRELATED)} unrelated lines")
+    print(f"{'entries':>8} {'build':>9} {'load':>10} {'matrix':>9} {'keyword':>8} {'+semantic':>9} "
+          f"{'top3':>6} {'unrelated':>10} {'search':>11} {'batched':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            run(size, directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Load test for SlackOutbound against a rate-limiting Slack stub.
+
+A burst of thread replies (several per thread, spread over a few
+channels) is posted from many listener threads, first straight through
+WebClient the way the handlers used to, then through SlackOutbound. The
+stub enforces a per-channel and a per-method limit and answers 429 with
+Retry-After, a little stricter than the limits SlackOutbound assumes, so
+its backoff is exercised too.
+
+Run from the repository root:
+    python -m benchmarks.bench_slack_outbound
+"""
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+
+from benchmarks.fake_slack import FakeSlackServer
+from utils.slack_outbound import SlackOutbound
+
+REPLIES = 150
+CHANNELS = 6
+THREADS_PER_CHANNEL = 5
+LISTENER_THREADS = 20
+SLACK_DELAY = 0.02
+# Stricter than SlackOutbound's defaults (1/s burst 3 per channel, 5/s burst 20 for the method)
+CHANNEL_LIMIT = (1.0, 2)
+METHOD_LIMITS = {"chat.postMessage": (4.0, 10)}
+
+
+def make_replies():
+    rng = random.Random(0)
+    threads = [(f"C{c:03d}", f"1700000000.{c:03d}{t:03d}") for c in range(CHANNELS) for t in range(THREADS_PER_CHANNEL)]
+    return [(*rng.choice(threads), f"Reply number {i} with a helpful answer.") for i in range(REPLIES)]
+
+
+def stub() -> FakeSlackServer:
+    return FakeSlackServer(delay=SLACK_DELAY, channel_limit=CHANNEL_LIMIT, method_limits=METHOD_LIMITS).start()
+
+
+def report(name: str, fake: FakeSlackServer, elapsed: float, delivered: int, latencies=None, extra: str = "") -> None:
+    line = (f"{name:<9} | {elapsed:6.1f} s | replies delivered {delivered:>3}/{REPLIES} | "
+            f"messages posted {len(fake.messages):>3} | 429s {fake.rate_limited:>3} | connections {fake.connections:>3}")
+    if latencies:
+        latencies.sort()
+        line += f" | p50 {latencies[len(latencies) // 2]:5.2f} s | p95 {latencies[int(len(latencies) * 0.95)]:5.2f} s"
+    print(line + extra)
+
+
+def run_direct(replies) -> None:
+    fake = stub()
+    client = WebClient(token="xoxb-bench", base_url=fake.base_url)
+    delivered = 0
+
+    def post(reply):
+        nonlocal delivered
+        channel, thread_ts, text = reply
+        try:
+            client.chat_postMessage(channel=channel, thread_ts=thread_ts, text=text)
+            delivered += 1
+        except SlackApiError:
+            pass  # what the handlers did: log it and the reply is lost
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=LISTENER_THREADS) as pool:
+        list(pool.map(post, replies))
+    report("direct", fake, time.perf_counter() - start, delivered)
+    fake.stop()
+
+
+def run_outbound(replies) -> None:
+    fake = stub()
+    outbound = SlackOutbound("xoxb-bench", fake.base_url, workers=4)
+    latencies = []
+
+    def post(reply):
+        channel, thread_ts, text = reply
+        enqueued = time.perf_counter()
+        future = outbound.post_message(channel, text, thread_ts)
+        future.add_done_callback(lambda _: latencies.append(time.perf_counter() - enqueued))
+        return future
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=LISTENER_THREADS) as pool:
+        futures = list(pool.map(post, replies))
+    wait(futures)
+    elapsed = time.perf_counter() - start
+
+    delivered = sum(1 for future in futures if future.exception() is None)
+    stats = outbound.stats()
+    report("outbound", fake, elapsed, delivered, latencies,
+           f" | merged {stats['merged']} | retried {stats['retried']} | failed {stats['failed']}")
+    outbound.close()
+    fake.stop()
+
+
+def main() -> None:
+    replies = make_replies()
+    print(f"{REPLIES} replies to {CHANNELS * THREADS_PER_CHANNEL} threads in {CHANNELS} channels, "
+          f"stub limits: {CHANNEL_LIMIT[0]:g}/s per channel (burst {CHANNEL_LIMIT[1]}), "
+          f"{METHOD_LIMITS['chat.postMessage'][0]:g}/s for chat.postMessage")
+    run_direct(replies)
+    run_outbound(replies)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Time-to-ready of the bots, with and without a knowledge base snapshot.
+
+Every measurement is a fresh interpreter that imports the bot module (the
+point where the Socket Mode or HTTP handler could start taking events)
+against a local FakeSlackServer, so it covers interpreter start, imports,
+loading the knowledge base and building its indexes:
+
+- json: KB_SNAPSHOT_FILE disabled, parse knowledge_base.json and build
+- cold: no snapshot yet, so build from JSON and write one
+- warm: load the snapshot (arrays memory-mapped)
+
+bot_ai runs without OPENAI_API_KEY and with RETRIEVAL_ENGINE=tfidf; the
+report shows whether openai got imported anyway.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup [kb sizes...]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_slack import FakeSlackServer
+from benchmarks.synthetic import make_knowledge_base
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 3
+
+CHILD = """
+import sys, time
+import {bot}
+print(time.time(), "openai" in sys.modules, {bot}.kb_snapshot.from_snapshot)
+"""
+
+
+def time_to_ready(bot: str, env: dict, cwd: str):
+    start = time.time()
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD.format(bot=bot)], env=env, cwd=cwd,
+        capture_output=True, text=True, check=True,
+    ).stdout.split()
+    return float(output[0]) - start, output[1] == "True", output[2] == "True"
+
+
+def bare_import(module: str) -> float:
+    start = time.time()
+    subprocess.run([sys.executable, "-c", f"import {module}"], check=True)
+    return time.time() - start
+
+
+def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or [0, 5000, 20000]
+    slack = FakeSlackServer().start()
+    try:
+        print(f"interpreter alone {bare_import('sys') * 1000:.0f} ms, "
+              f"+openai {bare_import('openai') * 1000:.0f} ms, +numpy {bare_import('numpy') * 1000:.0f} ms")
+        print(f"{'bot':<10} {'kb entries':>10} {'json':>9} {'cold':>9} {'warm':>9}  openai imported")
+
+        for size in sizes:
+            with tempfile.TemporaryDirectory() as directory:
+                kb_file = os.path.join(directory, "knowledge_base.json")
+                os.chdir(REPO_ROOT)
+                knowledge_base = make_knowledge_base(size) if size else json.load(open("knowledge_base.json"))
+                with open(kb_file, "w") as f:
+                    json.dump(knowledge_base, f)
+
+                for bot, extra in (("bot_basic", {}), ("bot_ai", {"RETRIEVAL_ENGINE": "tfidf"})):
+                    env = dict(
+                        os.environ, PYTHONPATH=REPO_ROOT, SLACK_BOT_TOKEN="xoxb-bench", SLACK_SIGNING_SECRET="bench",
+                        SLACK_API_URL=slack.base_url, KNOWLEDGE_BASE_FILE=kb_file, LOG_LEVEL="ERROR",
+                        KB_RELOAD_INTERVAL="0", AI_CACHE_FILE="", **extra,
+                    )
+                    env.pop("OPENAI_API_KEY", None)
+                    snapshot_file = os.path.join(directory, f"{bot}.snapshot")
+
+                    json_times = [time_to_ready(bot, dict(env, KB_SNAPSHOT_FILE=""), directory)[0] for _ in range(RUNS)]
+                    cold_times = []
+                    for _ in range(RUNS):
+                        if os.path.exists(snapshot_file):
+                            os.unlink(snapshot_file)
+                        seconds, _, from_snapshot = time_to_ready(bot, dict(env, KB_SNAPSHOT_FILE=snapshot_file), directory)
+                        assert not from_snapshot
+                        cold_times.append(seconds)
+                    warm = [time_to_ready(bot, dict(env, KB_SNAPSHOT_FILE=snapshot_file), directory) for _ in range(RUNS)]
+                    assert all(from_snapshot for _, _, from_snapshot in warm)
+
+                    print(f"{bot:<10} {len(knowledge_base):>10} "
+                          f"{statistics.median(json_times) * 1000:>6.0f} ms {statistics.median(cold_times) * 1000:>6.0f} ms "
+                          f"{statistics.median(seconds for seconds, _, _ in warm) * 1000:>6.0f} ms  "
+                          f"{'yes' if any(openai for _, openai, _ in warm) else 'no'}")
+    finally:
+        slack.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Time to first visible text for AI answers, streamed and not.
+
+Drives bot_ai's mention handler against a FakeOpenAIServer that streams
+its answer word by word (first token after FIRST_TOKEN_DELAY, then one
+every TOKEN_DELAY) and a FakeSlackServer enforcing Slack's per-channel
+write limit. For each mode it reports, from the mention arriving:
+
+- first reply: any message in the channel (the placeholder when streaming)
+- first text: the first post or edit showing part of the answer
+- complete: the edit or post carrying the whole answer and disclaimer
+
+plus how many Slack writes each reply took and how many got a 429.
+Each run gets a fresh SlackOutbound, so starts with full rate budgets.
+
+Run from the repository root:
+    python -m benchmarks.bench_streaming [mentions]
+"""
+import importlib
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from benchmarks.fake_slack import FakeSlackServer
+
+FIRST_TOKEN_DELAY = 0.4
+TOKEN_DELAY = 0.04
+# Mentions answered at once: light load, then more streamed replies than chat.update's budget allows
+CONCURRENCY_LEVELS = (1, 4)
+ANSWER = " ".join(
+    "To reset the printer queue open the print management console, select the stuck job, "
+    "cancel it and restart the spooler service; if that fails power cycle the printer and "
+    "try again after a minute or two.".split() * 2
+)
+
+
+def run_mode(bot, slack: FakeSlackServer, streaming: bool, concurrency: int, mentions: int) -> None:
+    bot.Config.AI_STREAMING = streaming
+    mode = f"{'streaming' if streaming else 'complete'}-{concurrency}"
+    started = {}
+
+    def mention(i: int) -> None:
+        channel = f"C{mode}{i}"
+        started[channel] = time.monotonic()
+        event = {"type": "app_mention", "text": f"<@UREPLAYBOT> printer question {mode} {i}", "user": f"U{i}",
+                 "channel": channel, "ts": f"{time.time():.6f}", "event_ts": f"{time.time():.6f}"}
+        bot.handle_mentions(event, lambda text: None, {"event_id": f"Ev{mode}{i}"})
+
+    before = len(slack.writes)
+    rate_limited = slack.rate_limited
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(mention, range(mentions)))
+    bot.outbound.close()
+    bot.outbound = bot.SlackOutbound(bot.Config.SLACK_BOT_TOKEN, bot.Config.SLACK_API_URL,
+                                     bot.Config.SLACK_OUTBOUND_WORKERS)
+
+    first_reply, first_text, complete, writes = [], [], [], []
+    for channel, start in started.items():
+        channel_writes = [(at, text) for at, _, written_to, text in slack.writes[before:] if written_to == channel]
+        first_reply.append(channel_writes[0][0] - start)
+        first_text.append(next(at for at, text in channel_writes if ANSWER.split()[0] in text) - start)
+        complete.append(next(at for at, text in channel_writes if ANSWER in text and "AI-generated" in text) - start)
+        writes.append(len(channel_writes))
+
+    print(f"{mode:<12} {statistics.median(first_reply) * 1000:>9.0f} ms {statistics.median(first_text) * 1000:>9.0f} ms "
+          f"{statistics.median(complete) * 1000:>9.0f} ms {statistics.mean(writes):>7.1f} {slack.rate_limited - rate_limited:>6}")
+
+
+def main() -> None:
+    mentions = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    words = len(ANSWER.split())
+    # Slack allows about one write per second per channel
+    slack = FakeSlackServer(channel_limit=(1.0, 3)).start()
+    openai = FakeOpenAIServer(delay=FIRST_TOKEN_DELAY, answer=ANSWER, token_delay=TOKEN_DELAY).start()
+    try:
+        os.environ.update(
+            SLACK_BOT_TOKEN="xoxb-bench", SLACK_SIGNING_SECRET="bench", SLACK_API_URL=slack.base_url,
+            OPENAI_API_KEY="test", OPENAI_BASE_URL=openai.base_url, AI_CACHE_FILE="", KB_SNAPSHOT_FILE="",
+            KB_RELOAD_INTERVAL="0", LOG_LEVEL="ERROR",
+        )
+        bot = importlib.import_module("bot_ai")
+
+        print(f"{mentions} mentions per run (mode-concurrency), answers of {words} words: "
+              f"first token after {FIRST_TOKEN_DELAY * 1000:.0f} ms, then one every {TOKEN_DELAY * 1000:.0f} ms")
+        print(f"{'mode':<12} {'first reply':>12} {'first text':>12} {'complete':>12} {'writes':>7} {'429s':>6}")
+        for concurrency in CONCURRENCY_LEVELS:
+            for streaming in (False, True):
+                run_mode(bot, slack, streaming, concurrency, mentions)
+        bot.outbound.close()
+    finally:
+        openai.stop()
+        slack.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""/ask latency while a flood of channel messages hits bot_basic.
+
+bot_basic runs against a local FakeSlackServer. An asker dispatches one
+/ask every ASK_INTERVAL seconds and times it from dispatch until its
+listener has finished (ack, answer and the respond() post). Flood
+threads meanwhile dispatch help-request messages in fresh channel
+threads as fast as Bolt takes them, each one becoming a passive
+auto-reply. Auto-replies are held back past the end of the run so that
+posting them doesn't spill from one phase into the next.
+
+Each listener pool runs a quiet phase (asks only) and a flood phase:
+
+- fifo: Bolt's default ThreadPoolExecutor with the same number of threads
+- priority: the bot's PriorityExecutor (explicit requests first, passive
+  auto-replies shed under load)
+
+Run from the repository root:
+    python -m benchmarks.bench_work_queue [seconds per phase] [flood threads]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from benchmarks.fake_slack import TEAM_ID, FakeSlackServer
+from benchmarks.replay import TrackingExecutor, load_bot, percentiles
+from utils.metrics import REGISTRY
+
+ASK_INTERVAL = 0.05
+QUESTIONS = ["how do i reset my password", "wifi network details", "vacation policy", "expense report help"]
+
+
+def run_phase(bot, executor: TrackingExecutor, response_url: str, seconds: float, flood_threads: int):
+    from slack_bolt.request import BoltRequest
+
+    stop = threading.Event()
+    flooded = [0] * flood_threads
+
+    def flood(index: int) -> None:
+        i = 0
+        while not stop.is_set():
+            ts = f"{1700000000 + index}.{i:06d}"
+            event = {"type": "message", "channel_type": "channel", "user": f"UFLOOD{index}", "channel": "CINCIDENT",
+                     "ts": ts, "text": f"does anyone know how to fix the vpn? it is down again {index} {i}",
+                     "client_msg_id": f"flood-{index}-{i}"}
+            bot.app.dispatch(BoltRequest(body={"type": "event_callback", "team_id": TEAM_ID, "api_app_id": "ABENCH",
+                                               "event_id": f"Ev{index}-{i}", "event_time": 1700000000,
+                                               "event": event}, mode="socket_mode"))
+            i += 1
+            flooded[index] = i
+
+    threads = [threading.Thread(target=flood, args=(i,), daemon=True) for i in range(flood_threads)]
+    for thread in threads:
+        thread.start()
+
+    latencies = []
+    deadline = time.monotonic() + seconds
+    i = 0
+    while time.monotonic() < deadline:
+        next_ask = time.monotonic() + ASK_INTERVAL
+        futures = executor.track()
+        start = time.perf_counter()
+        bot.app.dispatch(BoltRequest(body={
+            "command": "/ask", "text": QUESTIONS[i % len(QUESTIONS)], "user_id": f"UASK{i % 20}",
+            "channel_id": "CASK", "team_id": TEAM_ID, "response_url": response_url, "trigger_id": f"trigger-{i}",
+        }, mode="socket_mode"))
+        wait(futures)
+        latencies.append(time.perf_counter() - start)
+        i += 1
+        time.sleep(max(0.0, next_ask - time.monotonic()))
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies, sum(flooded)
+
+
+def drain(pool) -> None:
+    """Wait until a listener pool has nothing queued, so phases don't overlap"""
+    while True:
+        if hasattr(pool, "stats"):
+            backlog = sum(pool.stats()["queued"].values())
+        else:
+            backlog = pool._work_queue.qsize()
+        if not backlog:
+            return
+        time.sleep(0.1)
+
+
+def main() -> None:
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    flood_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    REGISTRY.enabled = False
+    os.chdir(tempfile.mkdtemp(prefix="helpbot-bench-"))
+    os.environ.setdefault("MEMORY_BACKEND", "log")
+
+    slack = FakeSlackServer(delay=0.005).start()
+    bot = load_bot("bot_basic", slack, None, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                          "knowledge_base.json"))
+    bot.Config.RESPONSE_DELAY = 3600
+    runner = bot.app._listener_runner
+    priority_pool = bot.listener_executor
+    fifo_pool = ThreadPoolExecutor(max_workers=priority_pool.workers, thread_name_prefix="fifo-listener")
+    response_url = slack.response_url("ask")
+
+    print(f"{seconds:.0f} s per phase, one /ask every {ASK_INTERVAL * 1000:.0f} ms, {flood_threads} flood threads, "
+          f"{priority_pool.workers} listener threads")
+    print(f"{'pool':<9} {'phase':<6} {'asks':>5} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'flood msgs':>11} {'shed':>7}")
+    for name, pool in (("fifo", fifo_pool), ("priority", priority_pool)):
+        executor = TrackingExecutor(pool)
+        runner.listener_executor = executor
+        for phase, threads in (("quiet", 0), ("flood", flood_threads)):
+            shed_before = sum(priority_pool.stats()["shed"].values())
+            latencies, flooded = run_phase(bot, executor, response_url, seconds, threads)
+            shed = sum(priority_pool.stats()["shed"].values()) - shed_before if pool is priority_pool else 0
+            stats = percentiles(latencies)
+            print(f"{name:<9} {phase:<6} {stats['count']:>5} {stats['p50']:>8.1f} {stats['p99']:>8.1f} "
+                  f"{stats['max']:>8.1f} {flooded:>11} {shed:>7}")
+            drain(pool)
+
+    print(f"\npriority pool: {priority_pool.stats()}")
+    slack.stop()
+
+
+if __name__ == "__main__":
+    main()
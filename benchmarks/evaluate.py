@@ -0,0 +1,423 @@
+"""Offline accuracy and throughput evaluation of the knowledge base matchers.
+
+Runs a labeled question set through each engine and reports, per engine,
+accuracy, per-topic precision and recall, the topics it confuses, and
+throughput and p50/p90/p99/p99.9 latency of find_best_match.
+
+The question set is JSONL, one object per line (extra keys are ignored):
+
+    {"question": "my wifi keeps dropping", "topic": "wifi"}
+    {"question": "lunch at noon anyone", "topic": null}
+
+A null or missing topic means no answer should be given. --generate
+writes a deterministic set of that shape from the knowledge base first.
+
+Engines are a base matcher with optional stages joined by "+":
+"loop", "jaccard" and "tfidf" are ResponseHandler with that retrieval,
+"enhanced" is EnhancedResponseHandler; "+fuzzy" adds a FuzzyIndex and
+"+semantic" (ResponseHandler only) a SemanticIndex. No match memo is
+used, so every question is matched in full.
+
+The file is read in chunks that go to a pool of --workers processes, with
+at most two chunks per worker in flight, and each chunk comes back as
+counts (confusion pairs and a latency histogram), so memory stays flat
+however long the file is. Indexes are built once into knowledge base
+snapshots that every worker maps instead of rebuilding.
+
+    python -m benchmarks.evaluate questions.jsonl --generate 100000
+    python -m benchmarks.evaluate questions.jsonl --output after.json --compare before.json
+"""
+import argparse
+import bisect
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.replay import CHATTER, HELP_OPENERS, git_revision, rss_kb
+from utils.enhanced_handler import EnhancedResponseHandler
+from utils.fuzzy_index import FuzzyIndex
+from utils.helpers import load_knowledge_base
+from utils.kb_snapshot import load_knowledge_base_snapshot
+from utils.metrics import REGISTRY
+from utils.response_handler import ResponseHandler
+
+BASES = ("loop", "jaccard", "tfidf", "enhanced")
+STAGES = ("fuzzy", "semantic")
+DEFAULT_ENGINES = "loop,tfidf,enhanced,tfidf+fuzzy+semantic,enhanced+fuzzy"
+# Topic label of questions that should get no answer, and of engines giving none
+NO_TOPIC = "(none)"
+# Log-spaced latency buckets, 5% apart from 1 us to several minutes
+LATENCY_BUCKETS = tuple(1e-6 * 1.05 ** i for i in range(420))
+PERCENTILES = (50, 90, 99, 99.9)
+
+# Set up in each worker by _init_worker
+_ENGINES: List[Tuple[str, Callable[[str], Optional[Dict]]]] = []
+
+
+def parse_engine(spec: str) -> Tuple[str, Tuple[str, ...]]:
+    """("tfidf", ("fuzzy", "semantic")) for "tfidf+fuzzy+semantic" """
+    base, *stages = spec.strip().split("+")
+    if base not in BASES:
+        raise ValueError(f"unknown matcher {base!r} in {spec!r} (choose from {', '.join(BASES)})")
+    for stage in stages:
+        if stage not in STAGES:
+            raise ValueError(f"unknown stage {stage!r} in {spec!r} (choose from {', '.join(STAGES)})")
+    if base == "enhanced" and "semantic" in stages:
+        raise ValueError("EnhancedResponseHandler has no semantic stage")
+    return base, tuple(sorted(set(stages)))
+
+
+def _snapshot_settings(base: str, stages: Tuple[str, ...]) -> Dict:
+    return {
+        "keyword_index": base == "enhanced",
+        "scoring": base if base in ("jaccard", "tfidf") else None,
+        "semantic": "semantic" in stages,
+    }
+
+
+def _snapshot_path(directory: str, base: str, stages: Tuple[str, ...]) -> str:
+    return os.path.join(directory, f"{base}{'-semantic' if 'semantic' in stages else ''}.snapshot")
+
+
+def build_engine(spec: str, kb_path: str, snapshot_dir: str) -> Callable[[str], Optional[Dict]]:
+    """find_best_match of the handler described by spec, called the way the bots call it"""
+    base, stages = parse_engine(spec)
+    settings = _snapshot_settings(base, stages)
+    snapshot = load_knowledge_base_snapshot(kb_path, _snapshot_path(snapshot_dir, base, stages), **settings)
+    knowledge_base = snapshot.knowledge_base
+    fuzzy_index = FuzzyIndex(knowledge_base) if "fuzzy" in stages else None
+
+    if base == "enhanced":
+        handler = EnhancedResponseHandler(knowledge_base, snapshot.keyword_index, fuzzy_index=fuzzy_index)
+        return lambda question: handler.find_best_match(handler.clean_text(question))
+
+    handler = ResponseHandler(knowledge_base, retrieval=settings["scoring"],
+                              retrieval_engine=snapshot.retrieval_engine, fuzzy_index=fuzzy_index,
+                              semantic_index=snapshot.semantic_index)
+    return handler.find_best_match
+
+
+def _init_worker(specs: List[str], kb_path: str, snapshot_dir: str) -> None:
+    # Stage timings would only add their own overhead to what is measured here
+    REGISTRY.enabled = False
+    logging.getLogger().setLevel(logging.WARNING)
+    _ENGINES[:] = [(spec, build_engine(spec, kb_path, snapshot_dir)) for spec in specs]
+
+
+def evaluate_chunk(lines: List[str]) -> Dict:
+    """Confusion counts and latency histograms of every engine over one chunk of JSONL lines"""
+    questions = []
+    skipped = 0
+    for line in lines:
+        try:
+            record = json.loads(line)
+            question = record["question"]
+            topic = record.get("topic") or NO_TOPIC
+        except (ValueError, KeyError, TypeError, AttributeError):
+            skipped += 1
+            continue
+        if not isinstance(question, str):
+            skipped += 1
+            continue
+        questions.append((question, topic))
+
+    engines = {}
+    for name, find in _ENGINES:
+        confusion: Dict[Tuple[str, str], int] = {}
+        latency = [0] * (len(LATENCY_BUCKETS) + 1)
+        seconds = 0.0
+        for question, expected in questions:
+            start = time.perf_counter()
+            match = find(question)
+            elapsed = time.perf_counter() - start
+            seconds += elapsed
+            latency[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+            pair = (expected, match["topic"] if match else NO_TOPIC)
+            confusion[pair] = confusion.get(pair, 0) + 1
+        engines[name] = {"confusion": confusion, "latency": latency, "seconds": seconds}
+    return {"questions": len(questions), "skipped": skipped, "engines": engines}
+
+
+def merge(total: Dict, part: Dict) -> None:
+    total["questions"] += part["questions"]
+    total["skipped"] += part["skipped"]
+    for name, engine in part["engines"].items():
+        merged = total["engines"].setdefault(
+            name, {"confusion": {}, "latency": [0] * (len(LATENCY_BUCKETS) + 1), "seconds": 0.0}
+        )
+        for pair, count in engine["confusion"].items():
+            merged["confusion"][pair] = merged["confusion"].get(pair, 0) + count
+        merged["latency"] = [a + b for a, b in zip(merged["latency"], engine["latency"])]
+        merged["seconds"] += engine["seconds"]
+
+
+def read_chunks(path: str, size: int) -> Iterator[List[str]]:
+    """Non-blank lines of path, `size` at a time, read lazily"""
+    with open(path, "r", encoding="utf-8") as f:
+        chunk = []
+        for line in f:
+            if line.strip():
+                chunk.append(line)
+                if len(chunk) >= size:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+
+def histogram_percentile(counts: List[int], q: float) -> Optional[float]:
+    """Upper bound of the bucket holding the q-th percentile (nearest rank), in microseconds"""
+    total = sum(counts)
+    if not total:
+        return None
+    rank = max(1, -(-q * total // 100))
+    seen = 0
+    for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), counts):
+        seen += count
+        if seen >= rank:
+            return bound * 1e6
+    return float("inf")
+
+
+def engine_report(engine: Dict) -> Dict:
+    """Accuracy, per-topic precision/recall, confusions and latency of one engine's merged counts"""
+    confusion = engine["confusion"]
+    total = sum(confusion.values())
+    expected_counts: Dict[str, int] = {}
+    predicted_counts: Dict[str, int] = {}
+    correct: Dict[str, int] = {}
+    for (expected, predicted), count in confusion.items():
+        expected_counts[expected] = expected_counts.get(expected, 0) + count
+        predicted_counts[predicted] = predicted_counts.get(predicted, 0) + count
+        if expected == predicted:
+            correct[expected] = count
+
+    topics = {}
+    for topic in sorted(set(expected_counts) | set(predicted_counts)):
+        if topic == NO_TOPIC:
+            continue
+        hits = correct.get(topic, 0)
+        topics[topic] = {
+            "support": expected_counts.get(topic, 0),
+            "answered": predicted_counts.get(topic, 0),
+            "precision": hits / predicted_counts[topic] if predicted_counts.get(topic) else None,
+            "recall": hits / expected_counts[topic] if expected_counts.get(topic) else None,
+        }
+
+    def mean(values):
+        values = [value for value in values if value is not None]
+        return sum(values) / len(values) if values else None
+
+    unanswerable = expected_counts.get(NO_TOPIC, 0)
+    return {
+        "questions": total,
+        "accuracy": sum(correct.values()) / total if total else None,
+        "macro_precision": mean(topic["precision"] for topic in topics.values()),
+        "macro_recall": mean(topic["recall"] for topic in topics.values()),
+        "unanswerable": unanswerable,
+        "unanswerable_answered": unanswerable - correct.get(NO_TOPIC, 0),
+        "cpu_seconds": engine["seconds"],
+        "questions_per_second": total / engine["seconds"] if engine["seconds"] else None,
+        "latency_us": {f"p{q:g}": histogram_percentile(engine["latency"], q) for q in PERCENTILES},
+        "topics": topics,
+        "confusions": [
+            {"expected": expected, "predicted": predicted, "count": count}
+            for (expected, predicted), count in sorted(confusion.items(), key=lambda item: (-item[1], item[0]))
+            if expected != predicted
+        ],
+    }
+
+
+def generate_questions(knowledge_base: Dict, path: str, count: int, seed: int = 0) -> None:
+    """Write `count` labeled questions: keyword and question phrasings of random topics, and chatter"""
+    rng = random.Random(seed)
+    topics = list(knowledge_base.keys())
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            if i % 5 == 4 or not topics:
+                question, topic = rng.choice(CHATTER), None
+            else:
+                topic = rng.choice(topics)
+                data = knowledge_base[topic]
+                phrase = rng.choice([data["question"], *data.get("keywords", [])])
+                question = f"{rng.choice(HELP_OPENERS)} {phrase.lower()}"
+            f.write(json.dumps({"question": question, "topic": topic}) + "\n")
+
+
+def evaluate(args) -> Dict:
+    specs = [spec.strip() for spec in args.engines.split(",") if spec.strip()]
+    engines = {spec: parse_engine(spec) for spec in specs}
+
+    with tempfile.TemporaryDirectory(prefix="evaluate-") as temp_dir:
+        snapshot_dir = args.snapshot_dir or temp_dir
+        # Build each snapshot once here; the workers only map them
+        start = time.perf_counter()
+        for base, stages in set(engines.values()):
+            load_knowledge_base_snapshot(args.knowledge_base, _snapshot_path(snapshot_dir, base, stages),
+                                         **_snapshot_settings(base, stages))
+        index_seconds = time.perf_counter() - start
+
+        total = {"questions": 0, "skipped": 0, "engines": {}}
+        progress = [0]
+
+        def collect(part: Dict) -> None:
+            merge(total, part)
+            if args.progress > 0 and total["questions"] - progress[0] >= args.progress:
+                progress[0] = total["questions"]
+                print(f"... {progress[0]} questions", file=sys.stderr)
+
+        start = time.perf_counter()
+        chunks = read_chunks(args.questions, args.chunk_size)
+        if args.workers <= 1:
+            _init_worker(specs, args.knowledge_base, snapshot_dir)
+            for chunk in chunks:
+                collect(evaluate_chunk(chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                     initargs=(specs, args.knowledge_base, snapshot_dir)) as pool:
+                pending = set()
+                for chunk in chunks:
+                    # Bounded read-ahead: never more than two chunks per worker in memory
+                    if len(pending) >= 2 * args.workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            collect(future.result())
+                    pending.add(pool.submit(evaluate_chunk, chunk))
+                for future in wait(pending).done:
+                    collect(future.result())
+        elapsed = time.perf_counter() - start
+
+    return {
+        "commit": git_revision(),
+        "questions_file": args.questions,
+        "knowledge_base": args.knowledge_base,
+        "workers": max(args.workers, 1),
+        "questions": total["questions"],
+        "skipped_lines": total["skipped"],
+        "index_build_seconds": index_seconds,
+        "seconds": elapsed,
+        "questions_per_second": total["questions"] * len(specs) / elapsed if elapsed else None,
+        "parent_rss_kb": rss_kb(),
+        "engines": {spec: engine_report(total["engines"][spec]) for spec in specs if spec in total["engines"]},
+    }
+
+
+def _fraction(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1%}"
+
+
+def print_report(report: Dict, top: int) -> None:
+    print(f"{report['questions']} questions ({report['skipped_lines']} lines skipped), workers: {report['workers']}, "
+          f"{report['seconds']:.1f} s ({report['questions_per_second']:.0f} matches/s across engines), "
+          f"indexes built in {report['index_build_seconds']:.1f} s")
+    print(f"\n{'engine':<26} {'accuracy':>8} {'macro P':>8} {'macro R':>8} {'unans->ans':>13} {'q/s/core':>9} "
+          + " ".join(f"{'p' + format(q, 'g') + ' us':>10}" for q in PERCENTILES))
+    for name, engine in report["engines"].items():
+        rate = engine["questions_per_second"]
+        print(f"{name:<26} {_fraction(engine['accuracy']):>8} {_fraction(engine['macro_precision']):>8} "
+              f"{_fraction(engine['macro_recall']):>8} "
+              f"{engine['unanswerable_answered']:>6}/{engine['unanswerable']:<6} {rate or 0:>9.0f} "
+              + " ".join(f"{engine['latency_us'][f'p{q:g}']:>10.1f}" for q in PERCENTILES))
+
+    for name, engine in report["engines"].items():
+        if top <= 0:
+            break
+        topics = sorted(engine["topics"].items(), key=lambda item: (-item[1]["support"], item[0]))[:top]
+        print(f"\n{name}: {len(engine['topics'])} topics, {top} largest")
+        print(f"  {'topic':<24} {'support':>8} {'answered':>9} {'precision':>10} {'recall':>8}")
+        for topic, stats in topics:
+            print(f"  {topic:<24} {stats['support']:>8} {stats['answered']:>9} "
+                  f"{_fraction(stats['precision']):>10} {_fraction(stats['recall']):>8}")
+        if engine["confusions"]:
+            print("  most confused (expected -> answered):")
+            for confusion in engine["confusions"][:top]:
+                print(f"    {confusion['expected']:<24} -> {confusion['predicted']:<24} {confusion['count']:>8}")
+
+
+# (key under each engine, label, True if higher is better)
+COMPARED = [
+    (("accuracy",), "accuracy", True),
+    (("macro_recall",), "macro recall", True),
+    (("unanswerable_answered",), "unans answered", False),
+    (("questions_per_second",), "q/s/core", True),
+    (("latency_us", "p50"), "p50 us", False),
+    (("latency_us", "p99"), "p99 us", False),
+]
+
+
+def compare(baseline: Dict, report: Dict) -> None:
+    print(f"\ncompared with {baseline.get('commit')} -> {report.get('commit')}")
+    for name, engine in report["engines"].items():
+        old_engine = baseline.get("engines", {}).get(name)
+        if not old_engine:
+            continue
+        print(f"{name}")
+        for path, label, higher_is_better in COMPARED:
+            old, new = old_engine, engine
+            for key in path:
+                old, new = (old or {}).get(key), (new or {}).get(key)
+            if old is None or new is None:
+                continue
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            worse = (new < old) if higher_is_better else (new > old)
+            print(f"  {label:<16}{old:>14.4g}{new:>14.4g}{change:>10}{'  worse' if worse and old != new else ''}")
+    if baseline.get("questions_file") != report.get("questions_file") or baseline.get("questions") != report.get("questions"):
+        print("note: question sets differ between the two runs")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("questions", help="labeled JSONL question set")
+    parser.add_argument("--generate", type=int, metavar="COUNT",
+                        help="first write COUNT generated labeled questions to the questions file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--knowledge-base", default=os.path.join(REPO_ROOT, "knowledge_base.json"))
+    parser.add_argument("--engines", default=DEFAULT_ENGINES, help=f"comma-separated (default {DEFAULT_ENGINES})")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes (1 runs in this one)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="questions per task sent to a worker")
+    parser.add_argument("--snapshot-dir", help="keep the knowledge base snapshots here between runs")
+    parser.add_argument("--progress", type=int, default=100000, help="report progress every N questions (0: never)")
+    parser.add_argument("--top", type=int, default=10, help="topics and confusions printed per engine")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    args = parser.parse_args(argv)
+    try:
+        for spec in args.engines.split(","):
+            if spec.strip():
+                parse_engine(spec)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    if args.generate:
+        generate_questions(load_knowledge_base(args.knowledge_base), args.questions, args.generate, args.seed)
+
+    report = evaluate(args)
+    print_report(report, args.top)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if baseline:
+        compare(baseline, report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Shared plumbing for the local API stand-ins used by the benchmarks.
+
+A FakeHTTPServer runs a threading HTTP server on 127.0.0.1 (an ephemeral
+port by default) and hands every request to handle(). Latency and a
+failure rate can be injected, and changed while it runs.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+
+class FakeHTTPServer:
+    def __init__(self, delay: float = 0.0, error_rate: float = 0.0, error_status: int = 500, port: int = 0):
+        self.delay = delay
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self.connections = 0
+        self._random = random.Random(0)
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                server._dispatch(self, body)
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _dispatch(self, request: BaseHTTPRequestHandler, body: bytes) -> None:
+        with self._lock:
+            self.requests += 1
+            fail = self._random.random() < self.error_rate
+
+        if self.delay:
+            time.sleep(self.delay)
+
+        self.handle(request, self.parse_body(request, body), fail)
+
+    @staticmethod
+    def parse_body(request: BaseHTTPRequestHandler, body: bytes) -> dict:
+        """Decode a JSON or form-encoded request body"""
+        if not body:
+            return {}
+        if "application/x-www-form-urlencoded" in request.headers.get("Content-Type", ""):
+            return dict(parse_qsl(body.decode("utf-8")))
+        return json.loads(body)
+
+    def handle(self, request: BaseHTTPRequestHandler, payload: dict, fail: bool) -> None:
+        raise NotImplementedError
+
+    @staticmethod
+    def send_json(request: BaseHTTPRequestHandler, status: int, payload: dict, headers: dict = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        try:
+            request.send_response(status)
+            request.send_header("Content-Type", "application/json")
+            request.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                request.send_header(name, value)
+            request.end_headers()
+            request.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (deadline passed) before we answered
+            pass
@@ -0,0 +1,90 @@
+"""Local stand-in for the OpenAI chat completions endpoint.
+
+Latency and failures can be injected (and changed while it runs) so the
+AI fallback path can be exercised without a network or an API key:
+
+    server = FakeOpenAIServer(delay=0.2, error_rate=0.1).start()
+    client = OpenAI(api_key="test", base_url=server.base_url, max_retries=0)
+
+The answer takes token_delay seconds per word to generate. A request with
+"stream": true gets it word by word as server-sent events as they are
+generated; otherwise it comes in one piece once all of it is.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+from benchmarks.fake_http import FakeHTTPServer
+
+
+class FakeOpenAIServer(FakeHTTPServer):
+    def __init__(self, delay: float = 0.0, error_rate: float = 0.0, error_status: int = 500,
+                 answer: str = "This is a canned answer from the fake OpenAI server.", token_delay: float = 0.0,
+                 port: int = 0):
+        super().__init__(delay, error_rate, error_status, port)
+        self.answer = answer
+        self.token_delay = token_delay
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/v1"
+
+    def handle(self, request: BaseHTTPRequestHandler, payload: dict, fail: bool) -> None:
+        if fail:
+            self.send_json(request, self.error_status, {"error": {"message": "injected failure", "type": "server_error"}})
+            return
+        if payload.get("stream"):
+            self.stream(request, payload)
+            return
+        if self.token_delay:
+            time.sleep(self.token_delay * len(re.findall(r"\S+\s*", self.answer)))
+
+        self.send_json(request, 200, {
+            "id": f"chatcmpl-fake-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "gpt-3.5-turbo"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.answer},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20},
+        })
+
+    def stream(self, request: BaseHTTPRequestHandler, payload: dict) -> None:
+        def chunk(delta: dict, finish_reason=None) -> bytes:
+            return b"data: " + json.dumps({
+                "id": f"chatcmpl-fake-{self.requests}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": payload.get("model", "gpt-3.5-turbo"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }).encode("utf-8") + b"\n\n"
+
+        # No Content-Length: the body ends when the connection closes
+        request.close_connection = True
+        try:
+            request.send_response(200)
+            request.send_header("Content-Type", "text/event-stream")
+            request.send_header("Connection", "close")
+            request.end_headers()
+            request.wfile.write(chunk({"role": "assistant", "content": ""}))
+            for token in re.findall(r"\S+\s*", self.answer):
+                if self.token_delay:
+                    time.sleep(self.token_delay)
+                request.wfile.write(chunk({"content": token}))
+                request.wfile.flush()
+            request.wfile.write(chunk({}, "stop") + b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+if __name__ == "__main__":
+    import sys
+
+    with FakeOpenAIServer(delay=float(sys.argv[1]) if len(sys.argv) > 1 else 0.0, port=8765) as fake:
+        print(f"Fake OpenAI listening on {fake.base_url}")
+        threading.Event().wait()
@@ -0,0 +1,120 @@
+"""Local stand-in for the Slack Web API and slash-command response URLs.
+
+Point a WebClient at base_url and every call lands here; calls are counted
+per method so a benchmark can check what the bot actually sent:
+
+    server = FakeSlackServer(delay=0.05).start()
+    client = WebClient(token="xoxb-test", base_url=server.base_url)
+
+response_url(...) gives a URL that accepts what Bolt's respond() posts.
+An injected failure answers with error_status (429 also sets Retry-After).
+
+channel_limit and method_limits, as (per second, burst) pairs, make it
+enforce Slack-style rate limits: a call over the limit gets a 429 with a
+Retry-After header. Accepted chat.postMessage calls are kept in messages,
+and every accepted post or edit in writes as (monotonic time, method,
+channel, text).
+"""
+import itertools
+import math
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler
+from typing import Dict, Optional, Tuple
+
+from benchmarks.fake_http import FakeHTTPServer
+from utils.slack_outbound import TokenBucket
+
+BOT_USER_ID = "UREPLAYBOT"
+TEAM_ID = "TREPLAY"
+
+
+class FakeSlackServer(FakeHTTPServer):
+    def __init__(self, delay: float = 0.0, error_rate: float = 0.0, error_status: int = 500,
+                 retry_after: int = 1, channel_limit: Optional[Tuple[float, int]] = None,
+                 method_limits: Optional[Dict[str, Tuple[float, int]]] = None, port: int = 0):
+        super().__init__(delay, error_rate, error_status, port)
+        self.retry_after = retry_after
+        self.channel_limit = channel_limit
+        self.method_limits = method_limits or {}
+        self.calls = Counter()
+        self.rate_limited = 0
+        self.messages = []
+        self.writes = []
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._ts = itertools.count(1)
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/api/"
+
+    def response_url(self, key: str) -> str:
+        return f"{self.url}/respond/{key}"
+
+    def handle(self, request: BaseHTTPRequestHandler, payload: dict, fail: bool) -> None:
+        path = request.path.split("?", 1)[0]
+        method = path[len("/api/"):] if path.startswith("/api/") else "response_url"
+        with self._lock:
+            self.calls[method] += 1
+
+        if fail:
+            headers = {"Retry-After": str(self.retry_after)} if self.error_status == 429 else None
+            error = "ratelimited" if self.error_status == 429 else "fatal_error"
+            self.send_json(request, self.error_status, {"ok": False, "error": error}, headers)
+            return
+
+        retry_after = self._over_limit(method, payload.get("channel"))
+        if retry_after:
+            self.send_json(request, 429, {"ok": False, "error": "ratelimited"},
+                           {"Retry-After": str(math.ceil(retry_after))})
+            return
+
+        if method in ("chat.postMessage", "chat.update"):
+            with self._lock:
+                if method == "chat.postMessage":
+                    self.messages.append((payload.get("channel"), payload.get("thread_ts"), payload.get("text")))
+                self.writes.append((time.monotonic(), method, payload.get("channel"), payload.get("text")))
+        self.send_json(request, 200, self.reply(method, payload))
+
+    def _over_limit(self, method: str, channel: Optional[str]) -> float:
+        """Seconds to wait if this call breaks a limit (0 takes a token and lets it through)"""
+        limits = [(("method", method), self.method_limits.get(method))]
+        if channel:
+            limits.append((("channel", channel), self.channel_limit))
+
+        with self._lock:
+            now = time.monotonic()
+            buckets = []
+            for key, limit in limits:
+                if limit is None:
+                    continue
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = TokenBucket(*limit)
+                wait = bucket.wait_time(now)
+                if wait > 0:
+                    self.rate_limited += 1
+                    return wait
+                buckets.append(bucket)
+            for bucket in buckets:
+                bucket.take()
+        return 0.0
+
+    def reply(self, method: str, payload: dict) -> dict:
+        if method == "auth.test":
+            return {"ok": True, "url": f"{self.url}/", "team": "replay", "user": "helpbot",
+                    "team_id": TEAM_ID, "user_id": BOT_USER_ID, "bot_id": "BREPLAY"}
+        if method in ("chat.postMessage", "chat.update"):
+            ts = payload.get("ts") or f"{int(time.time())}.{next(self._ts):06d}"
+            return {"ok": True, "channel": payload.get("channel"), "ts": ts,
+                    "message": {"text": payload.get("text"), "ts": ts}}
+        return {"ok": True}
+
+
+if __name__ == "__main__":
+    import sys
+
+    with FakeSlackServer(delay=float(sys.argv[1]) if len(sys.argv) > 1 else 0.0, port=8766) as fake:
+        print(f"Fake Slack Web API listening on {fake.base_url}")
+        threading.Event().wait()
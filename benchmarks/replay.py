@@ -0,0 +1,416 @@
+"""Replay a corpus of Slack payloads through a bot's real handlers.
+
+The bot module is imported as-is, with its Slack client pointed at a local
+FakeSlackServer and its OpenAI client at a FakeOpenAIServer, so mentions,
+channel messages, /ask and /history go through Bolt's dispatch, the
+listeners and every outbound API call exactly as in production. Both
+fakes take a latency and an error rate.
+
+Each line of a corpus file is one Slack payload as Bolt receives it over
+Socket Mode: an "event_callback" envelope or a slash command body. Without
+--corpus a deterministic corpus is generated from the knowledge base
+(--events, --seed), and --save-corpus writes it out for reuse.
+
+The report (JSON) has throughput, p50/p95/p99 latency overall and per
+payload kind, Slack/OpenAI call counts and RSS growth. Save one per commit
+with --output and pass an earlier one to --compare to see the deltas:
+
+    python -m benchmarks.replay --bot bot_basic --output before.json
+    python -m benchmarks.replay --bot bot_basic --compare before.json
+
+Latency runs from dispatch until every listener Bolt started for the
+payload has returned. Replies the bot schedules for later (bot_basic's
+delayed thread answers) or queues for its outbound dispatcher are drained
+before the report but not timed.
+"""
+import argparse
+import gc
+import importlib
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Executor, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from benchmarks.fake_slack import BOT_USER_ID, TEAM_ID, FakeSlackServer
+from benchmarks.synthetic import WORDS, load_corpus, make_questions
+from utils.helpers import load_knowledge_base
+
+BOTS = ("bot_basic", "bot_ai")
+
+CHATTER = [
+    "lunch at noon anyone", "great job on the release everyone", "running ten minutes late",
+    "the coffee machine is fixed", "see you all at standup", "happy friday", "thanks, that worked",
+]
+HELP_OPENERS = ["can someone help me with", "does anyone know about", "i need help with", "how do i fix"]
+
+
+def make_corpus(knowledge_base: Dict, count: int, seed: int = 0, response_url: str = "") -> List[Dict]:
+    """Deterministic mix of mentions, channel chatter, help requests, thread replies and slash commands"""
+    rng = random.Random(seed)
+    questions = make_questions(knowledge_base, max(count, 1), seed=seed + 1)
+    users = [f"U{i:05d}" for i in range(200)]
+    channels = [f"C{i:04d}" for i in range(10)]
+    recent_threads = []
+    corpus = []
+
+    def envelope(event: Dict) -> Dict:
+        return {
+            "type": "event_callback", "team_id": TEAM_ID, "api_app_id": "AREPLAY",
+            "event_id": f"Ev{len(corpus):08d}", "event_time": int(event["ts"].split(".")[0]),
+            "event": event,
+        }
+
+    for i in range(count):
+        user = rng.choice(users)
+        channel = rng.choice(channels)
+        ts = f"{1700000000 + i}.{rng.randrange(1000000):06d}"
+        question = questions[i]
+        roll = rng.random()
+
+        if roll < 0.25:
+            # One "@HelpBot ..." message arrives as both app_mention and message
+            text = f"<@{BOT_USER_ID}> {question}"
+            event = {"type": "app_mention", "user": user, "channel": channel, "ts": ts,
+                     "text": text, "client_msg_id": f"msg-{i}"}
+            corpus.append(envelope(event))
+            corpus.append(envelope(dict(event, type="message", channel_type="channel")))
+        elif roll < 0.45:
+            text = f"{rng.choice(HELP_OPENERS)} {rng.choice(WORDS)}? {question}"
+            corpus.append(envelope({"type": "message", "channel_type": "channel", "user": user,
+                                    "channel": channel, "ts": ts, "text": text, "client_msg_id": f"msg-{i}"}))
+            recent_threads.append((channel, ts))
+        elif roll < 0.65:
+            corpus.append(envelope({"type": "message", "channel_type": "channel", "user": user,
+                                    "channel": channel, "ts": ts, "text": rng.choice(CHATTER),
+                                    "client_msg_id": f"msg-{i}"}))
+        elif roll < 0.75 and recent_threads:
+            thread_channel, thread_ts = rng.choice(recent_threads[-20:])
+            corpus.append(envelope({"type": "message", "channel_type": "channel", "user": user,
+                                    "channel": thread_channel, "ts": ts, "thread_ts": thread_ts,
+                                    "text": "try restarting it, that usually works", "client_msg_id": f"msg-{i}"}))
+        elif roll < 0.9:
+            corpus.append({"command": "/ask", "text": question, "user_id": user, "channel_id": channel,
+                           "team_id": TEAM_ID, "response_url": response_url, "trigger_id": f"trigger-{i}"})
+        else:
+            corpus.append({"command": "/history", "text": "", "user_id": user, "channel_id": channel,
+                           "team_id": TEAM_ID, "response_url": response_url, "trigger_id": f"trigger-{i}"})
+
+        # Slack redelivers a small share of events
+        if corpus[-1].get("type") == "event_callback" and rng.random() < 0.02:
+            corpus.append(corpus[-1])
+
+    return corpus
+
+
+def payload_kind(payload: Dict) -> str:
+    if "command" in payload:
+        return payload["command"]
+    event = payload.get("event", {})
+    if event.get("type") == "message" and event.get("thread_ts"):
+        return "message (thread reply)"
+    return event.get("type", "unknown")
+
+
+class TrackingExecutor(Executor):
+    """Wraps the bot's listener pool and records which futures each dispatching thread started"""
+
+    def __init__(self, executor: Executor):
+        self.executor = executor
+        self._local = threading.local()
+
+    def track(self) -> List:
+        self._local.futures = []
+        return self._local.futures
+
+    def submit(self, fn, *args, **kwargs):
+        future = self.executor.submit(fn, *args, **kwargs)
+        futures = getattr(self._local, "futures", None)
+        if futures is not None:
+            futures.append(future)
+        return future
+
+    def shutdown(self, wait: bool = True, **kwargs) -> None:
+        self.executor.shutdown(wait=wait, **kwargs)
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Nearest-rank percentiles in milliseconds"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def rank(p: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered) * 1000,
+        "p50": rank(50),
+        "p95": rank(95),
+        "p99": rank(99),
+        "max": ordered[-1] * 1000,
+    }
+
+
+def rss_kb() -> int:
+    """Current resident set size (falls back to the peak where /proc is unavailable)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def git_revision() -> Optional[str]:
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return f"{revision}-dirty" if dirty else revision
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_bot(name: str, slack: FakeSlackServer, openai: Optional[FakeOpenAIServer], knowledge_base_file: str):
+    """Import a bot module wired to the local stand-ins"""
+    os.environ.update({
+        "SLACK_BOT_TOKEN": "xoxb-replay",
+        "SLACK_SIGNING_SECRET": "replay-secret",
+        "SLACK_API_URL": slack.base_url,
+        "KNOWLEDGE_BASE_FILE": knowledge_base_file,
+    })
+    if openai is not None:
+        os.environ.update({"OPENAI_API_KEY": "replay", "OPENAI_BASE_URL": openai.base_url})
+    else:
+        os.environ.pop("OPENAI_API_KEY", None)
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    os.environ.setdefault("KB_RELOAD_INTERVAL", "0")
+    return importlib.import_module(name)
+
+
+def check_answers(bot, knowledge_base: Dict, count: int = 20) -> None:
+    """Fail the run unless the bot answers its own knowledge base questions from the knowledge base.
+
+    A handler that raises inside a listener is only logged by Bolt and the
+    payload still acks with 200, so a broken lookup would otherwise go
+    unnoticed in the report.
+    """
+    for topic, data in list(knowledge_base.items())[:count]:
+        try:
+            match = bot.response_handler.find_best_match(data["question"])
+        except Exception as e:
+            raise SystemExit(f"{bot.__name__} failed to look up {data['question']!r}: {e!r}")
+        if not match or match["topic"] == "ai_generated":
+            raise SystemExit(f"{bot.__name__} did not answer {data['question']!r} from the knowledge base")
+
+
+def reply_delay(bot) -> float:
+    """How long the bot holds back its delayed replies"""
+    return float(getattr(getattr(bot, "Config", None), "RESPONSE_DELAY", 0))
+
+
+def drain(bot, timeout: float) -> None:
+    """Let delayed and queued replies go out and flush conversation memory"""
+    scheduler = getattr(bot, "reply_scheduler", None)
+    deadline = time.monotonic() + timeout
+    while scheduler is not None and scheduler.stats()["pending"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    outbound = getattr(bot, "outbound", None)
+    while outbound is not None and time.monotonic() < deadline:
+        stats = outbound.stats()
+        if not stats["queued"] and not stats["in_flight"]:
+            break
+        time.sleep(0.05)
+    memory = getattr(bot, "conversation_memory", None)
+    if memory is not None and memory.store is not None:
+        memory.store.flush()
+
+
+def replay(args) -> Dict:
+    knowledge_base_file = os.path.abspath(args.knowledge_base)
+    corpus_file = os.path.abspath(args.corpus) if args.corpus else None
+    save_corpus = os.path.abspath(args.save_corpus) if args.save_corpus else None
+    workdir = tempfile.mkdtemp(prefix="helpbot-replay-")
+    # Memory files and the AI cache are created relative to the working directory
+    os.chdir(workdir)
+
+    slack = FakeSlackServer(delay=args.slack_delay, error_rate=args.slack_error_rate).start()
+    openai = None
+    if args.bot == "bot_ai" and not args.no_ai:
+        openai = FakeOpenAIServer(delay=args.openai_delay, error_rate=args.openai_error_rate).start()
+
+    response_url = slack.response_url("command")
+    if corpus_file:
+        corpus = load_corpus(corpus_file)
+        for payload in corpus:
+            if "command" in payload:
+                payload["response_url"] = response_url
+    else:
+        corpus = make_corpus(load_knowledge_base(knowledge_base_file), args.events, args.seed, response_url)
+    if save_corpus:
+        with open(save_corpus, "w") as f:
+            for payload in corpus:
+                f.write(json.dumps(payload) + "\n")
+
+    from slack_bolt.request import BoltRequest
+
+    bot = load_bot(args.bot, slack, openai, knowledge_base_file)
+    check_answers(bot, load_knowledge_base(knowledge_base_file))
+    runner = bot.app._listener_runner
+    executor = TrackingExecutor(runner.listener_executor)
+    runner.listener_executor = executor
+
+    latencies = defaultdict(list)
+    statuses = defaultdict(lambda: defaultdict(int))
+    lock = threading.Lock()
+
+    def send(payload: Dict, record: bool = True) -> None:
+        futures = executor.track()
+        start = time.perf_counter()
+        response = bot.app.dispatch(BoltRequest(body=payload, mode="socket_mode"))
+        wait(futures)
+        elapsed = time.perf_counter() - start
+        if record:
+            kind = payload_kind(payload)
+            with lock:
+                latencies[kind].append(elapsed)
+                statuses[kind][str(response.status)] += 1
+
+    warmup, measured = corpus[:args.warmup], corpus[args.warmup:]
+    for payload in warmup:
+        send(payload, record=False)
+    drain(bot, timeout=reply_delay(bot) + 120)
+
+    slack_before = dict(slack.calls)
+    openai_before = openai.requests if openai else 0
+    gc.collect()
+    rss_start = rss_kb()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="replay") as pool:
+        list(pool.map(send, measured))
+    elapsed = time.perf_counter() - start
+
+    drain(bot, timeout=reply_delay(bot) + 120)
+    gc.collect()
+    rss_end = rss_kb()
+
+    all_latencies = [sample for samples in latencies.values() for sample in samples]
+    report = {
+        "commit": git_revision(),
+        "bot": args.bot,
+        "settings": {
+            "payloads": len(measured),
+            "warmup": len(warmup),
+            "concurrency": args.concurrency,
+            "seed": None if corpus_file else args.seed,
+            "corpus": corpus_file,
+            "slack_delay": args.slack_delay,
+            "slack_error_rate": args.slack_error_rate,
+            "openai_delay": args.openai_delay if openai else None,
+            "openai_error_rate": args.openai_error_rate if openai else None,
+        },
+        "seconds": elapsed,
+        "throughput_per_second": len(measured) / elapsed if elapsed else 0.0,
+        "latency_ms": dict({"all": percentiles(all_latencies)},
+                           **{kind: percentiles(samples) for kind, samples in sorted(latencies.items())}),
+        "status_codes": {kind: dict(codes) for kind, codes in sorted(statuses.items())},
+        "slack_calls": {method: count - slack_before.get(method, 0)
+                        for method, count in sorted(slack.calls.items()) if count - slack_before.get(method, 0)},
+        "openai_calls": (openai.requests - openai_before) if openai else 0,
+        "memory_kb": {
+            "rss_start": rss_start,
+            "rss_end": rss_end,
+            "growth": rss_end - rss_start,
+            "peak": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+    }
+
+    executor.shutdown(wait=True)
+    slack.stop()
+    if openai:
+        openai.stop()
+    return report
+
+
+# (key, label, True if higher is better)
+COMPARED = [
+    (("throughput_per_second",), "throughput /s", True),
+    (("latency_ms", "all", "p50"), "p50 ms", False),
+    (("latency_ms", "all", "p95"), "p95 ms", False),
+    (("latency_ms", "all", "p99"), "p99 ms", False),
+    (("memory_kb", "growth"), "RSS growth KB", False),
+]
+
+
+def compare(baseline: Dict, report: Dict) -> None:
+    print(f"\n{'':<16}{'baseline':>14}{'current':>14}{'change':>10}   ({baseline.get('commit')} -> {report.get('commit')})")
+    for path, label, higher_is_better in COMPARED:
+        old, new = baseline, report
+        for key in path:
+            old, new = (old or {}).get(key), (new or {}).get(key)
+        if old is None or new is None:
+            continue
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"{label:<16}{old:>14.2f}{new:>14.2f}{change:>10}")
+    if baseline.get("settings") != report.get("settings"):
+        print("note: settings differ between the two runs")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--bot", choices=BOTS, default="bot_basic")
+    parser.add_argument("--corpus", help="JSONL file of Slack payloads (default: generated)")
+    parser.add_argument("--events", type=int, default=2000, help="payloads to generate without --corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-corpus", help="write the corpus used to this JSONL file")
+    parser.add_argument("--knowledge-base", default=os.path.join(REPO_ROOT, "knowledge_base.json"))
+    parser.add_argument("--warmup", type=int, default=50, help="leading payloads replayed but not measured")
+    parser.add_argument("--concurrency", type=int, default=8, help="payloads dispatched at once")
+    parser.add_argument("--slack-delay", type=float, default=0.01, help="seconds per Slack API call")
+    parser.add_argument("--slack-error-rate", type=float, default=0.0)
+    parser.add_argument("--openai-delay", type=float, default=0.3, help="seconds per OpenAI call")
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--no-ai", action="store_true", help="run bot_ai without an OpenAI key")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    report = replay(args)
+    print(json.dumps(report, indent=2))
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+    if baseline:
+        compare(baseline, report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import json
+import random
+from typing import Dict, List
+
+from utils.helpers import load_knowledge_base
+
+WORDS = [
+    "account", "badge", "benefits", "billing", "calendar", "laptop", "printer",
+    "payroll", "onboarding", "parking", "security", "training", "travel",
+    "vpn", "email", "monitor", "desk", "license", "contract", "insurance",
+    "invoice", "budget", "access", "phone", "backup", "server", "storage",
+    "kitchen", "visitor", "shipping", "ticket", "deadline", "review", "policy",
+]
+
+
+def make_knowledge_base(size: int, seed: int = 0) -> Dict:
+    """Build a synthetic knowledge base of `size` entries on top of the real one"""
+    rng = random.Random(seed)
+    knowledge_base = dict(load_knowledge_base("knowledge_base.json"))
+
+    for i in range(size - len(knowledge_base)):
+        words = rng.sample(WORDS, 3)
+        knowledge_base[f"topic_{i}"] = {
+            "question": f"{words[0]} {words[1]} {i}",
+            "answer": f"Synthetic answer {i} about {' '.join(words)}.",
+            "keywords": [f"{word}{i}" for word in words],
+        }
+
+    return knowledge_base
+
+
+def make_questions(knowledge_base: Dict, count: int, seed: int = 1) -> List[str]:
+    """Mix of questions that hit keywords, hit a question string or miss everything"""
+    rng = random.Random(seed)
+    topics = list(knowledge_base.keys())
+    questions = []
+
+    for i in range(count):
+        data = knowledge_base[rng.choice(topics)]
+        kind = i % 3
+        if kind == 0 and data["keywords"]:
+            questions.append(f"hey does anyone know about {rng.choice(data['keywords'])} today")
+        elif kind == 1:
+            questions.append(f"where can i read about {data['question']} please")
+        else:
+            questions.append(f"is the {rng.choice(WORDS)} situation sorted out yet")
+
+    return questions
+
+
+def load_corpus(path: str) -> List[Dict]:
+    """Read a JSONL file into a list of dicts"""
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -3,106 +3,100 @@ import time
 import logging
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
-from openai import OpenAI
+from slack_sdk import WebClient
 
 from config import Config
-from utils.helpers import load_knowledge_base, setup_logging
-from utils.response_handler import ResponseHandler
+from utils.helpers import setup_logging
+from utils.kb_snapshot import load_knowledge_base_snapshot
+from utils.response_cache import AIResponseCache
+from utils.circuit_breaker import CircuitBreaker
+from utils.ai_handler import AIResponseHandler
+from utils.match_memo import create_match_memo
+from utils.fuzzy_index import create_fuzzy_index
+from utils.kb_reloader import KnowledgeBaseReloader
+from utils.slack_outbound import SlackOutbound, StreamingReply, log_failure
+from utils.metrics import set_handler, start_metrics_server
+from utils.work_queue import PriorityExecutor, prioritize_requests
+from utils.event_dedup import create_event_deduplicator, event_keys
 
 # Setup logging
 setup_logging(Config.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
+# Listeners run explicit requests (mentions, /ask, /history) ahead of passive auto-replies,
+# which are shed first when the bot falls behind
+listener_executor = PriorityExecutor(Config.LISTENER_WORKERS, Config.SHED_QUEUE_DEPTH, Config.SHED_MAX_WAIT)
+
 # Initialize Slack app
 app = App(
-    token=Config.SLACK_BOT_TOKEN,
-    signing_secret=Config.SLACK_SIGNING_SECRET
+    client=WebClient(token=Config.SLACK_BOT_TOKEN, base_url=Config.SLACK_API_URL),
+    signing_secret=Config.SLACK_SIGNING_SECRET,
+    listener_executor=listener_executor
 )
+app.use(prioritize_requests)
 
-# Initialize OpenAI client
-openai_client = OpenAI(api_key=Config.OPENAI_API_KEY) if Config.OPENAI_API_KEY else None
+# Initialize OpenAI client (the openai package is only imported when AI is configured)
+openai_client = None
+if Config.OPENAI_API_KEY:
+    from openai import OpenAI
+    openai_client = OpenAI(api_key=Config.OPENAI_API_KEY, base_url=Config.OPENAI_BASE_URL)
 
-# Load knowledge base
-knowledge_base = load_knowledge_base(Config.KNOWLEDGE_BASE_FILE)
+# Load knowledge base, with its prebuilt retrieval engine and semantic index from the snapshot when current
+kb_snapshot = load_knowledge_base_snapshot(
+    Config.KNOWLEDGE_BASE_FILE, Config.KB_SNAPSHOT_FILE, scoring=Config.RETRIEVAL_ENGINE,
+    semantic=Config.SEMANTIC_MATCHING
+)
+knowledge_base = kb_snapshot.knowledge_base
 
-class AIResponseHandler(ResponseHandler):
-    def __init__(self, knowledge_base: Dict, openai_client, confidence_threshold: float = 0.3):
-        super().__init__(knowledge_base, confidence_threshold)
-        self.openai_client = openai_client
-    
-    def get_ai_response(self, question: str, context: str = "") -> Optional[str]:
-        """Get AI-generated response for questions not in knowledge base"""
-        if not self.openai_client:
-            return None
-            
-        try:
-            prompt = f"""You are a helpful workplace assistant. Answer this question based on the context provided. If you're not sure, say so.
+# Cache AI answers across restarts; entries are tied to this knowledge base version
+response_cache = None
+if openai_client and Config.AI_CACHE_FILE:
+    response_cache = AIResponseCache(
+        Config.AI_CACHE_FILE, Config.AI_CACHE_SIZE, Config.AI_CACHE_TTL, kb_snapshot.version
+    )
 
-Context: {context}
-Question: {question}
+# Initialize AI response handler
+response_handler = AIResponseHandler(
+    knowledge_base, openai_client, Config.CONFIDENCE_THRESHOLD, Config.RETRIEVAL_ENGINE, response_cache,
+    Config.AI_MAX_CONCURRENCY, Config.AI_TIMEOUT,
+    CircuitBreaker(Config.AI_BREAKER_FAILURES, Config.AI_TIMEOUT / 2, Config.AI_BREAKER_RESET),
+    kb_snapshot.retrieval_engine, create_match_memo(Config.MATCH_MEMO_SIZE, "ai"),
+    create_fuzzy_index(knowledge_base, Config.FUZZY_MATCHING), kb_snapshot.semantic_index
+)
 
-Provide a brief, helpful answer:"""
+# Replies go through one queue: pooled connections, Slack rate limits, retries
+outbound = SlackOutbound(Config.SLACK_BOT_TOKEN, Config.SLACK_API_URL, Config.SLACK_OUTBOUND_WORKERS)
 
-            response = self.openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "You are a helpful workplace assistant. Keep answers brief, professional, and helpful. If you're uncertain, direct users to contact support."
-                    },
-                    {
-                        "role": "user", 
-                        "content": prompt
-                    }
-                ],
-                max_tokens=150,
-                temperature=0.7
-            )
-            
-            return response.choices[0].message.content.strip()
-            
-        except Exception as e:
-            logger.error(f"OpenAI API error: {e}")
-            return None
-    
-    def find_best_match(self, question: str) -> Optional[Dict]:
-        """Find best match with AI fallback"""
-        # First try knowledge base
-        kb_match = super().find_best_match(question)
-        
-        if kb_match:
-            return kb_match
-        
-        # If no good KB match and AI is available, try AI
-        if self.openai_client:
-            ai_response = self.get_ai_response(question)
-            if ai_response:
-                return {
-                    "answer": f"{ai_response}\n\n_This is an AI-generated response. For official policies, please verify with the relevant department._",
-                    "score": 0.5,  # Medium confidence for AI responses
-                    "topic": "ai_generated"
-                }
-        
-        return None
+# Each Slack message is processed at most once, across retries and mention/message double delivery
+event_dedup = create_event_deduplicator(Config.SHARED_STATE_FILE, Config.EVENT_DEDUP_TTL, Config.EVENT_DEDUP_SIZE)
 
-# Initialize AI response handler
-response_handler = AIResponseHandler(knowledge_base, openai_client, Config.CONFIDENCE_THRESHOLD)
-
-# Reuse the same event handlers from bot_basic.py
-# (You can copy the event handlers from bot_basic.py here)
+# Edits to the knowledge base file are picked up without restarting the bot
+kb_reloader = KnowledgeBaseReloader(
+    Config.KNOWLEDGE_BASE_FILE, knowledge_base, [response_handler], Config.KB_RELOAD_INTERVAL
+)
 
 @app.event("app_mention")
-def handle_mentions(event, say):
+def handle_mentions(event, say, body):
     """Handle when the bot is mentioned"""
+    set_handler("mention")
+    reply = None
     try:
+        if not event_dedup.claim(event_keys(event, body)):
+            logger.info(f"Skipping duplicate delivery of mention {event.get('ts')}")
+            return
+        
         text = event["text"]
         user = event["user"]
         channel = event["channel"]
         
         logger.info(f"Bot mentioned by user {user} in channel {channel}")
         
-        # Find the best answer
-        match = response_handler.find_best_match(text)
+        # Find the best answer; an AI answer is shown while it is being written
+        if Config.AI_STREAMING and openai_client:
+            reply = StreamingReply(outbound, channel, f"Hi <@{user}>! ", interval=Config.AI_STREAM_INTERVAL)
+            match = response_handler.find_best_match_streaming(text, reply.update)
+        else:
+            match = response_handler.find_best_match(text)
         
         if match:
             if match["topic"] == "ai_generated":
@@ -114,19 +108,45 @@ def handle_mentions(event, say):
             response_text = f"Hi <@{user}>! I'm not sure about that. Please contact IT support or check the company documentation."
             logger.info(f"No good match found for question: {text}")
         
-        say(response_text)
+        if reply and reply.started:
+            log_failure(reply.finish(response_text), f"Answer to {user} in {channel}")
+        else:
+            log_failure(outbound.post_message(channel, response_text), f"Answer to {user} in {channel}")
         
     except Exception as e:
         logger.error(f"Error handling mention: {e}")
-        say("Sorry, I encountered an error processing your request.")
+        error_text = "Sorry, I encountered an error processing your request."
+        if reply and reply.started:
+            # Replace the placeholder (or the partial answer) rather than leave it above the apology
+            reply.finish(error_text)
+        else:
+            say(error_text)
 
-# ... (Include all the other event handlers from bot_basic.py)
+@app.command("/reload-kb")
+def handle_reload_kb_command(ack, respond, command):
+    """Reload the knowledge base file"""
+    ack()
+    
+    logger.info(f"Knowledge base reload requested by user {command['user_id']}")
+    
+    summary = kb_reloader.reload()
+    if summary is None:
+        respond("Couldn't reload the knowledge base, the file is missing, not valid JSON or has an invalid entry. The current version is still in use.")
+        return
+    
+    respond(
+        f"Knowledge base reloaded in {summary['seconds'] * 1000:.0f} ms: {summary['entries']} entries "
+        f"({summary['added']} added, {summary['removed']} removed, {summary['changed']} changed)"
+    )
 
 if __name__ == "__main__":
     if openai_client:
         logger.info("Starting AI-Powered Help Bot...")
     else:
         logger.info("Starting Help Bot (AI not configured)...")
+    kb_reloader.start()
+    if Config.METRICS_PORT:
+        start_metrics_server(Config.METRICS_PORT)
     
     handler = SocketModeHandler(app, Config.SLACK_APP_TOKEN)
     handler.start()
\ No newline at end of file
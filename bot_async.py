@@ -0,0 +1,253 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from slack_bolt.async_app import AsyncApp
+from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
+from slack_sdk.web.async_client import AsyncWebClient
+
+from config import Config
+from utils.helpers import setup_logging
+from utils.kb_snapshot import load_knowledge_base_snapshot
+from utils.response_cache import AIResponseCache
+from utils.circuit_breaker import CircuitBreaker
+from utils.ai_handler import AsyncAIResponseHandler
+from utils.match_memo import create_match_memo
+from utils.fuzzy_index import create_fuzzy_index
+from utils.conversation_memory import ConversationMemory
+from utils.memory_store import create_memory_store
+from utils.reply_scheduler import AsyncReplyScheduler
+from utils.kb_reloader import KnowledgeBaseReloader
+from utils.slack_outbound import AsyncSlackOutbound, SlackOutbound, log_failure
+from utils.metrics import set_handler, start_metrics_server, timed
+from utils.event_dedup import create_event_deduplicator, event_keys, mentions_user
+
+# Setup logging
+setup_logging(Config.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+# Initialize Slack app (AsyncApp uses the async Slack web client)
+app = AsyncApp(
+    client=AsyncWebClient(token=Config.SLACK_BOT_TOKEN, base_url=Config.SLACK_API_URL),
+    signing_secret=Config.SLACK_SIGNING_SECRET
+)
+
+# Initialize OpenAI client (the openai package is only imported when AI is configured)
+openai_client = None
+if Config.OPENAI_API_KEY:
+    from openai import AsyncOpenAI
+    openai_client = AsyncOpenAI(api_key=Config.OPENAI_API_KEY, base_url=Config.OPENAI_BASE_URL)
+
+# Load knowledge base (with its prebuilt retrieval engine and semantic index, from the snapshot when current) and handlers
+kb_snapshot = load_knowledge_base_snapshot(
+    Config.KNOWLEDGE_BASE_FILE, Config.KB_SNAPSHOT_FILE, scoring=Config.RETRIEVAL_ENGINE,
+    semantic=Config.SEMANTIC_MATCHING
+)
+knowledge_base = kb_snapshot.knowledge_base
+
+# Cache AI answers across restarts; entries are tied to this knowledge base version
+response_cache = None
+if openai_client and Config.AI_CACHE_FILE:
+    response_cache = AIResponseCache(
+        Config.AI_CACHE_FILE, Config.AI_CACHE_SIZE, Config.AI_CACHE_TTL, kb_snapshot.version
+    )
+
+response_handler = AsyncAIResponseHandler(
+    knowledge_base, openai_client, Config.CONFIDENCE_THRESHOLD, Config.RETRIEVAL_ENGINE, response_cache,
+    Config.AI_MAX_CONCURRENCY, Config.AI_TIMEOUT,
+    CircuitBreaker(Config.AI_BREAKER_FAILURES, Config.AI_TIMEOUT / 2, Config.AI_BREAKER_RESET),
+    kb_snapshot.retrieval_engine, create_match_memo(Config.MATCH_MEMO_SIZE, "async"),
+    create_fuzzy_index(knowledge_base, Config.FUZZY_MATCHING), kb_snapshot.semantic_index
+)
+conversation_memory = ConversationMemory(
+    create_memory_store(Config.MEMORY_BACKEND), Config.MEMORY_READ_THROUGH, knowledge_base, Config.MEMORY_MAX_USERS
+)
+# Replies go through one queue: pooled connections, Slack rate limits, retries
+outbound = SlackOutbound(Config.SLACK_BOT_TOKEN, Config.SLACK_API_URL, Config.SLACK_OUTBOUND_WORKERS)
+reply_scheduler = AsyncReplyScheduler(AsyncSlackOutbound(outbound))
+
+# Each Slack message is processed at most once, across retries and mention/message double delivery
+event_dedup = create_event_deduplicator(Config.SHARED_STATE_FILE, Config.EVENT_DEDUP_TTL, Config.EVENT_DEDUP_SIZE)
+
+# Edits to the knowledge base file are picked up without restarting the bot
+kb_reloader = KnowledgeBaseReloader(
+    Config.KNOWLEDGE_BASE_FILE, knowledge_base, [response_handler, conversation_memory], Config.KB_RELOAD_INTERVAL
+)
+
+# Memory writes touch the disk, so they run on a small fixed pool off the event loop
+memory_executor = ThreadPoolExecutor(max_workers=Config.ASYNC_MEMORY_WORKERS, thread_name_prefix="memory")
+
+async def remember(user: str, question: str, response: str):
+    """Store a conversation without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    with timed("memory_write"):
+        await loop.run_in_executor(memory_executor, conversation_memory.add_conversation, user, question, response)
+
+async def answer_question(text: str, user: str) -> str:
+    """Find an answer (knowledge base first, then AI) and format it for Slack"""
+    match = await response_handler.find_best_match_async(text)
+
+    if match:
+        logger.info(f"Responding with answer for topic: {match['topic']} (score: {match['score']:.2f})")
+        return f"Hi <@{user}>! {match['answer']}"
+
+    logger.info(f"No good match found for question: {text}")
+    return f"Hi <@{user}>! I'm not sure about that. Please contact IT support or check the company documentation."
+
+@app.event("app_mention")
+async def handle_mentions(event, say, body):
+    """Handle when the bot is mentioned"""
+    set_handler("mention")
+    try:
+        if not event_dedup.claim(event_keys(event, body)):
+            logger.info(f"Skipping duplicate delivery of mention {event.get('ts')}")
+            return
+
+        text = event["text"]
+        user = event["user"]
+        channel = event["channel"]
+
+        logger.info(f"Bot mentioned by user {user} in channel {channel}")
+
+        response = await answer_question(text, user)
+        await remember(user, text, response)
+        log_failure(outbound.post_message(channel, response), f"Answer to {user} in {channel}")
+
+    except Exception as e:
+        logger.error(f"Error handling mention: {e}")
+        await say("Sorry, I encountered an error processing your request.")
+
+@app.event("message")
+async def handle_messages(event, body, context):
+    """Monitor messages for help requests"""
+    set_handler("message")
+    try:
+        # Someone replied in a thread we're about to auto-answer, so let their answer stand
+        if event.get("thread_ts") and event.get("thread_ts") != event.get("ts"):
+            reply_scheduler.cancel(
+                event.get("channel"), event["thread_ts"], answered_by=event.get("user"), reply_ts=event.get("ts"),
+                from_bot=bool(event.get("bot_id")) or event.get("user") == context.bot_user_id
+            )
+
+        # Skip bot messages, messages without text, or edits
+        if (event.get("subtype") in ["bot_message", "message_changed"] or
+            not event.get("text")):
+            return
+
+        text = event["text"]
+        user = event["user"]
+        channel = event["channel"]
+
+        # Messages that @-mention the bot are answered by handle_mentions
+        if mentions_user(text, context.bot_user_id):
+            return
+
+        if not event_dedup.claim(event_keys(event, body)):
+            return
+
+        with timed("is_help_request"):
+            is_help_request = response_handler.is_help_request(text)
+
+        if is_help_request:
+            logger.info(f"Detected help request from user {user} in channel {channel}")
+
+            response = await answer_question(text, user)
+            await remember(user, text, response)
+
+            enhanced_response = (
+                f"{response}\n\n"
+                f"_💡 Pro tip: You can also mention me with `@{Config.BOT_NAME}` for faster help!_"
+            )
+
+            thread_ts = event.get("thread_ts") or event.get("ts")
+            reply_scheduler.schedule(
+                channel, thread_ts, enhanced_response, Config.RESPONSE_DELAY, requester=user, asked_ts=event.get("ts")
+            )
+
+    except Exception as e:
+        logger.error(f"Error handling message: {e}")
+
+@app.command("/ask")
+async def handle_ask_command(ack, respond, command):
+    """Handle /ask slash command"""
+    await ack()
+    set_handler("ask")
+
+    question = command["text"]
+    user_id = command["user_id"]
+
+    logger.info(f"Slash command /ask from user {user_id}: {question}")
+
+    if not question:
+        await respond("Please ask a question after the /ask command. Example: `/ask how to reset password`")
+        return
+
+    response = await answer_question(question, user_id)
+    await remember(user_id, question, response)
+    with timed("slack_post"):
+        await respond(response)
+
+@app.command("/history")
+async def handle_history_command(ack, respond, command):
+    """Show conversation history for the user"""
+    await ack()
+
+    user_id = command["user_id"]
+    history = conversation_memory.get_user_history(user_id)
+
+    if not history:
+        await respond("You haven't had any conversations with me yet. Ask me something using `/ask` or by mentioning me!")
+        return
+
+    history_text = "*Your recent conversations with me:*\n\n"
+
+    for i, conv in enumerate(reversed(history[-5:]), 1):  # Show last 5 conversations
+        question = conv["question"][:100] + "..." if len(conv["question"]) > 100 else conv["question"]
+        history_text += f"{i}. *You asked:* {question}\n"
+
+    history_text += "\n_Need more help? Just ask!_"
+
+    await respond(history_text)
+
+@app.command("/reload-kb")
+async def handle_reload_kb_command(ack, respond, command):
+    """Reload the knowledge base file"""
+    await ack()
+
+    logger.info(f"Knowledge base reload requested by user {command['user_id']}")
+
+    # Parsing and re-indexing are CPU work, keep them off the event loop
+    summary = await asyncio.get_running_loop().run_in_executor(None, kb_reloader.reload)
+    if summary is None:
+        await respond("Couldn't reload the knowledge base, the file is missing, not valid JSON or has an invalid entry. The current version is still in use.")
+        return
+
+    await respond(
+        f"Knowledge base reloaded in {summary['seconds'] * 1000:.0f} ms: {summary['entries']} entries "
+        f"({summary['added']} added, {summary['removed']} removed, {summary['changed']} changed)"
+    )
+
+@app.error
+async def global_error_handler(error, body, logger):
+    logger.error(f"Error: {error}")
+    logger.debug(f"Request body: {body}")
+
+async def main():
+    if openai_client:
+        logger.info("Starting AI-Powered Help Bot (asyncio)...")
+    else:
+        logger.info("Starting Help Bot (asyncio, AI not configured)...")
+    kb_reloader.start()
+    if Config.METRICS_PORT:
+        start_metrics_server(Config.METRICS_PORT)
+
+    try:
+        handler = AsyncSocketModeHandler(app, Config.SLACK_APP_TOKEN)
+        await handler.start_async()
+    finally:
+        kb_reloader.close()
+        outbound.close()
+        memory_executor.shutdown(wait=True)
+        conversation_memory.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
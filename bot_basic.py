@@ -1,33 +1,86 @@
 import os
-import time
 import logging
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
+from slack_sdk import WebClient
 
 from config import Config
-from utils.helpers import load_knowledge_base, setup_logging
+from utils.helpers import setup_logging
+from utils.kb_snapshot import load_knowledge_base_snapshot
 from utils.enhanced_handler import EnhancedResponseHandler
+from utils.match_memo import create_match_memo
+from utils.fuzzy_index import create_fuzzy_index
 from utils.conversation_memory import ConversationMemory
+from utils.memory_store import create_memory_store
+from utils.reply_scheduler import ReplyScheduler, SQLiteThreadAnswers
+from utils.event_dedup import create_event_deduplicator, event_keys, mentions_user
+from utils.kb_reloader import KnowledgeBaseReloader
+from utils.kb_router import create_kb_router
+from utils.slack_outbound import SlackOutbound, log_failure
+from utils.metrics import set_handler, start_metrics_server, timed
+from utils.work_queue import PriorityExecutor, prioritize_requests
 
 # Setup logging
 setup_logging(Config.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
+# Listeners run explicit requests (mentions, /ask, /history) ahead of passive auto-replies,
+# which are shed first when the bot falls behind
+listener_executor = PriorityExecutor(Config.LISTENER_WORKERS, Config.SHED_QUEUE_DEPTH, Config.SHED_MAX_WAIT)
+
 # Initialize Slack app
 app = App(
-    token=Config.SLACK_BOT_TOKEN,
-    signing_secret=Config.SLACK_SIGNING_SECRET
+    client=WebClient(token=Config.SLACK_BOT_TOKEN, base_url=Config.SLACK_API_URL),
+    signing_secret=Config.SLACK_SIGNING_SECRET,
+    listener_executor=listener_executor
+)
+app.use(prioritize_requests)
+
+# Load knowledge base and initialize enhanced handlers (the keyword index comes prebuilt from the snapshot)
+kb_snapshot = load_knowledge_base_snapshot(Config.KNOWLEDGE_BASE_FILE, Config.KB_SNAPSHOT_FILE, keyword_index=True)
+knowledge_base = kb_snapshot.knowledge_base
+
+# Channels and teams with their own knowledge base search it too; each one is loaded on first use
+kb_router = create_kb_router(
+    Config.KB_PARTITIONS_FILE,
+    lambda partition: EnhancedResponseHandler(
+        partition, fuzzy_index=create_fuzzy_index(partition, Config.FUZZY_MATCHING)
+    ),
+    Config.KB_PARTITION_MEMORY_MB * 1024 * 1024, Config.KB_RELOAD_INTERVAL
+)
+response_handler = EnhancedResponseHandler(
+    knowledge_base, kb_snapshot.keyword_index, create_match_memo(Config.MATCH_MEMO_SIZE, "enhanced"),
+    create_fuzzy_index(knowledge_base, Config.FUZZY_MATCHING), kb_router
+)
+conversation_memory = ConversationMemory(
+    create_memory_store(Config.MEMORY_BACKEND), Config.MEMORY_READ_THROUGH, knowledge_base, Config.MEMORY_MAX_USERS
 )
 
-# Load knowledge base and initialize enhanced handlers
-knowledge_base = load_knowledge_base(Config.KNOWLEDGE_BASE_FILE)
-response_handler = EnhancedResponseHandler(knowledge_base)
-conversation_memory = ConversationMemory()
+# Replies go through one queue: pooled connections, Slack rate limits, retries
+outbound = SlackOutbound(Config.SLACK_BOT_TOKEN, Config.SLACK_API_URL, Config.SLACK_OUTBOUND_WORKERS)
+
+# Delayed auto-replies are posted from a timer thread instead of sleeping in the listener
+reply_scheduler = ReplyScheduler(
+    outbound, SQLiteThreadAnswers(Config.SHARED_STATE_FILE) if Config.SHARED_STATE_FILE else None
+)
+
+# Each Slack message is processed at most once, across retries and mention/message double delivery
+event_dedup = create_event_deduplicator(Config.SHARED_STATE_FILE, Config.EVENT_DEDUP_TTL, Config.EVENT_DEDUP_SIZE)
+
+# Edits to the knowledge base file are picked up without restarting the bot
+kb_reloader = KnowledgeBaseReloader(
+    Config.KNOWLEDGE_BASE_FILE, knowledge_base, [response_handler, conversation_memory], Config.KB_RELOAD_INTERVAL
+)
 
 @app.event("app_mention")
-def handle_mentions(event, say):
+def handle_mentions(event, say, body):
     """Handle when the bot is mentioned - ENHANCED VERSION"""
+    set_handler("mention")
     try:
+        if not event_dedup.claim(event_keys(event, body)):
+            logger.info(f"Skipping duplicate delivery of mention {event.get('ts')}")
+            return
+        
         text = event["text"]
         user = event["user"]
         channel = event["channel"]
@@ -36,22 +89,31 @@ def handle_mentions(event, say):
         logger.info(f"Question: {text}")
         
         # Get natural, conversational response
-        response = response_handler.get_natural_response(text, user)
+        response = response_handler.get_natural_response(text, user, channel, body.get("team_id"))
         
         # Store conversation in memory
-        conversation_memory.add_conversation(user, text, response)
+        with timed("memory_write"):
+            conversation_memory.add_conversation(user, text, response)
         
         logger.info(f"Responding to user {user}")
-        say(response)
+        log_failure(outbound.post_message(channel, response), f"Answer to {user} in {channel}")
         
     except Exception as e:
         logger.error(f"Error handling mention: {e}")
         say("Sorry, I encountered an error processing your request. Please try again or contact IT support.")
 
 @app.event("message")
-def handle_messages(event, say):
+def handle_messages(event, say, body, context):
     """Monitor messages for help requests - ENHANCED VERSION"""
+    set_handler("message")
     try:
+        # Someone replied in a thread we're about to auto-answer, so let their answer stand
+        if event.get("thread_ts") and event.get("thread_ts") != event.get("ts"):
+            reply_scheduler.cancel(
+                event.get("channel"), event["thread_ts"], answered_by=event.get("user"), reply_ts=event.get("ts"),
+                from_bot=bool(event.get("bot_id")) or event.get("user") == context.bot_user_id
+            )
+        
         # Skip bot messages, messages without text, or edits
         if (event.get("subtype") in ["bot_message", "message_changed"] or 
             not event.get("text")):
@@ -61,18 +123,26 @@ def handle_messages(event, say):
         user = event["user"]
         channel = event["channel"]
         
+        # Messages that @-mention the bot are answered by handle_mentions
+        if mentions_user(text, context.bot_user_id):
+            return
+        
+        if not event_dedup.claim(event_keys(event, body)):
+            return
+        
         # Check if this is a help request
-        if response_handler.is_help_request(text):
+        with timed("is_help_request"):
+            is_help_request = response_handler.is_help_request(text)
+        
+        if is_help_request:
             logger.info(f"Detected help request from user {user} in channel {channel}")
             
             # Get natural response
-            response = response_handler.get_natural_response(text, user)
+            response = response_handler.get_natural_response(text, user, channel, body.get("team_id"))
             
             # Store conversation
-            conversation_memory.add_conversation(user, text, response)
-            
-            # Small delay to make it feel natural
-            time.sleep(Config.RESPONSE_DELAY)
+            with timed("memory_write"):
+                conversation_memory.add_conversation(user, text, response)
             
             # Enhanced response with better formatting
             enhanced_response = (
@@ -80,15 +150,18 @@ def handle_messages(event, say):
                 f"_💡 Pro tip: You can also mention me with `@{Config.BOT_NAME}` for faster help!_"
             )
             
-            # Try to reply in thread, otherwise send to channel
+            # Reply in thread after a small delay to make it feel natural
             thread_ts = event.get("thread_ts") or event.get("ts")
-            app.client.chat_postMessage(
-                channel=channel,
-                text=enhanced_response,
-                thread_ts=thread_ts
+            reply_scheduler.schedule(
+                channel,
+                thread_ts,
+                enhanced_response,
+                Config.RESPONSE_DELAY,
+                requester=user,
+                asked_ts=event.get("ts")
             )
             
-            logger.info(f"Auto-responded to help request from user {user}")
+            logger.info(f"Scheduled auto-response to help request from user {user}")
                 
     except Exception as e:
         logger.error(f"Error handling message: {e}")
@@ -97,6 +170,7 @@ def handle_messages(event, say):
 def handle_ask_command(ack, respond, command):
     """Handle /ask slash command - ENHANCED VERSION"""
     ack()
+    set_handler("ask")
     
     question = command["text"]
     user_id = command["user_id"]
@@ -108,12 +182,16 @@ def handle_ask_command(ack, respond, command):
         return
     
     # Get natural response
-    response = response_handler.get_natural_response(question, user_id)
+    response = response_handler.get_natural_response(
+        question, user_id, command.get("channel_id"), command.get("team_id")
+    )
     
     # Store conversation
-    conversation_memory.add_conversation(user_id, question, response)
+    with timed("memory_write"):
+        conversation_memory.add_conversation(user_id, question, response)
     
-    respond(response)
+    with timed("slack_post"):
+        respond(response)
 
 @app.command("/history")
 def handle_history_command(ack, respond, command):
@@ -141,6 +219,25 @@ def handle_history_command(ack, respond, command):
     
     respond(history_text)
 
+@app.command("/reload-kb")
+def handle_reload_kb_command(ack, respond, command):
+    """Reload the knowledge base file"""
+    ack()
+    
+    logger.info(f"Knowledge base reload requested by user {command['user_id']}")
+    
+    summary = kb_reloader.reload()
+    if kb_router:
+        kb_router.refresh()
+    if summary is None:
+        respond("Couldn't reload the knowledge base, the file is missing, not valid JSON or has an invalid entry. The current version is still in use.")
+        return
+    
+    respond(
+        f"Knowledge base reloaded in {summary['seconds'] * 1000:.0f} ms: {summary['entries']} entries "
+        f"({summary['added']} added, {summary['removed']} removed, {summary['changed']} changed)"
+    )
+
 @app.command("/help")
 def handle_help_command(ack, respond, command):
     """Show help information about the bot"""
@@ -161,6 +258,7 @@ def handle_help_command(ack, respond, command):
 
 *Additional commands:*
 • `/history` - See your recent conversations
+• `/reload-kb` - Reload the knowledge base file
 • `/help` - Show this help message
 
 *I can help with:* IT support, HR policies, software requests, meeting rooms, and much more!
@@ -245,6 +343,9 @@ def global_error_handler(error, body, logger):
 if __name__ == "__main__":
     logger.info("Starting Enhanced Help Bot...")
     logger.info(f"Loaded {len(knowledge_base)} knowledge base entries")
+    kb_reloader.start()
+    if Config.METRICS_PORT:
+        start_metrics_server(Config.METRICS_PORT)
     
     try:
         handler = SocketModeHandler(app, Config.SLACK_APP_TOKEN)
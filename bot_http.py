@@ -0,0 +1,90 @@
+"""HTTP Events API entry point, for running the bot as several worker processes.
+
+Socket Mode keeps the bot in one process. Here Slack posts events and slash
+commands to /slack/events instead, and a pre-fork server (gunicorn, see
+gunicorn_conf.py) spreads them over HTTP_WORKERS processes:
+
+    gunicorn -c gunicorn_conf.py bot_http:application
+
+Every request is checked against SLACK_SIGNING_SECRET by Bolt before any
+listener runs. State the workers must agree on lives in SQLite files in
+WAL mode, each process holding its own connections: conversation memory
+(read through, so /history sees answers given by other workers), the AI
+answer cache, seen Slack events and answered threads.
+
+The metrics endpoint is per process, so it is not started here.
+"""
+import importlib
+import logging
+import os
+from http import HTTPStatus
+from urllib.parse import parse_qsl
+
+# Shared backends by default; must be set before config is imported
+os.environ.setdefault("MEMORY_BACKEND", "sqlite")
+os.environ.setdefault("MEMORY_READ_THROUGH", "1")
+os.environ.setdefault("SHARED_STATE_FILE", "helpbot_shared.db")
+
+from slack_bolt.request import BoltRequest
+
+from config import Config
+
+if not Config.SLACK_SIGNING_SECRET:
+    raise RuntimeError("SLACK_SIGNING_SECRET is required to verify requests in HTTP mode")
+if Config.MEMORY_READ_THROUGH and Config.MEMORY_BACKEND != "sqlite":
+    raise RuntimeError("Only MEMORY_BACKEND=sqlite can be shared between worker processes")
+
+bot = importlib.import_module(Config.HTTP_BOT_MODULE)
+app = bot.app
+logger = logging.getLogger(__name__)
+
+EVENTS_PATH = "/slack/events"
+
+
+def _request_headers(environ) -> dict:
+    headers = {}
+    for key, value in environ.items():
+        if key.startswith("HTTP_"):
+            headers[key[5:].replace("_", "-").lower()] = value
+    if environ.get("CONTENT_TYPE"):
+        headers["content-type"] = environ["CONTENT_TYPE"]
+    return headers
+
+
+def _reply(start_response, status: int, body: str, headers=None):
+    payload = body.encode("utf-8")
+    response_headers = [("Content-Length", str(len(payload)))]
+    for name, values in (headers or {}).items():
+        for value in values:
+            response_headers.append((name, value))
+    start_response(f"{status} {HTTPStatus(status).phrase}", response_headers)
+    return [payload]
+
+
+def application(environ, start_response):
+    """WSGI app: hands Slack's POSTs to Bolt, which verifies the signature and dispatches"""
+    path = environ.get("PATH_INFO", "")
+    method = environ.get("REQUEST_METHOD", "GET")
+
+    if path == "/health" and method == "GET":
+        return _reply(start_response, 200, "ok")
+    if path != EVENTS_PATH or method != "POST":
+        return _reply(start_response, 404, "not found")
+
+    try:
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        length = 0
+    body = environ["wsgi.input"].read(length).decode("utf-8") if length else ""
+
+    bolt_response = app.dispatch(BoltRequest(
+        body=body,
+        query=dict(parse_qsl(environ.get("QUERY_STRING", ""))),
+        headers=_request_headers(environ),
+    ))
+    return _reply(start_response, bolt_response.status, bolt_response.body, bolt_response.headers)
+
+
+# Each worker imports this module itself (no preload), so these threads start per process
+bot.kb_reloader.start()
+logger.info(f"HTTP worker {os.getpid()} serving {Config.HTTP_BOT_MODULE} on {EVENTS_PATH}")
@@ -5,9 +5,12 @@ class Config:
     SLACK_BOT_TOKEN = os.environ.get("SLACK_BOT_TOKEN")
     SLACK_APP_TOKEN = os.environ.get("SLACK_APP_TOKEN")
     SLACK_SIGNING_SECRET = os.environ.get("SLACK_SIGNING_SECRET")
+    # Slack Web API base URL (overridden by the replay benchmark to hit a local stand-in)
+    SLACK_API_URL = os.environ.get("SLACK_API_URL", "https://slack.com/api/")
     
     # OpenAI Configuration
     OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+    OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL")  # None uses the official endpoint
     
     # Bot Configuration
     BOT_NAME = os.environ.get("BOT_NAME", "HelpBot")
@@ -17,5 +20,77 @@ class Config:
     RESPONSE_DELAY = 2  # seconds
     CONFIDENCE_THRESHOLD = 0.3
     
-    # Knowledge Base File
-    KNOWLEDGE_BASE_FILE = "knowledge_base.json"
\ No newline at end of file
+    # Matching engine for ResponseHandler: "" (simple loop), "jaccard" or "tfidf"
+    RETRIEVAL_ENGINE = os.environ.get("RETRIEVAL_ENGINE", "")
+    # Questions whose knowledge base match (topic and score) is remembered until the KB changes (0 disables)
+    MATCH_MEMO_SIZE = int(os.environ.get("MATCH_MEMO_SIZE", "10000"))
+    # Retry unmatched questions with misspelled words corrected towards the knowledge base vocabulary
+    # (off by default: a correction can still turn chit-chat into a knowledge base question)
+    FUZZY_MATCHING = os.environ.get("FUZZY_MATCHING", "0") == "1"
+    # Local hashed n-gram vector search between the keyword pass and the AI fallback (bot_ai, bot_async; needs numpy)
+    SEMANTIC_MATCHING = os.environ.get("SEMANTIC_MATCHING", "1") == "1"
+    
+    # Conversation memory backend: "json" (rewrite file), "log" (append-only) or "sqlite"
+    MEMORY_BACKEND = os.environ.get("MEMORY_BACKEND", "json")
+    # Read histories from the store instead of a per-process copy (needed with several workers; sqlite only)
+    MEMORY_READ_THROUGH = os.environ.get("MEMORY_READ_THROUGH", "") == "1"
+    # Users kept in memory with the log or sqlite backend; idle ones are read back from disk (0 keeps all)
+    MEMORY_MAX_USERS = int(os.environ.get("MEMORY_MAX_USERS", "100000"))
+    
+    # AI answer cache (set AI_CACHE_FILE to an empty string to disable)
+    AI_CACHE_FILE = os.environ.get("AI_CACHE_FILE", "ai_response_cache.db")
+    AI_CACHE_SIZE = int(os.environ.get("AI_CACHE_SIZE", "1000"))
+    AI_CACHE_TTL = int(os.environ.get("AI_CACHE_TTL", "86400"))  # seconds
+    
+    # Maximum concurrent OpenAI calls per process
+    AI_MAX_CONCURRENCY = int(os.environ.get("AI_MAX_CONCURRENCY", "8"))
+    
+    # Deadline for a single OpenAI call, and circuit breaker tuning
+    AI_TIMEOUT = float(os.environ.get("AI_TIMEOUT", "10"))
+    AI_BREAKER_FAILURES = int(os.environ.get("AI_BREAKER_FAILURES", "5"))
+    AI_BREAKER_RESET = float(os.environ.get("AI_BREAKER_RESET", "30"))  # seconds
+    
+    # Post AI answers as they are generated, editing the reply at most once per interval
+    AI_STREAMING = os.environ.get("AI_STREAMING", "1") == "1"
+    AI_STREAM_INTERVAL = float(os.environ.get("AI_STREAM_INTERVAL", "1.0"))  # seconds
+    
+    # Thread pool size for conversation memory writes in bot_async.py
+    ASYNC_MEMORY_WORKERS = int(os.environ.get("ASYNC_MEMORY_WORKERS", "2"))
+    
+    # Threads running Bolt listeners, explicit requests first (see utils/work_queue.py); passive
+    # auto-replies are turned down once this many calls are queued or the average wait passes SHED_MAX_WAIT
+    LISTENER_WORKERS = int(os.environ.get("LISTENER_WORKERS", "5"))
+    SHED_QUEUE_DEPTH = int(os.environ.get("SHED_QUEUE_DEPTH", "100"))
+    SHED_MAX_WAIT = float(os.environ.get("SHED_MAX_WAIT", "5"))  # seconds
+    
+    # Worker threads sending queued Slack API calls (see utils/slack_outbound.py)
+    SLACK_OUTBOUND_WORKERS = int(os.environ.get("SLACK_OUTBOUND_WORKERS", "4"))
+    
+    # Port for the Prometheus /metrics endpoint on 127.0.0.1 (0 disables it)
+    METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+    
+    # Slack event de-duplication window
+    EVENT_DEDUP_TTL = int(os.environ.get("EVENT_DEDUP_TTL", "600"))  # seconds
+    EVENT_DEDUP_SIZE = int(os.environ.get("EVENT_DEDUP_SIZE", "10000"))
+    
+    # SQLite file for state every worker process must agree on (seen events, answered threads);
+    # empty keeps that state in-process, which is only correct with a single process
+    SHARED_STATE_FILE = os.environ.get("SHARED_STATE_FILE", "")
+    
+    # HTTP Events API mode (bot_http.py behind gunicorn)
+    HTTP_BOT_MODULE = os.environ.get("HTTP_BOT_MODULE", "bot_basic")
+    PORT = int(os.environ.get("PORT", "3000"))
+    HTTP_WORKERS = int(os.environ.get("HTTP_WORKERS", "2"))
+    HTTP_THREADS = int(os.environ.get("HTTP_THREADS", "8"))
+    
+    # Knowledge Base File (JSON, or an answer store from `python -m utils.answer_store` that keeps answers on disk)
+    KNOWLEDGE_BASE_FILE = os.environ.get("KNOWLEDGE_BASE_FILE", "knowledge_base.json")
+    # Knowledge base with its indexes prebuilt, rewritten whenever the JSON file changes (empty disables)
+    KB_SNAPSHOT_FILE = os.environ.get("KB_SNAPSHOT_FILE", KNOWLEDGE_BASE_FILE + ".snapshot")
+    # Partition map of per-channel/per-team knowledge bases searched alongside the global one (empty disables);
+    # partitions load on first use and the least recently used are dropped past the memory budget
+    KB_PARTITIONS_FILE = os.environ.get("KB_PARTITIONS_FILE", "")
+    KB_PARTITION_MEMORY_MB = int(os.environ.get("KB_PARTITION_MEMORY_MB", "256"))
+    
+    # Seconds between checks for knowledge base file changes (0 disables the watcher; /reload-kb still works)
+    KB_RELOAD_INTERVAL = float(os.environ.get("KB_RELOAD_INTERVAL", "5"))
\ No newline at end of file
@@ -0,0 +1,15 @@
+"""gunicorn settings for bot_http.py: gunicorn -c gunicorn_conf.py bot_http:application"""
+import os
+
+# Read the environment directly: importing config here would freeze it in the master
+# before bot_http sets its shared-state defaults, and forked workers would inherit that
+bind = f"0.0.0.0:{os.environ.get('PORT', '3000')}"
+workers = int(os.environ.get("HTTP_WORKERS", "2"))
+# Bolt acks and then finishes the listener on its own thread pool, so a few threads per worker are plenty
+worker_class = "gthread"
+threads = int(os.environ.get("HTTP_THREADS", "8"))
+# No preload: every worker opens its own SQLite connections and starts its own background threads
+preload_app = False
+# Slack expects an answer within 3 seconds
+timeout = 30
+graceful_timeout = 10
@@ -0,0 +1,15 @@
+import pytest
+from openai import OpenAI
+
+from benchmarks.fake_openai import FakeOpenAIServer
+
+
+@pytest.fixture
+def fake_openai():
+    with FakeOpenAIServer() as server:
+        yield server
+
+
+@pytest.fixture
+def openai_client(fake_openai):
+    return OpenAI(api_key="test", base_url=fake_openai.base_url, max_retries=0)
@@ -0,0 +1,66 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.ai_handler import AIResponseHandler
+from utils.circuit_breaker import CircuitBreaker
+
+
+def test_answers_through_the_fake_server(fake_openai, openai_client):
+    handler = AIResponseHandler({}, openai_client)
+    assert handler.get_ai_response("what is the meaning of life") == fake_openai.answer
+    assert fake_openai.requests == 1
+
+
+def test_slow_upstream_is_cut_off_at_the_timeout(fake_openai, openai_client):
+    fake_openai.delay = 2.0
+    breaker = CircuitBreaker(failure_threshold=5, slow_call_seconds=1.0, reset_timeout=30)
+    handler = AIResponseHandler({}, openai_client, timeout=0.3, circuit_breaker=breaker)
+
+    start = time.monotonic()
+    assert handler.get_ai_response("a slow question") is None
+    assert time.monotonic() - start < 1.0
+    assert breaker.stats()["failures"] == 1
+
+
+def test_admission_is_capped_at_twice_the_pool(fake_openai, openai_client):
+    fake_openai.delay = 0.5
+    handler = AIResponseHandler({}, openai_client, max_concurrency=1, timeout=5.0)
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        answers = list(pool.map(handler.get_ai_response, [f"question {i}" for i in range(6)]))
+
+    # One call runs and one waits for the pool; the rest are turned away without reaching OpenAI
+    assert fake_openai.requests == 2
+    assert answers.count(fake_openai.answer) == 2
+    assert answers.count(None) == 4
+
+
+def test_breaker_opens_on_failures_and_closes_after_a_good_trial(fake_openai, openai_client):
+    fake_openai.error_rate = 1.0
+    breaker = CircuitBreaker(failure_threshold=2, slow_call_seconds=5.0, reset_timeout=0.2)
+    handler = AIResponseHandler({}, openai_client, circuit_breaker=breaker)
+
+    assert handler.get_ai_response("first failure") is None
+    assert handler.get_ai_response("second failure") is None
+    assert breaker.stats()["state"] == CircuitBreaker.OPEN
+
+    # Open: refused without calling upstream
+    assert handler.get_ai_response("while open") is None
+    assert fake_openai.requests == 2
+
+    fake_openai.error_rate = 0.0
+    time.sleep(0.3)
+    assert handler.get_ai_response("trial call") == fake_openai.answer
+    assert breaker.stats()["state"] == CircuitBreaker.CLOSED
+
+
+def test_half_open_failure_reopens_the_breaker(fake_openai, openai_client):
+    fake_openai.error_rate = 1.0
+    breaker = CircuitBreaker(failure_threshold=1, slow_call_seconds=5.0, reset_timeout=0.2)
+    handler = AIResponseHandler({}, openai_client, circuit_breaker=breaker)
+
+    handler.get_ai_response("failure")
+    time.sleep(0.3)
+    assert handler.get_ai_response("failed trial") is None
+    assert breaker.stats()["state"] == CircuitBreaker.OPEN
+    assert breaker.stats()["times_opened"] == 2
@@ -0,0 +1,49 @@
+import time
+
+import pytest
+from openai import OpenAI
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from utils.ai_handler import AIResponseHandler
+from utils.circuit_breaker import CircuitBreaker
+
+# 20 words at 50 ms each: every answer streams for about a second
+LONG_ANSWER = " ".join(f"word{i}" for i in range(20))
+
+
+@pytest.fixture
+def fake_openai():
+    with FakeOpenAIServer(answer=LONG_ANSWER, token_delay=0.05) as server:
+        yield server
+
+
+def make_handler(server, breaker):
+    client = OpenAI(api_key="test", base_url=server.base_url, max_retries=0)
+    return AIResponseHandler({}, client, timeout=5.0, circuit_breaker=breaker)
+
+
+def test_long_successful_streams_leave_the_breaker_closed(fake_openai):
+    breaker = CircuitBreaker(failure_threshold=3, slow_call_seconds=0.5, reset_timeout=30)
+    handler = make_handler(fake_openai, breaker)
+
+    for i in range(4):
+        start = time.monotonic()
+        # Slack edits take time too, and aren't the upstream's fault
+        answer = handler.stream_ai_response(f"long question {i}", lambda text: time.sleep(0.01))
+        assert time.monotonic() - start > breaker.slow_call_seconds
+        assert answer == LONG_ANSWER
+
+    assert breaker.stats()["state"] == CircuitBreaker.CLOSED
+    assert breaker.stats()["failures"] == 0
+
+
+def test_slow_first_token_counts_against_the_breaker(fake_openai):
+    fake_openai.delay = 0.6
+    breaker = CircuitBreaker(failure_threshold=2, slow_call_seconds=0.5, reset_timeout=30)
+    handler = make_handler(fake_openai, breaker)
+
+    for i in range(2):
+        handler.stream_ai_response(f"slow question {i}", lambda text: None)
+
+    assert breaker.stats()["state"] == CircuitBreaker.OPEN
+    assert handler.stream_ai_response("another question", lambda text: None) is None
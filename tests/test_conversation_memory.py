@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+from utils.conversation_memory import ConversationMemory
+
+START = datetime(2026, 1, 1)
+
+
+class StubStore:
+    """Hands load_memory users in the order a store might: first written first"""
+
+    def __init__(self, memory):
+        self.memory = memory
+
+    def load(self):
+        return self.memory
+
+    def load_user(self, user_id):
+        return self.memory.get(user_id, [])
+
+
+def record(minutes, question="hello"):
+    return {"timestamp": (START + timedelta(minutes=minutes)).isoformat(), "question": question, "response": "hi"}
+
+
+def test_load_keeps_the_most_recently_active_users():
+    store = StubStore({
+        "U_regular": [record(0), record(500)],   # first in the store, yet the newest activity
+        "U_gone": [record(10)],
+        "U_recent": [record(300)],
+        "U_broken": [{"timestamp": "not a date", "question": "?", "response": ""}],
+    })
+    memory = ConversationMemory(store, max_users=2)
+    assert list(memory.memory) == ["U_recent", "U_regular"]
+    assert memory.evictions == 2
+
+
+def test_unbounded_load_keeps_everyone():
+    store = StubStore({"U1": [record(5)], "U2": [record(1)]})
+    memory = ConversationMemory(store)
+    assert sorted(memory.memory) == ["U1", "U2"]
+    assert memory.evictions == 0
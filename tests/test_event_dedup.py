@@ -0,0 +1,64 @@
+import threading
+
+from utils.event_dedup import EventDeduplicator, SQLiteEventDeduplicator, event_keys, mentions_user
+
+MENTION = {"type": "app_mention", "channel": "C1", "ts": "100.1", "client_msg_id": "m-1", "text": "<@UBOT> vpn?"}
+MESSAGE = {"type": "message", "channel": "C1", "ts": "100.1", "client_msg_id": "m-1", "text": "<@UBOT> vpn?"}
+
+
+def test_mention_and_message_of_one_post_are_handled_once():
+    dedup = EventDeduplicator()
+    assert dedup.claim(event_keys(MENTION, {"event_id": "Ev1"}))
+    assert not dedup.claim(event_keys(MESSAGE, {"event_id": "Ev2"}))
+    assert dedup.stats() == {"size": 3, "claimed": 1, "duplicates": 1}
+
+
+def test_slack_retry_of_the_same_delivery_is_a_duplicate():
+    dedup = EventDeduplicator()
+    assert dedup.claim(event_keys(MENTION, {"event_id": "Ev1"}))
+    assert not dedup.claim(event_keys(MENTION, {"event_id": "Ev1"}))
+
+
+def test_only_one_of_many_concurrent_claims_wins():
+    dedup = EventDeduplicator()
+    keys = event_keys(MENTION, {"event_id": "Ev1"})
+    barrier = threading.Barrier(8)
+    results = []
+
+    def claim():
+        barrier.wait()
+        results.append(dedup.claim(keys))
+
+    threads = [threading.Thread(target=claim) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == [False] * 7 + [True]
+
+
+def test_entries_expire_and_size_is_capped():
+    dedup = EventDeduplicator(ttl=0)
+    assert dedup.claim(["event:Ev1"])
+    assert dedup.claim(["event:Ev1"])
+
+    dedup = EventDeduplicator(max_entries=2)
+    for i in range(5):
+        assert dedup.claim([f"event:Ev{i}"])
+    assert dedup.stats()["size"] == 2
+    assert dedup.claim(["event:Ev0"])
+
+
+def test_sqlite_deduplicator_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / "state.db")
+    first, second = SQLiteEventDeduplicator(path), SQLiteEventDeduplicator(path)
+    assert first.claim(event_keys(MENTION, {"event_id": "Ev1"}))
+    assert not second.claim(event_keys(MESSAGE, {"event_id": "Ev2"}))
+    assert second.claim(event_keys(dict(MESSAGE, ts="100.2", client_msg_id="m-2"), {"event_id": "Ev3"}))
+
+
+def test_mentions_user():
+    assert mentions_user("<@UBOT> vpn?", "UBOT")
+    assert mentions_user("hey <@UBOT|helpbot>", "UBOT")
+    assert not mentions_user("<@UOTHER> vpn?", "UBOT")
+    assert not mentions_user("<@UBOT>", None)
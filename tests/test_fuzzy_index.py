@@ -0,0 +1,44 @@
+import pytest
+
+from utils.enhanced_handler import EnhancedResponseHandler
+from utils.fuzzy_index import FuzzyIndex
+from utils.helpers import clean_text, load_knowledge_base
+from utils.response_handler import ResponseHandler
+
+
+@pytest.fixture(scope="module")
+def knowledge_base():
+    return load_knowledge_base("knowledge_base.json")
+
+
+@pytest.fixture(scope="module")
+def fuzzy_index(knowledge_base):
+    return FuzzyIndex(knowledge_base)
+
+
+@pytest.mark.parametrize("question, corrected", [
+    ("i forgot my pasword?", "i forgot my password?"),
+    ("whats the wirelss?", "whats the wireless?"),
+    ("i forgot my pasword", "i forgot my password"),
+])
+def test_misspelled_last_word_is_corrected_with_its_question_mark(fuzzy_index, question, corrected):
+    assert fuzzy_index.correct(question) == (corrected, 1)
+
+
+def test_ordinary_words_are_left_alone(fuzzy_index):
+    assert fuzzy_index.correct("my wife is sick today?") == ("my wife is sick today?", 0)
+
+
+@pytest.mark.parametrize("question, topic", [
+    ("i forgot my pasword?", "password"),
+    ("whats the wirelss?", "wifi"),
+])
+def test_enhanced_handler_matches_misspelled_question(knowledge_base, fuzzy_index, question, topic):
+    handler = EnhancedResponseHandler(knowledge_base, fuzzy_index=fuzzy_index)
+    assert handler.find_best_match(clean_text(question))["topic"] == topic
+
+
+@pytest.mark.parametrize("retrieval", [None, "jaccard", "tfidf"])
+def test_response_handler_matches_misspelled_question(knowledge_base, fuzzy_index, retrieval):
+    handler = ResponseHandler(knowledge_base, retrieval=retrieval, fuzzy_index=fuzzy_index)
+    assert handler.find_best_match("how do i reset my pasword?")["topic"] == "password"
@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.reply_scheduler import (
+    PENDING_REPLIES, AsyncReplyScheduler, ReplyScheduler, SQLiteThreadAnswers
+)
+
+DELAY = 0.2
+
+
+class FakeClient:
+    def __init__(self, error=None):
+        self.error = error
+        self.posts = []
+        self.posted = threading.Event()
+
+    def chat_postMessage(self, channel, text, thread_ts=None):
+        self.posts.append((channel, thread_ts, text))
+        self.posted.set()
+        if self.error:
+            raise self.error
+        return {"ok": True}
+
+
+class FakeAsyncClient(FakeClient):
+    async def chat_postMessage(self, channel, text, thread_ts=None):
+        return FakeClient.chat_postMessage(self, channel, text, thread_ts)
+
+
+def ts(offset: float = 0.0) -> str:
+    return f"{time.time() + offset:.6f}"
+
+
+@pytest.fixture
+def client():
+    return FakeClient()
+
+
+@pytest.fixture
+def scheduler(client):
+    scheduler = ReplyScheduler(client)
+    yield scheduler
+    scheduler.close()
+
+
+def wait_for(scheduler):
+    time.sleep(DELAY * 2)
+    return scheduler.stats()
+
+
+def test_posts_once_the_delay_passes(scheduler, client):
+    asked = ts()
+    scheduler.schedule("C1", asked, "auto answer", DELAY, requester="U1", asked_ts=asked)
+    assert scheduler.stats()["pending"] == 1
+    assert PENDING_REPLIES.labels().value == 1
+    assert client.posted.wait(2)
+    assert client.posts == [("C1", asked, "auto answer")]
+    assert wait_for(scheduler)["dispatched"] == 1
+    assert PENDING_REPLIES.labels().value == 0
+
+
+def test_answer_from_someone_else_cancels(scheduler, client):
+    asked = ts(-1)
+    scheduler.schedule("C1", asked, "auto answer", DELAY, requester="U1", asked_ts=asked)
+    assert scheduler.cancel("C1", asked, answered_by="U2", reply_ts=ts())
+    assert wait_for(scheduler)["cancelled"] == 1
+    assert client.posts == []
+
+
+@pytest.mark.parametrize("answered_by, reply_offset, from_bot", [
+    ("U1", 0, False),    # the requester adding detail
+    ("U2", -5, False),   # an older reply in the thread the question was asked in
+    ("U2", 0, True),     # a bot, the auto-reply itself included
+])
+def test_replies_that_dont_answer_the_question(scheduler, client, answered_by, reply_offset, from_bot):
+    asked = ts(-1)
+    scheduler.schedule("C1", "100.000001", "auto answer", DELAY, requester="U1", asked_ts=asked)
+    assert not scheduler.cancel("C1", "100.000001", answered_by=answered_by, reply_ts=ts(reply_offset),
+                                from_bot=from_bot)
+    assert client.posted.wait(2)
+
+
+def test_answer_handled_before_schedule_still_cancels(scheduler, client):
+    # The help message waited in the listener queue while a colleague's answer was handled
+    asked = ts(-2)
+    assert not scheduler.cancel("C1", asked, answered_by="U2", reply_ts=ts(-1))
+    scheduler.schedule("C1", asked, "auto answer", DELAY, requester="U1", asked_ts=asked)
+    assert wait_for(scheduler)["cancelled"] == 1
+    assert client.posts == []
+
+
+def test_failed_post_is_counted(client):
+    client.error = RuntimeError("channel_not_found")
+    scheduler = ReplyScheduler(client)
+    try:
+        scheduler.schedule("C1", ts(), "auto answer", 0.01, requester="U1")
+        stats = wait_for(scheduler)
+    finally:
+        scheduler.close()
+    assert (stats["dispatched"], stats["failed"]) == (0, 1)
+
+
+def test_answer_seen_by_another_process_cancels(tmp_path, client):
+    path = str(tmp_path / "shared.db")
+    holder = ReplyScheduler(client, SQLiteThreadAnswers(path))
+    other = ReplyScheduler(FakeClient(), SQLiteThreadAnswers(path))
+    try:
+        asked = ts(-1)
+        holder.schedule("C1", asked, "auto answer", DELAY, requester="U1", asked_ts=asked)
+        # The thread reply reaches the other worker, which holds nothing for this thread
+        assert not other.cancel("C1", asked, answered_by="U2", reply_ts=ts())
+        assert wait_for(holder)["cancelled"] == 1
+    finally:
+        holder.close()
+        other.close()
+    assert client.posts == []
+
+
+def test_async_scheduler_applies_the_same_rules():
+    async def main():
+        client = FakeAsyncClient()
+        scheduler = AsyncReplyScheduler(client)
+
+        asked = ts(-1)
+        scheduler.schedule("C1", "1.0", "requester replied", DELAY, requester="U1", asked_ts=asked)
+        assert not scheduler.cancel("C1", "1.0", answered_by="U1", reply_ts=ts())
+        scheduler.schedule("C1", "2.0", "old reply", DELAY, requester="U1", asked_ts=asked)
+        assert not scheduler.cancel("C1", "2.0", answered_by="U2", reply_ts=ts(-5))
+        scheduler.schedule("C1", "3.0", "answered", DELAY, requester="U1", asked_ts=asked)
+        assert scheduler.cancel("C1", "3.0", answered_by="U2", reply_ts=ts())
+        # Answered before schedule() ran
+        scheduler.cancel("C1", "4.0", answered_by="U2", reply_ts=ts())
+        scheduler.schedule("C1", "4.0", "answered early", DELAY, requester="U1", asked_ts=asked)
+
+        await asyncio.sleep(DELAY * 2)
+        return client.posts, scheduler.stats()
+
+    posts, stats = asyncio.run(main())
+    assert [text for _, _, text in posts] == ["requester replied", "old reply"]
+    assert (stats["pending"], stats["dispatched"], stats["cancelled"]) == (0, 2, 2)
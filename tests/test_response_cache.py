@@ -0,0 +1,39 @@
+from utils.ai_handler import AIResponseHandler
+from utils.response_cache import AIResponseCache
+
+
+def test_normalized_repeat_is_answered_from_the_cache(fake_openai, openai_client, tmp_path):
+    cache = AIResponseCache(str(tmp_path / "cache.db"))
+    handler = AIResponseHandler({}, openai_client, response_cache=cache)
+
+    assert handler.get_ai_response("How do I expense a taxi?") == fake_openai.answer
+    # Same question once cleaned: case, mentions and stray punctuation don't make a new key
+    assert handler.get_ai_response("<@U123> how do I EXPENSE a taxi?!") == fake_openai.answer
+    assert fake_openai.requests == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_cache_survives_a_restart(fake_openai, openai_client, tmp_path):
+    path = str(tmp_path / "cache.db")
+    first = AIResponseCache(path, kb_version="v1")
+    AIResponseHandler({}, openai_client, response_cache=first).get_ai_response("who approves travel")
+    first.close()
+
+    second = AIResponseCache(path, kb_version="v1")
+    handler = AIResponseHandler({}, openai_client, response_cache=second)
+    assert handler.get_ai_response("who approves travel") == fake_openai.answer
+    assert fake_openai.requests == 1
+    assert second.stats()["disk_hits"] == 1
+
+
+def test_knowledge_base_change_drops_cached_answers(tmp_path):
+    cache = AIResponseCache(str(tmp_path / "cache.db"), kb_version="v1")
+    cache.set("key", "old answer")
+    cache.set_kb_version("v2")
+    assert cache.get("key") is None
+
+
+def test_expired_answers_are_not_served(tmp_path):
+    cache = AIResponseCache(str(tmp_path / "cache.db"), ttl=0)
+    cache.set("key", "answer")
+    assert cache.get("key") is None
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.ai_handler import AIResponseHandler
+from utils.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_concurrent_identical_questions_share_one_openai_call(fake_openai, openai_client):
+    fake_openai.delay = 0.3
+    handler = AIResponseHandler({}, openai_client, max_concurrency=8)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        answers = list(pool.map(handler.get_ai_response, ["Where is the VPN guide?"] * 8))
+
+    assert answers == [fake_openai.answer] * 8
+    assert fake_openai.requests == 1
+    assert handler.single_flight.stats()["shared"] == 7
+
+
+def test_waiters_get_the_leaders_exception_and_it_is_not_remembered():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("upstream down")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, "key", failing)
+        started.wait(5)
+        waiter = pool.submit(flight.do, "key", lambda: "never called")
+        while flight.stats()["shared"] == 0:
+            pass
+        release.set()
+        for future in (leader, waiter):
+            with pytest.raises(RuntimeError):
+                future.result(5)
+
+    assert flight.do("key", lambda: "fresh") == "fresh"
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_async_waiters_share_one_call():
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        flight = AsyncSingleFlight()
+        return await asyncio.gather(*(flight.do("key", fetch) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["answer"] * 5
+    assert calls == 1
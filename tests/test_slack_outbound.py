@@ -0,0 +1,104 @@
+import time
+
+import pytest
+
+from benchmarks.fake_slack import FakeSlackServer
+from utils.slack_outbound import SlackOutbound, SlackOutboundError, StreamingReply, log_failure
+
+
+@pytest.fixture
+def fake_slack():
+    with FakeSlackServer() as server:
+        yield server
+
+
+def make_outbound(server, **kwargs):
+    kwargs.setdefault("channel_rate", 100.0)
+    kwargs.setdefault("channel_burst", 100)
+    return SlackOutbound("xoxb-test", server.base_url, **kwargs)
+
+
+def test_messages_to_a_channel_go_out_in_order(fake_slack):
+    outbound = make_outbound(fake_slack, workers=4)
+    futures = [outbound.post_message("C1", f"message {i}") for i in range(10)]
+    assert all(future.result(5)["ok"] for future in futures)
+    outbound.close()
+    assert [text for _, _, text in fake_slack.messages] == [f"message {i}" for i in range(10)]
+
+
+def test_rate_limited_call_is_retried_after_retry_after(fake_slack):
+    fake_slack.channel_limit = (1.0, 1)
+    outbound = make_outbound(fake_slack, workers=1)
+    futures = [outbound.post_message("C1", "first"), outbound.post_message("C1", "second")]
+    assert all(future.result(10)["ok"] for future in futures)
+    outbound.close()
+    stats = outbound.stats()
+    assert stats["rate_limited"] >= 1 and stats["failed"] == 0
+    assert [text for _, _, text in fake_slack.messages] == ["first", "second"]
+
+
+def test_non_retryable_error_fails_the_future(fake_slack):
+    fake_slack.error_rate, fake_slack.error_status = 1.0, 400
+    outbound = make_outbound(fake_slack, workers=1)
+    with pytest.raises(SlackOutboundError):
+        outbound.post_message("C1", "hello").result(5)
+    outbound.close()
+    assert outbound.stats()["failed"] == 1
+
+
+def test_backed_up_thread_replies_are_merged(fake_slack):
+    fake_slack.delay = 0.2
+    outbound = make_outbound(fake_slack, workers=1, merge_backlog=2)
+    futures = [outbound.post_message("C1", f"reply {i}", thread_ts="1.0") for i in range(6)]
+    assert all(future.result(10)["ok"] for future in futures)
+    outbound.close()
+    assert outbound.stats()["merged"] > 0
+    assert len(fake_slack.messages) < 6
+    assert "\n\n".join(text for _, _, text in fake_slack.messages) == "\n\n".join(f"reply {i}" for i in range(6))
+
+
+def test_unexpected_error_fails_one_message_and_keeps_the_worker(fake_slack):
+    outbound = make_outbound(fake_slack, workers=1)
+    post = outbound.session.post
+    calls = []
+
+    def flaky_post(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            raise KeyError("bug in a transport adapter")
+        return post(*args, **kwargs)
+
+    outbound.session.post = flaky_post
+    with pytest.raises(SlackOutboundError):
+        outbound.post_message("C1", "unlucky").result(5)
+    # The only worker is still alive
+    assert outbound.post_message("C1", "next").result(5)["ok"]
+    outbound.close()
+
+
+def test_finish_does_not_wait_forever_for_the_placeholder(fake_slack):
+    fake_slack.delay = 1.0
+    outbound = make_outbound(fake_slack, workers=1)
+    reply = StreamingReply(outbound, "C1", finish_timeout=0.1)
+    reply.update("")
+    assert reply.started
+
+    start = time.monotonic()
+    finished = reply.finish("final answer")
+    assert time.monotonic() - start < 0.5
+    # Edited once the placeholder lands
+    assert finished.result(10)["ok"]
+    outbound.close()
+    assert [method for _, method, _, _ in fake_slack.writes] == ["chat.postMessage", "chat.update"]
+    assert fake_slack.writes[-1][3] == "final answer"
+
+
+def test_log_failure_reports_undelivered_messages(fake_slack, caplog):
+    fake_slack.error_rate, fake_slack.error_status = 1.0, 400
+    outbound = make_outbound(fake_slack, workers=1)
+    future = outbound.post_message("C1", "hello")
+    log_failure(future, "Answer to U1 in C1")
+    with pytest.raises(SlackOutboundError):
+        future.result(5)
+    outbound.close()
+    assert "Answer to U1 in C1 was not delivered" in caplog.text
@@ -0,0 +1,89 @@
+import threading
+import time
+
+from utils.work_queue import EXPLICIT, NORMAL, PASSIVE, PriorityExecutor, request_priority
+
+
+def blocker():
+    """A call that holds its worker until released"""
+    release = threading.Event()
+    started = threading.Event()
+
+    def run():
+        started.set()
+        release.wait(5)
+    return run, started, release
+
+
+def test_request_priority():
+    assert request_priority({"event": {"type": "app_mention"}}) == EXPLICIT
+    assert request_priority({"command": "/ask"}) == EXPLICIT
+    assert request_priority({"command": "/reload-kb"}) == NORMAL
+    assert request_priority({"event": {"type": "message", "ts": "2.0", "thread_ts": "1.0"}}) == NORMAL
+    assert request_priority({"event": {"type": "message", "ts": "1.0"}}) == PASSIVE
+
+
+def test_explicit_calls_run_before_queued_passive_ones():
+    executor = PriorityExecutor(workers=1)
+    run, started, release = blocker()
+    executor.submit_with_priority(NORMAL, run)
+    assert started.wait(5)
+
+    order = []
+    futures = [executor.submit_with_priority(PASSIVE, order.append, "passive 1"),
+               executor.submit_with_priority(EXPLICIT, order.append, "explicit 1"),
+               executor.submit_with_priority(PASSIVE, order.append, "passive 2"),
+               executor.submit_with_priority(EXPLICIT, order.append, "explicit 2")]
+    release.set()
+    for future in futures:
+        future.result(5)
+    executor.shutdown()
+    assert order == ["explicit 1", "explicit 2", "passive 1", "passive 2"]
+
+
+def test_passive_calls_are_shed_at_depth_and_explicit_ones_never():
+    executor = PriorityExecutor(workers=1, shed_depth=2)
+    run, started, release = blocker()
+    executor.submit_with_priority(NORMAL, run)
+    assert started.wait(5)
+
+    queued = [executor.submit_with_priority(PASSIVE, lambda: "passive") for _ in range(2)]
+    refused = executor.submit_with_priority(PASSIVE, lambda: "passive")
+    explicit = executor.submit_with_priority(EXPLICIT, lambda: "explicit")
+    assert refused.cancelled()
+    assert not explicit.cancelled()
+
+    release.set()
+    assert explicit.result(5) == "explicit"
+    assert [future.result(5) for future in queued] == ["passive", "passive"]
+    executor.shutdown()
+    assert executor.stats()["shed"] == {"passive/depth": 1}
+
+
+def test_passive_calls_that_waited_too_long_are_dropped():
+    executor = PriorityExecutor(workers=1, max_wait=0.05)
+    run, started, release = blocker()
+    executor.submit_with_priority(NORMAL, run)
+    assert started.wait(5)
+
+    late = executor.submit_with_priority(PASSIVE, lambda: "too late")
+    time.sleep(0.1)
+    release.set()
+    executor.shutdown()
+    assert late.cancelled()
+    assert executor.stats()["shed"] == {"passive/expired": 1}
+
+
+def test_passive_calls_leave_a_worker_for_explicit_requests():
+    executor = PriorityExecutor(workers=2)
+    run, started, release = blocker()
+    executor.submit_with_priority(PASSIVE, run)
+    assert started.wait(5)
+    second_passive = executor.submit_with_priority(PASSIVE, lambda: "passive")
+
+    # The second passive call waits for the first; the idle worker is kept for this one
+    assert executor.submit_with_priority(EXPLICIT, lambda: "explicit").result(1) == "explicit"
+    assert not second_passive.done()
+    release.set()
+    assert second_passive.result(5) == "passive"
+    executor.shutdown()
@@ -0,0 +1,369 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from utils.fuzzy_index import FuzzyIndex
+from utils.helpers import clean_text, knowledge_base_version
+from utils.match_memo import MatchMemo
+from utils.metrics import REGISTRY, observe_stage, record_answer, timed
+from utils.response_cache import AIResponseCache
+from utils.response_handler import ResponseHandler
+from utils.retrieval import SparseRetrievalEngine
+from utils.semantic_index import SemanticIndex
+from utils.singleflight import AsyncSingleFlight, SingleFlight
+
+logger = logging.getLogger(__name__)
+
+AI_MODEL = "gpt-3.5-turbo"
+AI_MAX_TOKENS = 150
+AI_TEMPERATURE = 0.7
+
+AI_CALL_SECONDS = REGISTRY.histogram(
+    "helpbot_ai_call_seconds", "Latency of OpenAI calls, by outcome (ok or error)", ("outcome",)
+)
+
+SYSTEM_PROMPT = "You are a helpful workplace assistant. Keep answers brief, professional, and helpful. If you're uncertain, direct users to contact support."
+
+class AIOverloadedError(Exception):
+    """Raised when the AI call queue is full"""
+
+AI_DISCLAIMER = "\n\n_This is an AI-generated response. For official policies, please verify with the relevant department._"
+
+def build_ai_messages(question: str, context: str = "") -> List[Dict]:
+    """Build the chat messages sent to OpenAI for a question"""
+    prompt = f"""You are a helpful workplace assistant. Answer this question based on the context provided. If you're not sure, say so.
+
+Context: {context}
+Question: {question}
+
+Provide a brief, helpful answer:"""
+
+    return [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+def ai_request_key(question: str, context: str = "") -> str:
+    """Key for an AI answer: normalized question plus prompt and model parameters"""
+    normalized = clean_text(question)
+    return AIResponseCache.make_key(
+        normalized,
+        messages=build_ai_messages(normalized, context),
+        model=AI_MODEL,
+        max_tokens=AI_MAX_TOKENS,
+        temperature=AI_TEMPERATURE
+    )
+
+def record_ai_call(circuit_breaker: CircuitBreaker, success: bool, elapsed: float) -> None:
+    """Report one finished OpenAI call to the metrics and the circuit breaker"""
+    if REGISTRY.enabled:
+        AI_CALL_SECONDS.labels("ok" if success else "error").observe(elapsed)
+    observe_stage("ai_call", elapsed)
+    circuit_breaker.record(success, elapsed)
+
+def ai_match(ai_response: str) -> Dict:
+    """Wrap an AI answer in the same shape as a knowledge base match"""
+    return {
+        "answer": f"{ai_response}{AI_DISCLAIMER}",
+        "score": 0.5,  # Medium confidence for AI responses
+        "topic": "ai_generated"
+    }
+
+class AIResponseHandler(ResponseHandler):
+    def __init__(self, knowledge_base: Dict, openai_client, confidence_threshold: float = 0.3,
+                 retrieval: Optional[str] = None, response_cache: Optional[AIResponseCache] = None,
+                 max_concurrency: int = 8, timeout: float = 10.0,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 retrieval_engine: Optional[SparseRetrievalEngine] = None, match_memo: Optional[MatchMemo] = None,
+                 fuzzy_index: Optional[FuzzyIndex] = None, semantic_index: Optional[SemanticIndex] = None):
+        super().__init__(
+            knowledge_base, confidence_threshold, retrieval, retrieval_engine, match_memo, fuzzy_index, semantic_index
+        )
+        self.openai_client = openai_client
+        self.response_cache = response_cache
+        self.timeout = timeout
+        self.circuit_breaker = circuit_breaker or CircuitBreaker(slow_call_seconds=timeout / 2)
+
+        # Identical questions in flight share one upstream call
+        self.single_flight = SingleFlight()
+
+        # Upstream calls run on their own pool; admission is capped at the pool plus an equal queue
+        self.ai_executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="openai")
+        self.ai_slots = threading.BoundedSemaphore(max_concurrency * 2)
+
+    def reload_knowledge_base(self, knowledge_base: Dict, changed: Optional[Set[str]] = None):
+        super().reload_knowledge_base(knowledge_base, changed)
+        # Cached AI answers were given for questions the old knowledge base couldn't answer
+        if self.response_cache:
+            self.response_cache.set_kb_version(knowledge_base_version(knowledge_base))
+
+    def get_ai_response(self, question: str, context: str = "") -> Optional[str]:
+        """Get AI-generated response for questions not in knowledge base"""
+        if not self.openai_client:
+            return None
+
+        request_key = ai_request_key(question, context)
+        if self.response_cache:
+            cached = self.response_cache.get(request_key)
+            if cached is not None:
+                return cached
+
+        try:
+            return self.single_flight.do(
+                request_key, lambda: self._request_ai_response(question, context, request_key)
+            )
+        except (CircuitOpenError, AIOverloadedError) as e:
+            logger.info(f"Skipping OpenAI call: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}")
+            return None
+
+    def stream_ai_response(self, question: str, on_text: Callable[[str], None], context: str = "") -> Optional[str]:
+        """Like get_ai_response, but streamed: on_text gets the answer so far as tokens arrive.
+
+        on_text("") is called just before the upstream call starts. A cached
+        answer is returned without calling on_text at all.
+        """
+        if not self.openai_client:
+            return None
+
+        request_key = ai_request_key(question, context)
+        if self.response_cache:
+            cached = self.response_cache.get(request_key)
+            if cached is not None:
+                return cached
+
+        try:
+            return self._stream_ai_response(question, context, request_key, on_text)
+        except (CircuitOpenError, AIOverloadedError) as e:
+            logger.info(f"Skipping OpenAI call: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}")
+            return None
+
+    def _create_completion(self, question: str, context: str, stream: bool = False):
+        return self.openai_client.chat.completions.create(
+            model=AI_MODEL,
+            messages=build_ai_messages(question, context),
+            max_tokens=AI_MAX_TOKENS,
+            temperature=AI_TEMPERATURE,
+            timeout=self.timeout,
+            stream=stream
+        )
+
+    def _record_call(self, success: bool, start: float) -> None:
+        record_ai_call(self.circuit_breaker, success, time.monotonic() - start)
+
+    def _request_ai_response(self, question: str, context: str, request_key: str) -> str:
+        if not self.ai_slots.acquire(blocking=False):
+            raise AIOverloadedError("too many AI requests queued")
+
+        if not self.circuit_breaker.allow():
+            self.ai_slots.release()
+            raise CircuitOpenError("OpenAI circuit breaker is open")
+
+        start = time.monotonic()
+        future = self.ai_executor.submit(self._create_completion, question, context)
+        # The slot frees up when the call really ends, even if we stopped waiting for it
+        future.add_done_callback(lambda _: self.ai_slots.release())
+        try:
+            response = future.result(timeout=self.timeout)
+        except Exception as e:
+            self._record_call(False, start)
+            if isinstance(e, TimeoutError):
+                # Nobody is waiting any more, so don't send it if it is still queued
+                future.cancel()
+                raise TimeoutError(f"no answer within {self.timeout}s") from e
+            raise
+        self._record_call(True, start)
+
+        answer = response.choices[0].message.content.strip()
+        if self.response_cache and answer:
+            self.response_cache.set(request_key, answer)
+        return answer
+
+    def _stream_ai_response(self, question: str, context: str, request_key: str,
+                            on_text: Callable[[str], None]) -> str:
+        # Tokens are read on the caller's thread, so only the slot and the breaker apply;
+        # self.timeout bounds the wait for each chunk rather than the whole answer
+        if not self.ai_slots.acquire(blocking=False):
+            raise AIOverloadedError("too many AI requests queued")
+        try:
+            if not self.circuit_breaker.allow():
+                raise CircuitOpenError("OpenAI circuit breaker is open")
+
+            on_text("")
+            # A long answer streams for a long time, so the breaker and the latency histogram get
+            # the longest wait for OpenAI (first token or between chunks), not the whole stream,
+            # and never the time spent in on_text posting to Slack
+            last = time.monotonic()
+            longest_wait = 0.0
+            parts = []
+            try:
+                stream = self._create_completion(question, context, stream=True)
+                try:
+                    for chunk in stream:
+                        longest_wait = max(longest_wait, time.monotonic() - last)
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            parts.append(chunk.choices[0].delta.content)
+                            on_text("".join(parts))
+                        last = time.monotonic()
+                finally:
+                    stream.response.close()
+            except Exception:
+                record_ai_call(self.circuit_breaker, False, max(longest_wait, time.monotonic() - last))
+                raise
+            record_ai_call(self.circuit_breaker, True, max(longest_wait, time.monotonic() - last))
+        finally:
+            self.ai_slots.release()
+
+        answer = "".join(parts).strip()
+        if self.response_cache and answer:
+            self.response_cache.set(request_key, answer)
+        return answer
+
+    def find_best_match(self, question: str) -> Optional[Dict]:
+        """Find best match with AI fallback"""
+        match = self._find_ai_or_kb_match(question)
+        record_answer(match)
+        return match
+
+    def find_best_match_streaming(self, question: str, on_text: Callable[[str], None]) -> Optional[Dict]:
+        """find_best_match with the AI fallback streamed to on_text (see stream_ai_response)"""
+        match = self._find_kb_match(question)
+        if not match and self.openai_client:
+            ai_response = self.stream_ai_response(question, on_text)
+            if ai_response:
+                match = ai_match(ai_response)
+        record_answer(match)
+        return match
+
+    def _find_kb_match(self, question: str) -> Optional[Dict]:
+        with timed("find_best_match") as timer:
+            kb_match = super().find_best_match(question)
+            timer.topic = kb_match["topic"] if kb_match else ""
+        return kb_match
+
+    # Not _find_best_match: that is ResponseHandler's knowledge base lookup, which super().find_best_match calls
+    def _find_ai_or_kb_match(self, question: str) -> Optional[Dict]:
+        # First try knowledge base
+        kb_match = self._find_kb_match(question)
+        if kb_match:
+            return kb_match
+
+        # If no good KB match and AI is available, try AI
+        if self.openai_client:
+            ai_response = self.get_ai_response(question)
+            if ai_response:
+                return ai_match(ai_response)
+
+        return None
+
+class AsyncAIResponseHandler(ResponseHandler):
+    """AI fallback for the asyncio bot; knowledge base matching stays synchronous"""
+
+    def __init__(self, knowledge_base: Dict, openai_client, confidence_threshold: float = 0.3,
+                 retrieval: Optional[str] = None, response_cache: Optional[AIResponseCache] = None,
+                 max_concurrency: int = 8, timeout: float = 10.0,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 retrieval_engine: Optional[SparseRetrievalEngine] = None, match_memo: Optional[MatchMemo] = None,
+                 fuzzy_index: Optional[FuzzyIndex] = None, semantic_index: Optional[SemanticIndex] = None):
+        super().__init__(
+            knowledge_base, confidence_threshold, retrieval, retrieval_engine, match_memo, fuzzy_index, semantic_index
+        )
+        self.openai_client = openai_client  # an openai.AsyncOpenAI client
+        self.response_cache = response_cache
+        self.timeout = timeout
+        self.circuit_breaker = circuit_breaker or CircuitBreaker(slow_call_seconds=timeout / 2)
+
+        self.single_flight = AsyncSingleFlight()
+        self.ai_slots = asyncio.Semaphore(max_concurrency)
+
+    def reload_knowledge_base(self, knowledge_base: Dict, changed: Optional[Set[str]] = None):
+        super().reload_knowledge_base(knowledge_base, changed)
+        if self.response_cache:
+            self.response_cache.set_kb_version(knowledge_base_version(knowledge_base))
+
+    async def get_ai_response(self, question: str, context: str = "") -> Optional[str]:
+        """Get AI-generated response without blocking the event loop"""
+        if not self.openai_client:
+            return None
+
+        request_key = ai_request_key(question, context)
+        if self.response_cache:
+            cached = self.response_cache.get(request_key)
+            if cached is not None:
+                return cached
+
+        try:
+            return await self.single_flight.do(
+                request_key, lambda: self._request_ai_response(question, context, request_key)
+            )
+        except CircuitOpenError as e:
+            logger.info(f"Skipping OpenAI call: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}")
+            return None
+
+    async def _request_ai_response(self, question: str, context: str, request_key: str) -> str:
+        async with self.ai_slots:
+            if not self.circuit_breaker.allow():
+                raise CircuitOpenError("OpenAI circuit breaker is open")
+
+            start = time.monotonic()
+            try:
+                response = await asyncio.wait_for(
+                    self.openai_client.chat.completions.create(
+                        model=AI_MODEL,
+                        messages=build_ai_messages(question, context),
+                        max_tokens=AI_MAX_TOKENS,
+                        temperature=AI_TEMPERATURE,
+                        timeout=self.timeout
+                    ),
+                    self.timeout
+                )
+            except Exception as e:
+                record_ai_call(self.circuit_breaker, False, time.monotonic() - start)
+                if isinstance(e, asyncio.TimeoutError):
+                    raise TimeoutError(f"no answer within {self.timeout}s") from e
+                raise
+
+            record_ai_call(self.circuit_breaker, True, time.monotonic() - start)
+
+        answer = response.choices[0].message.content.strip()
+        if self.response_cache and answer:
+            self.response_cache.set(request_key, answer)
+        return answer
+
+    async def find_best_match_async(self, question: str) -> Optional[Dict]:
+        """Knowledge base match (CPU only) with an awaited AI fallback"""
+        match = await self._find_best_match_async(question)
+        record_answer(match)
+        return match
+
+    async def _find_best_match_async(self, question: str) -> Optional[Dict]:
+        with timed("find_best_match") as timer:
+            kb_match = self.find_best_match(question)
+            timer.topic = kb_match["topic"] if kb_match else ""
+
+        if kb_match:
+            return kb_match
+
+        if self.openai_client:
+            ai_response = await self.get_ai_response(question)
+            if ai_response:
+                return ai_match(ai_response)
+
+        return None
@@ -0,0 +1,231 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional
+
+from utils.helpers import knowledge_base_version, validate_knowledge_base
+
+STORE_MAGIC = b"HBKBSTOR"
+# Bump when the layout or the index fields change
+STORE_FORMAT = 1
+# magic, format, index offset, index length
+HEADER = struct.Struct("<8sIQQ")
+# Decoded answers kept around, so a popular answer is one shared string
+ANSWER_CACHE_SIZE = 256
+
+
+class AnswerStoreError(ValueError):
+    """The file is not a usable answer store"""
+
+
+class StoredEntry(Mapping):
+    """One knowledge base entry; reads like the JSON dict, "answer" comes from disk on access"""
+
+    __slots__ = ("store", "question", "keywords", "offset", "length", "crc", "extra")
+
+    def __init__(self, store: "AnswerStore", question: str, keywords: Optional[List[str]], offset: int,
+                 length: int, crc: int, extra: Optional[Dict] = None):
+        self.store = store
+        self.question = question
+        self.keywords = keywords
+        self.offset = offset
+        self.length = length
+        self.crc = crc
+        self.extra = extra
+
+    def __getitem__(self, key: str):
+        if key == "answer":
+            return self.store.read_answer(self)
+        if key == "question":
+            return self.question
+        if key == "keywords" and self.keywords is not None:
+            return self.keywords
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield "question"
+        yield "answer"
+        if self.keywords is not None:
+            yield "keywords"
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        return 2 + (self.keywords is not None) + len(self.extra or ())
+
+    def __eq__(self, other) -> bool:
+        # Two stored entries compare without reading either answer (reload diffs every entry)
+        if isinstance(other, StoredEntry):
+            return ((self.question, self.keywords, self.length, self.crc, self.extra)
+                    == (other.question, other.keywords, other.length, other.crc, other.extra))
+        return Mapping.__eq__(self, other)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"StoredEntry(question={self.question!r}, keywords={self.keywords!r}, answer=<{self.length} bytes>)"
+
+
+class AnswerStore(Mapping):
+    """Read-only knowledge base over an answer store file: topic -> StoredEntry.
+
+    The file holds a header, every answer as UTF-8 bytes back to back, then
+    a JSON index of everything matching needs (topic, question, keywords,
+    extra fields) with each answer's offset, length and CRC-32. Only the
+    index is loaded; answers are sliced out of a memory map on access.
+
+    It can be used wherever the knowledge base dict is: the indexes only
+    read questions and keywords, and handlers read data["answer"] for the
+    winning topic alone. version is the knowledge_base_version of the JSON
+    it was converted from, so AI cache entries survive the conversion.
+    Convert with:
+
+        python -m utils.answer_store knowledge_base.json knowledge_base.kbstore
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._open()
+        try:
+            magic, store_format, index_offset, index_length = HEADER.unpack_from(self._map, 0)
+            if magic != STORE_MAGIC or store_format != STORE_FORMAT:
+                raise AnswerStoreError(f"{path} is not an answer store of format {STORE_FORMAT}")
+            index = json.loads(bytes(self._map[index_offset:index_offset + index_length]))
+            self.version: str = index["version"]
+            self._entries: Dict[str, StoredEntry] = {
+                topic: StoredEntry(self, question, keywords, offset, length, crc, extra)
+                for topic, question, keywords, offset, length, crc, extra in index["entries"]
+            }
+        except (struct.error, ValueError, KeyError, TypeError) as e:
+            self.close()
+            if isinstance(e, AnswerStoreError):
+                raise
+            raise AnswerStoreError(f"unreadable answer store {path}: {e!r}") from None
+
+    def _open(self) -> None:
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._cache: "OrderedDict[int, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> Dict:
+        # Pickled into a knowledge base snapshot: the index, not the mapping or the answers
+        return {"path": self.path, "version": self.version, "_entries": self._entries}
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        self._open()
+
+    def __getitem__(self, topic: str) -> StoredEntry:
+        return self._entries[topic]
+
+    def __contains__(self, topic) -> bool:
+        return topic in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def read_answer(self, entry: StoredEntry) -> str:
+        with self._lock:
+            answer = self._cache.get(entry.offset)
+            if answer is not None:
+                self._cache.move_to_end(entry.offset)
+                return answer
+        data = self._map[entry.offset:entry.offset + entry.length]
+        if len(data) != entry.length or zlib.crc32(data) != entry.crc:
+            raise AnswerStoreError(f"corrupt answer for {entry.question!r} in {self.path}")
+        answer = data.decode("utf-8")
+        with self._lock:
+            self._cache[entry.offset] = answer
+            if len(self._cache) > ANSWER_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return answer
+
+    @property
+    def answer_bytes(self) -> int:
+        return sum(entry.length for entry in self._entries.values())
+
+    def close(self) -> None:
+        self._map.close()
+
+
+def is_answer_store(path: str) -> bool:
+    """True if path starts like an answer store (missing or short files are not)"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(STORE_MAGIC)) == STORE_MAGIC
+    except OSError:
+        return False
+
+
+def write_answer_store(knowledge_base: Mapping, path: str, version: str) -> None:
+    """Write knowledge_base (a dict from JSON, or another store) atomically to path.
+
+    Raises ValueError naming the first entry that couldn't be stored.
+    """
+    # Checked up front, so the error names the entry instead of surfacing mid-write
+    validate_knowledge_base(knowledge_base)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".kb_store-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"\0" * HEADER.size)
+            entries = []
+            for topic, data in knowledge_base.items():
+                answer = data["answer"].encode("utf-8")
+                extra = {key: value for key, value in data.items() if key not in ("question", "answer", "keywords")}
+                entries.append([topic, data["question"], data.get("keywords"), f.tell(), len(answer),
+                                zlib.crc32(answer), extra or None])
+                f.write(answer)
+
+            index = json.dumps({"version": version, "entries": entries}, separators=(",", ":")).encode("utf-8")
+            index_offset = f.tell()
+            f.write(index)
+            f.seek(0)
+            f.write(HEADER.pack(STORE_MAGIC, STORE_FORMAT, index_offset, len(index)))
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def convert_knowledge_base(json_path: str, store_path: str) -> Dict:
+    """Convert a knowledge_base.json into an answer store; returns sizes and timing"""
+    start = time.perf_counter()
+    with open(json_path, "r") as f:
+        knowledge_base = json.load(f)
+    write_answer_store(knowledge_base, store_path, knowledge_base_version(knowledge_base))
+    return {
+        "entries": len(knowledge_base),
+        "json_bytes": os.path.getsize(json_path),
+        "store_bytes": os.path.getsize(store_path),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Convert a knowledge base JSON file into an answer store")
+    parser.add_argument("json_path")
+    parser.add_argument("store_path")
+    args = parser.parse_args(argv)
+
+    summary = convert_knowledge_base(args.json_path, args.store_path)
+    print(f"Wrote {args.store_path}: {summary['entries']} entries, {summary['store_bytes']} bytes "
+          f"(JSON {summary['json_bytes']} bytes) in {summary['seconds'] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,284 @@
+import itertools
 import json
 import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from utils.answer_store import AnswerStore
+
+MAX_CONVERSATIONS_PER_USER = 10
+
+# Stands in for the user's own mention ("<@U123>") in stored response templates
+USER_PLACEHOLDER = "\x00"
+# Knowledge base answers are found in a response by this many leading characters
+ANSWER_KEY_LENGTH = 24
+# Answers start after the greeting, so only the first part of a response is searched
+ANSWER_SEARCH_LENGTH = 200
+# Cap on distinct pooled strings, so unique AI responses cannot grow the pool forever
+MAX_POOLED_STRINGS = 10000
+
+# An answer starts the response or follows a line break or the end of a sentence
+_ANSWER_SEPARATORS = ("\n", ". ", "! ", "? ", ": ")
+
+
+def _answer_starts(response: str):
+    yield 0
+    for separator in _ANSWER_SEPARATORS:
+        position = response.find(separator, 0, ANSWER_SEARCH_LENGTH)
+        while position >= 0:
+            position += len(separator)
+            yield position
+            position = response.find(separator, position, ANSWER_SEARCH_LENGTH)
+
+
+def _last_active(records: List[Dict]) -> float:
+    """Epoch seconds of a user's newest record; records without a readable timestamp count as oldest"""
+    newest = 0.0
+    for record in records:
+        try:
+            newest = max(newest, datetime.fromisoformat(record.get("timestamp", "")).timestamp())
+        except (AttributeError, TypeError, ValueError):
+            pass
+    return newest
+
+
+class ConversationRecord:
+    """One exchange. A knowledge base answer inside the response is kept by
+    reference, with the interned text around it (greeting, follow-up) in
+    head and tail; any other response is kept whole in head."""
+
+    __slots__ = ("timestamp", "question", "head", "answer", "tail")
+
+    def __init__(self, timestamp, question: str, head: str, answer: Optional[str] = None, tail: str = ""):
+        self.timestamp = timestamp  # epoch seconds, or the original string if it did not parse
+        self.question = question
+        self.head = head
+        self.answer = answer
+        self.tail = tail
+
+    def response(self, user_id: str) -> str:
+        head = self.head.replace(USER_PLACEHOLDER, f"<@{user_id}>")
+        if self.answer is None:
+            return head
+        return head + self.answer + self.tail.replace(USER_PLACEHOLDER, f"<@{user_id}>")
+
+    def to_dict(self, user_id: str) -> Dict:
+        timestamp = self.timestamp
+        if not isinstance(timestamp, str):
+            timestamp = datetime.fromtimestamp(timestamp).isoformat()
+        return {"timestamp": timestamp, "question": self.question, "response": self.response(user_id)}
+
+
+class UserHistory:
+    """Fixed-capacity ring buffer of a user's most recent records"""
+
+    __slots__ = ("records", "start", "cold")
+
+    def __init__(self, cold: bool = False):
+        self.records: List[ConversationRecord] = []
+        self.start = 0
+        # Older records may be on disk only (the user was evicted, or never loaded)
+        self.cold = cold
+
+    def append(self, record: ConversationRecord, capacity: int) -> None:
+        if len(self.records) < capacity:
+            self.records.append(record)
+        else:
+            self.records[self.start] = record
+            self.start = (self.start + 1) % capacity
+
+    def __iter__(self):
+        return itertools.chain(self.records[self.start:], self.records[:self.start])
+
 
 class ConversationMemory:
-    def __init__(self):
+    """Last few exchanges per user, kept compact.
+
+    Records are ConversationRecords in a per-user ring buffer, with repeated
+    text (knowledge base answers, greetings, follow-ups) shared rather than
+    copied. With a store, at most max_users users stay in memory: the least
+    recently active are evicted and read back from the store, which holds
+    every record, when they come back.
+    """
+
+    def __init__(self, store=None, read_through: bool = False, knowledge_base: Optional[Dict] = None,
+                 max_users: int = 0, max_per_user: int = MAX_CONVERSATIONS_PER_USER):
         self.memory_file = "conversation_memory.json"
-        self.memory = self.load_memory()
-    
-    def load_memory(self):
-        """Load conversation memory from file"""
+        # Optional write-behind backend (see utils.memory_store); None rewrites memory_file
+        self.store = store
+        # Several processes share the store: read each user's history from it instead of a local copy
+        self.read_through = read_through and store is not None
+        # Eviction needs the store as the cold copy, so the JSON file keeps every user
+        self.max_users = max_users if store is not None else 0
+        self.max_per_user = max_per_user
+        self.evictions = 0
+        # Users whose history is only in the store (evicted, or not loaded at startup)
+        self._evicted: Set[str] = set()
+
+        self._lock = threading.RLock()
+        self._pool: Dict[str, str] = {}
+        self._answers: Dict[str, List[str]] = {}
+        self.reload_knowledge_base(knowledge_base or {})
+        self.memory: "OrderedDict[str, UserHistory]" = OrderedDict() if self.read_through else self.load_memory()
+
+    def reload_knowledge_base(self, knowledge_base: Dict, changed_topics=None) -> None:
+        """Index answers for sharing; records already stored keep the answer text they were given"""
+        answers: Dict[str, List[str]] = {}
+        if isinstance(knowledge_base, AnswerStore):
+            # Answers stay on disk; the store's own cache shares the popular ones
+            self._answers = answers
+            return
+        for data in knowledge_base.values():
+            answer = data.get("answer", "") if isinstance(data, dict) else ""
+            if len(answer) >= ANSWER_KEY_LENGTH:
+                candidates = answers.setdefault(answer[:ANSWER_KEY_LENGTH], [])
+                if answer not in candidates:
+                    candidates.append(answer)
+        self._answers = answers
+
+    def _intern(self, text: str) -> str:
+        pooled = self._pool.get(text)
+        if pooled is not None:
+            return pooled
+        if len(self._pool) < MAX_POOLED_STRINGS:
+            self._pool[text] = text
+        return text
+
+    def _encode(self, user_id: str, record: Dict, timestamp: Optional[float] = None) -> ConversationRecord:
+        if timestamp is None:
+            timestamp = record.get("timestamp", "")
+            try:
+                timestamp = datetime.fromisoformat(timestamp).timestamp()
+            except (TypeError, ValueError):
+                pass
+
+        response = record.get("response", "")
+        if USER_PLACEHOLDER in response:
+            return ConversationRecord(timestamp, record.get("question", ""), response)
+
+        for position in _answer_starts(response):
+            for answer in self._answers.get(response[position:position + ANSWER_KEY_LENGTH], ()):
+                if response.startswith(answer, position):
+                    mention = f"<@{user_id}>"
+                    head = response[:position].replace(mention, USER_PLACEHOLDER)
+                    tail = response[position + len(answer):].replace(mention, USER_PLACEHOLDER)
+                    return ConversationRecord(timestamp, record.get("question", ""),
+                                              self._intern(head), answer, self._intern(tail))
+
+        head = response.replace(f"<@{user_id}>", USER_PLACEHOLDER)
+        return ConversationRecord(timestamp, record.get("question", ""), self._intern(head))
+
+    def _history_from_records(self, user_id: str, records: List[Dict]) -> UserHistory:
+        history = UserHistory()
+        for record in records[-self.max_per_user:]:
+            history.append(self._encode(user_id, record), self.max_per_user)
+        return history
+
+    def _evict(self) -> None:
+        while self.max_users and len(self.memory) > self.max_users:
+            user_id, _ = self.memory.popitem(last=False)
+            self._evicted.add(user_id)
+            self.evictions += 1
+
+    def load_memory(self) -> "OrderedDict[str, UserHistory]":
+        """Load conversation memory from file (the most recently active users, if bounded)"""
+        loaded = {}
         try:
-            if os.path.exists(self.memory_file):
+            if self.store:
+                loaded = self.store.load()
+            elif os.path.exists(self.memory_file):
                 with open(self.memory_file, 'r') as f:
-                    return json.load(f)
+                    loaded = json.load(f)
         except Exception as e:
             print(f"Error loading memory: {e}")
-        
-        return {}
-    
+
+        users = list(loaded)
+        if self.max_users:
+            # Stores return users in their own order; the LRU wants the least recently active first
+            users.sort(key=lambda user_id: _last_active(loaded[user_id]))
+        if self.max_users and len(users) > self.max_users:
+            self.evictions += len(users) - self.max_users
+            self._evicted.update(users[:-self.max_users])
+            users = users[-self.max_users:]
+        return OrderedDict((user_id, self._history_from_records(user_id, loaded[user_id])) for user_id in users)
+
     def save_memory(self):
         """Save conversation memory to file"""
         try:
+            with self._lock:
+                snapshot = {
+                    user_id: [record.to_dict(user_id) for record in history]
+                    for user_id, history in self.memory.items()
+                }
             with open(self.memory_file, 'w') as f:
-                json.dump(self.memory, f, indent=2)
+                json.dump(snapshot, f, indent=2)
         except Exception as e:
             print(f"Error saving memory: {e}")
-    
+
     def add_conversation(self, user_id: str, question: str, response: str):
         """Add a conversation to memory"""
-        if user_id not in self.memory:
-            self.memory[user_id] = []
-        
-        self.memory[user_id].append({
-            "timestamp": datetime.now().isoformat(),
+        timestamp = time.time()
+        record = {
+            "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
             "question": question,
             "response": response
-        })
-        
-        # Keep only last 10 conversations per user
-        if len(self.memory[user_id]) > 10:
-            self.memory[user_id] = self.memory[user_id][-10:]
-        
-        self.save_memory()
-    
+        }
+
+        if self.read_through:
+            self.store.append(user_id, record)
+            return
+
+        compact = self._encode(user_id, record, timestamp)
+        with self._lock:
+            history = self.memory.get(user_id)
+            if history is None:
+                history = self.memory[user_id] = UserHistory(cold=user_id in self._evicted)
+                self._evicted.discard(user_id)
+                self._evict()
+            else:
+                self.memory.move_to_end(user_id)
+            history.append(compact, self.max_per_user)
+
+        if self.store:
+            self.store.append(user_id, record)
+        else:
+            self.save_memory()
+
     def get_user_history(self, user_id: str):
         """Get conversation history for a user"""
-        return self.memory.get(user_id, [])
\ No newline at end of file
+        if self.read_through:
+            return self.store.load_user(user_id)
+
+        with self._lock:
+            history = self.memory.get(user_id)
+            if history is None and user_id not in self._evicted:
+                return []
+            if history is None or history.cold:
+                # Evicted: the store has the full history, this process's unflushed writes included
+                records = self.store.load_user(user_id)
+                if not records:
+                    return []
+                self._evicted.discard(user_id)
+                self.memory[user_id] = self._history_from_records(user_id, records)
+                self.memory.move_to_end(user_id)
+                self._evict()
+                return records
+            self.memory.move_to_end(user_id)
+            return [record.to_dict(user_id) for record in history]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "users": len(self.memory),
+                "records": sum(len(history.records) for history in self.memory.values()),
+                "evictions": self.evictions,
+                "pooled_strings": len(self._pool),
+            }
+
+    def close(self):
+        """Flush any pending writes to the storage backend"""
+        if self.store:
+            self.store.close()
@@ -1,10 +1,30 @@
 import random
-import re
-from typing import Dict, Optional
+from typing import Dict, NamedTuple, Optional, Set
+from utils.fuzzy_index import FUZZY_SCORE_FACTOR, FuzzyIndex
+from utils.helpers import clean_text
+from utils.help_classifier import HelpRequestClassifier
+from utils.keyword_index import KeywordIndex
+from utils.kb_router import KnowledgeBaseRouter
+from utils.match_memo import MatchMemo
+from utils.metrics import record_answer, timed
+
+class MatchIndexes(NamedTuple):
+    """Everything a lookup reads, swapped as one object on reload"""
+    knowledge_base: Dict
+    keyword_index: KeywordIndex
+    fuzzy_index: Optional[FuzzyIndex]
 
 class EnhancedResponseHandler:
-    def __init__(self, knowledge_base: Dict):
-        self.knowledge_base = knowledge_base
+    def __init__(self, knowledge_base: Dict, keyword_index: Optional[KeywordIndex] = None,
+                 match_memo: Optional[MatchMemo] = None, fuzzy_index: Optional[FuzzyIndex] = None,
+                 kb_router: Optional[KnowledgeBaseRouter] = None):
+        # A prebuilt keyword index comes from a knowledge base snapshot; the fuzzy index is a
+        # second chance for questions with misspelled words
+        self.indexes = MatchIndexes(knowledge_base, keyword_index or KeywordIndex(knowledge_base), fuzzy_index)
+        # Remembers the topic and score per question; greetings and follow-ups are still picked per reply
+        self.match_memo = match_memo
+        # Per-channel and per-team knowledge bases searched alongside this one
+        self.kb_router = kb_router
         self.setup_responses()
         
         # Help keywords to detect help requests
@@ -15,6 +35,12 @@ class EnhancedResponseHandler:
             "need help", "looking for", "where can i", "how can i",
             "not working", "broken", "error", "can't find"
         ]
+        
+        # A "?" only counts when one of these words is present (filters rhetorical questions)
+        self.question_words = ["how", "what", "where", "when", "why", "can", "does", "is"]
+        
+        # Help phrases compiled into one pattern for the channel firehose
+        self.help_classifier = HelpRequestClassifier(self.help_keywords, self.question_words)
     
     def setup_responses(self):
         self.greetings = [
@@ -40,13 +66,30 @@ class EnhancedResponseHandler:
             "I'm still learning about that topic. For now, please contact the relevant department for assistance.",
         ]
     
-    def get_natural_response(self, question: str, user_id: str) -> str:
+    @property
+    def knowledge_base(self) -> Dict:
+        return self.indexes.knowledge_base
+    
+    @property
+    def keyword_index(self) -> KeywordIndex:
+        return self.indexes.keyword_index
+    
+    @property
+    def fuzzy_index(self) -> Optional[FuzzyIndex]:
+        return self.indexes.fuzzy_index
+    
+    def get_natural_response(self, question: str, user_id: str, channel: Optional[str] = None,
+                             team: Optional[str] = None) -> str:
         """Generate more natural, conversational responses"""
         # Clean the question
-        clean_question = self.clean_text(question)
+        with timed("clean_text"):
+            clean_question = self.clean_text(question)
         
         # Find the best match
-        match = self.find_best_match(clean_question)
+        with timed("find_best_match") as timer:
+            match = self.find_best_match(clean_question, channel, team)
+            timer.topic = match["topic"] if match else ""
+        record_answer(match)
         
         if match:
             # Add natural greeting
@@ -66,30 +109,57 @@ class EnhancedResponseHandler:
             unknown_msg = random.choice(self.unknown_responses)
             return f"{greeting} {unknown_msg}"
     
-    def find_best_match(self, question: str) -> Optional[Dict]:
+    def find_best_match(self, question: str, channel: Optional[str] = None,
+                        team: Optional[str] = None) -> Optional[Dict]:
         """Enhanced matching with context awareness"""
         question_lower = question.lower()
+        if self.match_memo:
+            match = self.match_memo.lookup(question_lower, self.indexes.knowledge_base, self._find_best_match)
+        else:
+            match = self._find_best_match(question_lower)
+        if self.kb_router and (channel or team):
+            with timed("partition_match"):
+                match = self.kb_router.find_best_match(question_lower, channel, team, match)
+        return match
+    
+    def _find_best_match(self, question_lower: str) -> Optional[Dict]:
+        indexes = self.indexes  # read once so a reload can't swap it mid-lookup
+        match = self._exact_match(question_lower, indexes.keyword_index)
+        if match is None and indexes.fuzzy_index:
+            with timed("fuzzy_match"):
+                match = self._fuzzy_match(question_lower, indexes)
+        return match
+    
+    def _fuzzy_match(self, question_lower: str, indexes: MatchIndexes) -> Optional[Dict]:
+        """Match again with misspelled words corrected, at a discounted score"""
+        corrected, corrections = indexes.fuzzy_index.correct(question_lower)
+        if not corrections:
+            return None
+        match = self._exact_match(corrected, indexes.keyword_index)
+        if match is None or match["score"] * FUZZY_SCORE_FACTOR <= 0.3:
+            return None
+        return dict(match, score=match["score"] * FUZZY_SCORE_FACTOR)
+    
+    def _exact_match(self, question_lower: str, index: KeywordIndex) -> Optional[Dict]:
+        scan = index.scan(question_lower)
         
         # Direct keyword matches first
-        for key, data in self.knowledge_base.items():
-            for keyword in data["keywords"]:
-                if keyword.lower() in question_lower:
-                    return {
-                        "answer": data["answer"],
-                        "score": 1.0,
-                        "topic": key
-                    }
+        if scan.first_keyword_topic is not None:
+            return {
+                "answer": index.knowledge_base[scan.first_keyword_topic]["answer"],
+                "score": 1.0,
+                "topic": scan.first_keyword_topic
+            }
         
-        # Question-based matching
+        # Question-based matching (scores come back in knowledge base order)
         best_match = None
         best_score = 0
         
-        for key, data in self.knowledge_base.items():
-            score = self.calculate_match_score(question_lower, data)
+        for key, score in scan.scores.items():
             if score > best_score and score > 0.3:
                 best_score = score
                 best_match = {
-                    "answer": data["answer"],
+                    "answer": index.knowledge_base[key]["answer"],
                     "score": score,
                     "topic": key
                 }
@@ -111,31 +181,21 @@ class EnhancedResponseHandler:
         
         return min(score, 1.0)
     
+    def reload_knowledge_base(self, knowledge_base: Dict, changed: Optional[Set[str]] = None):
+        """Swap in a new knowledge base, reusing the keyword automaton where possible"""
+        # Build everything first, then publish with one assignment: a failed build leaves the
+        # current indexes in place, and lookups never see a mix of old and new
+        indexes = self.indexes
+        keyword_index = KeywordIndex(knowledge_base, previous=indexes.keyword_index)
+        fuzzy_index = indexes.fuzzy_index and FuzzyIndex(knowledge_base, previous=indexes.fuzzy_index)
+        self.indexes = MatchIndexes(knowledge_base, keyword_index, fuzzy_index)
+        if self.match_memo:
+            self.match_memo.invalidate()
+    
     def is_help_request(self, text: str) -> bool:
         """Check if message appears to be a help request"""
-        if not text:
-            return False
-            
-        clean_text = self.clean_text(text)
-        
-        # Check for help keywords
-        if any(keyword in clean_text for keyword in self.help_keywords):
-            return True
-        
-        # Check for question marks (but not in URLs)
-        if '?' in text and '://' not in text:
-            # Make sure it's not a rhetorical question
-            non_rhetorical = ["how", "what", "where", "when", "why", "can", "does", "is"]
-            if any(word in clean_text for word in non_rhetorical):
-                return True
-            
-        return False
+        return self.help_classifier.is_help_request(text)
     
     def clean_text(self, text: str) -> str:
         """Clean and normalize text for processing"""
-        # Remove mentions and URLs
-        text = re.sub(r'<@[^>]+>', '', text)  # Remove user mentions
-        text = re.sub(r'<#[^>]+>', '', text)  # Remove channel mentions
-        text = re.sub(r'http\S+', '', text)   # Remove URLs
-        text = re.sub(r'[^\w\s?]', '', text)  # Remove special chars except spaces and ?
-        return text.lower().strip()
\ No newline at end of file
+        return clean_text(text)
\ No newline at end of file
@@ -0,0 +1,143 @@
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def event_keys(event: Dict, body: Optional[Dict] = None) -> List[str]:
+    """Every identity a Slack message can arrive under.
+
+    event_id catches Slack retries of the same delivery; client_msg_id and
+    (channel, ts) are shared by the app_mention and message events that one
+    "@HelpBot ..." message produces.
+    """
+    keys = []
+    if body and body.get("event_id"):
+        keys.append(f"event:{body['event_id']}")
+    if event.get("client_msg_id"):
+        keys.append(f"msg:{event['client_msg_id']}")
+    if event.get("channel") and event.get("ts"):
+        keys.append(f"ts:{event['channel']}:{event['ts']}")
+    return keys
+
+
+def mentions_user(text: str, user_id: Optional[str]) -> bool:
+    """Whether the message text @-mentions user_id"""
+    return bool(user_id) and f"<@{user_id}" in (text or "")
+
+
+class EventDeduplicator:
+    """TTL-bounded, size-capped record of Slack events already handled.
+
+    claim() is atomic across listener threads: only the first caller for any
+    of an event's keys gets True and should process it.
+    """
+
+    def __init__(self, ttl: float = 600, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.claimed = 0
+        self.duplicates = 0
+
+    def claim(self, keys: List[str]) -> bool:
+        """Mark the event as handled; False if any of its keys was already seen"""
+        if not keys:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            # Entries are in insertion order, so expired ones are at the front
+            while self._seen and next(iter(self._seen.values())) <= now - self.ttl:
+                self._seen.popitem(last=False)
+
+            if any(key in self._seen for key in keys):
+                self.duplicates += 1
+                return False
+
+            for key in keys:
+                self._seen[key] = now
+            while len(self._seen) > self.max_entries:
+                self._seen.popitem(last=False)
+
+            self.claimed += 1
+            return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._seen), "claimed": self.claimed, "duplicates": self.duplicates}
+
+
+class SQLiteEventDeduplicator:
+    """EventDeduplicator shared by several processes through a SQLite file.
+
+    Used when the bot runs as multiple HTTP workers, where a Slack retry or
+    the second half of a mention/message pair can reach a different process.
+    claim() checks and records the keys in one write transaction, so only
+    one process wins. If the database is unavailable events are let through
+    (a rare duplicate reply beats a lost one).
+    """
+
+    def __init__(self, path: str, ttl: float = 600, prune_every: int = 1000):
+        self.path = path
+        self.ttl = ttl
+        self.prune_every = prune_every
+        self._lock = threading.Lock()
+
+        self.claimed = 0
+        self.duplicates = 0
+
+        self._connection = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS seen_events (key TEXT PRIMARY KEY, seen REAL NOT NULL)")
+
+    def claim(self, keys: List[str]) -> bool:
+        """Mark the event as handled; False if any of its keys was already seen by any process"""
+        if not keys:
+            return True
+
+        now = time.time()
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            try:
+                self._connection.execute("BEGIN IMMEDIATE")
+                try:
+                    seen = self._connection.execute(
+                        f"SELECT 1 FROM seen_events WHERE key IN ({placeholders}) AND seen > ? LIMIT 1",
+                        (*keys, now - self.ttl)
+                    ).fetchone()
+                    if seen:
+                        self.duplicates += 1
+                        return False
+
+                    self._connection.executemany(
+                        "INSERT OR REPLACE INTO seen_events (key, seen) VALUES (?, ?)", [(key, now) for key in keys]
+                    )
+                    if self.claimed % self.prune_every == 0:
+                        self._connection.execute("DELETE FROM seen_events WHERE seen <= ?", (now - self.ttl,))
+                finally:
+                    self._connection.execute("COMMIT")
+            except sqlite3.Error as e:
+                logger.error(f"Event de-duplication unavailable, letting event through: {e}")
+
+            self.claimed += 1
+            return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            size = self._connection.execute("SELECT COUNT(*) FROM seen_events").fetchone()[0]
+            return {"size": size, "claimed": self.claimed, "duplicates": self.duplicates}
+
+
+def create_event_deduplicator(path: str, ttl: float, max_entries: int):
+    """Process-local deduplicator, or a SQLite-backed one shared across processes when path is set"""
+    if path:
+        return SQLiteEventDeduplicator(path, ttl)
+    return EventDeduplicator(ttl, max_entries)
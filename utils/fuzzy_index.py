@@ -0,0 +1,145 @@
+from typing import Dict, List, Optional, Set, Tuple
+
+# Words shorter than this are never corrected: one edit turns too many ordinary short words
+# into knowledge base words ("wife" -> "wifi")
+MIN_WORD_LENGTH = 5
+# Vocabulary words shorter than this are never corrected towards
+MIN_VOCABULARY_LENGTH = 4
+# Words of at least this length may be two edits away, shorter ones one
+TWO_EDIT_LENGTH = 8
+# Deletes are generated from this many leading characters only (bounds the index size)
+PREFIX_LENGTH = 7
+# Stripped from the end of a word before it is checked, and put back after: clean_text keeps "?"
+TRAILING_PUNCTUATION = "?!.,;:"
+# A match found through corrected words scores this fraction of an exact one
+FUZZY_SCORE_FACTOR = 0.8
+# Everyday words are spelled right, even when one edit away from a knowledge base word
+COMMON_WORDS = frozenset("""
+about above after again against almost alone along already always among another answer anyone anything
+around asked awesome before began begin behind being below better between bring broke brought build built
+cannot catch cause change check child children class clean clear close could couldn didn doesn doing
+early earlier email enough every everyone everything except family field first found friday friend
+friends great group guess happy hasn haven having heard hello help hours house isn issue items later
+least leave light limit little lunch maybe meant might minute minutes money month monday morning
+mother never night nothing number often order other others outside people place plans please point
+quick quite really right rules saturday seems should since sorry small sound start still story
+stuff sunday sure taken thank thanks their there these thing things think those though three
+thursday today together tomorrow tonight trying tuesday under until using usual wanted wasn watch
+water wednesday weeks where which while whole whose world would wouldn write wrong years yesterday young
+""".split())
+
+
+def max_edits(word: str) -> int:
+    return 2 if len(word) >= TWO_EDIT_LENGTH else 1
+
+
+def _deletes(word: str, distance: int) -> Set[str]:
+    """word with up to `distance` characters removed (word itself included)"""
+    variants = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+        variants |= frontier
+    return variants
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (adjacent swaps count once), or limit + 1 if above limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _vocabulary(knowledge_base: Dict) -> Dict[str, int]:
+    """Words of every keyword and question, with how many entries use them"""
+    counts: Dict[str, int] = {}
+    for data in knowledge_base.values():
+        words = set()
+        for text in [data["question"], *data.get("keywords", [])]:
+            words.update(text.lower().split())
+        for word in words:
+            # Numbers and IDs are never corrected towards, only exact matches count for them
+            if len(word) >= MIN_VOCABULARY_LENGTH and word.isalpha():
+                counts[word] = counts.get(word, 0) + 1
+    return counts
+
+
+class FuzzyIndex:
+    """SymSpell-style deletion dictionary over the knowledge base vocabulary.
+
+    Every keyword and question word is indexed under each string obtained
+    by deleting up to max_edits(word) characters from its first
+    PREFIX_LENGTH characters. A misspelled word is looked up under its own
+    deletes, so finding its candidates costs a few dict lookups however big
+    the vocabulary is; only those candidates get a real edit distance.
+
+    correct() rewrites a question with every unknown word replaced by its
+    closest vocabulary word, for the matchers to run again. Short words and
+    COMMON_WORDS are taken as spelled right.
+    """
+
+    def __init__(self, knowledge_base: Dict, previous: Optional["FuzzyIndex"] = None):
+        self.counts = _vocabulary(knowledge_base)
+        if previous is not None and previous.counts.keys() == self.counts.keys():
+            # Same words: keep the deletion dictionary, only the tie-break counts change
+            self._deletes = previous._deletes
+            return
+
+        deletes: Dict[str, List[str]] = {}
+        for word in self.counts:
+            for variant in _deletes(word[:PREFIX_LENGTH], max_edits(word)):
+                deletes.setdefault(variant, []).append(word)
+        self._deletes = deletes
+
+    def suggest(self, word: str) -> Optional[Tuple[str, int]]:
+        """(closest vocabulary word, edits) for a word within max_edits(word), else None"""
+        limit = max_edits(word)
+        candidates = set()
+        for variant in _deletes(word[:PREFIX_LENGTH], limit):
+            candidates.update(self._deletes.get(variant, ()))
+
+        best = None
+        best_key = None
+        for candidate in candidates:
+            distance = edit_distance(word, candidate, limit)
+            if distance > limit:
+                continue
+            # Fewest edits, then the word more entries use, then alphabetical for a stable answer
+            key = (distance, -self.counts[candidate], candidate)
+            if best_key is None or key < best_key:
+                best, best_key = candidate, key
+        return (best, best_key[0]) if best is not None else None
+
+    def correct(self, question: str) -> Tuple[str, int]:
+        """question (cleaned, lowercase) with misspelled words replaced, and how many were"""
+        words = question.split()
+        corrections = 0
+        for i, token in enumerate(words):
+            word = token.rstrip(TRAILING_PUNCTUATION)
+            if (len(word) < MIN_WORD_LENGTH or not word.isalpha() or word in self.counts
+                    or word in COMMON_WORDS):
+                continue
+            suggestion = self.suggest(word)
+            if suggestion is not None:
+                words[i] = suggestion[0] + token[len(word):]
+                corrections += 1
+        return (" ".join(words), corrections) if corrections else (question, 0)
+
+
+def create_fuzzy_index(knowledge_base: Dict, enabled: bool = True) -> Optional[FuzzyIndex]:
+    return FuzzyIndex(knowledge_base) if enabled else None
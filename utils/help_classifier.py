@@ -0,0 +1,48 @@
+import re
+from typing import Iterable, List, Optional
+from utils.helpers import clean_text
+
+
+def _alternation(phrases: Iterable[str]) -> Optional["re.Pattern"]:
+    phrases = sorted(set(phrases), key=len, reverse=True)
+    if not phrases:
+        return None
+    return re.compile("|".join(re.escape(phrase) for phrase in phrases))
+
+
+class HelpRequestClassifier:
+    """Single compiled pattern for the help-request check on the message firehose.
+
+    Decisions are identical to the original is_help_request: a help phrase
+    anywhere in the cleaned text, or a '?' outside a URL-looking message
+    (optionally also requiring one of question_words in the cleaned text).
+    """
+
+    def __init__(self, help_keywords: Iterable[str], question_words: Optional[Iterable[str]] = None):
+        self._help_pattern = _alternation(help_keywords)
+        self._question_pattern = _alternation(question_words) if question_words is not None else None
+        self._require_question_word = question_words is not None
+
+    def is_help_request(self, text: str) -> bool:
+        if not text:
+            return False
+
+        looks_like_question = '?' in text and '://' not in text
+        # Without a question-word requirement any real "?" decides it, no cleanup needed
+        if looks_like_question and not self._require_question_word:
+            return True
+
+        clean = clean_text(text)
+        if self._help_pattern is not None and self._help_pattern.search(clean):
+            return True
+
+        # Check for question marks (but not in URLs)
+        if looks_like_question:
+            return self._question_pattern is not None and self._question_pattern.search(clean) is not None
+
+        return False
+
+    def classify_batch(self, texts: Iterable[str]) -> List[bool]:
+        """Classify many messages at once"""
+        is_help_request = self.is_help_request
+        return [is_help_request(text) for text in texts]
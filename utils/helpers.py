@@ -1,11 +1,16 @@
+import hashlib
 import json
 import re
 import logging
-from typing import Dict, List, Optional
+from collections.abc import Mapping
+from typing import Dict, List, Optional, Set
 
 def load_knowledge_base(file_path: str) -> Dict:
-    """Load knowledge base from JSON file"""
+    """Load knowledge base from JSON file, or from an answer store (see utils.answer_store)"""
+    from utils.answer_store import AnswerStore, AnswerStoreError, is_answer_store
     try:
+        if is_answer_store(file_path):
+            return AnswerStore(file_path)
         with open(file_path, 'r') as file:
             return json.load(file)
     except FileNotFoundError:
@@ -14,6 +19,34 @@ def load_knowledge_base(file_path: str) -> Dict:
     except json.JSONDecodeError:
         logging.error(f"Invalid JSON in knowledge base file: {file_path}")
         return {}
+    except AnswerStoreError as e:
+        logging.error(f"Invalid knowledge base answer store: {e}")
+        return {}
+
+def validate_knowledge_base(knowledge_base: Dict) -> None:
+    """Raise ValueError naming the first entry the handlers couldn't index"""
+    if not isinstance(knowledge_base, Mapping):
+        raise ValueError("top level must be an object")
+    for topic, data in knowledge_base.items():
+        if not isinstance(data, Mapping):
+            raise ValueError(f"entry {topic!r} is not an object")
+        if not isinstance(data.get("question"), str):
+            raise ValueError(f"entry {topic!r} has no \"question\" string")
+        keywords = data.get("keywords", [])
+        if not isinstance(keywords, list) or not all(isinstance(keyword, str) for keyword in keywords):
+            raise ValueError(f"entry {topic!r} has \"keywords\" that aren't a list of strings")
+        # An answer store's answers are checked when it is written, and reading them here would load them all
+        if isinstance(data, dict) and not isinstance(data.get("answer"), str):
+            raise ValueError(f"entry {topic!r} has no \"answer\" string")
+
+def knowledge_base_version(knowledge_base: Dict) -> str:
+    """Stable fingerprint of the knowledge base contents"""
+    # An answer store carries the fingerprint of the JSON it was converted from
+    version = getattr(knowledge_base, "version", None)
+    if version is not None:
+        return version
+    payload = json.dumps(knowledge_base, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
 
 def setup_logging(level: str = "INFO") -> None:
     """Setup logging configuration - SIMPLE FIX"""
@@ -23,18 +56,29 @@ def setup_logging(level: str = "INFO") -> None:
         handlers=[logging.StreamHandler()]  # ONLY CONSOLE LOGGING
     )
 
+_MENTION = re.compile(r'<@[^>]+>')
+_CHANNEL = re.compile(r'<#[^>]+>')
+# URL and special-character removal fused into one pass; scanning left to right
+# it removes exactly what two separate re.sub calls would
+_URL_OR_SPECIAL = re.compile(r'http\S+|[^\w\s?]')
+
 def clean_text(text: str) -> str:
     """Clean and normalize text for processing"""
-    text = re.sub(r'<@[^>]+>', '', text)  # Remove user mentions
-    text = re.sub(r'<#[^>]+>', '', text)  # Remove channel mentions
-    text = re.sub(r'http\S+', '', text)   # Remove URLs
-    text = re.sub(r'[^\w\s?]', '', text)  # Remove special chars
+    # Mentions and channels stay separate passes since removing one can expose the other
+    if '<' in text:
+        text = _MENTION.sub('', text)  # Remove user mentions
+        text = _CHANNEL.sub('', text)  # Remove channel mentions
+    text = _URL_OR_SPECIAL.sub('', text)  # Remove URLs and special chars
     return text.lower().strip()
 
+def text_words(text: str) -> Set[str]:
+    """Distinct lowercase words; the "?" clean_text keeps doesn't stick to the word before it"""
+    return set(text.lower().replace("?", " ").split())
+
 def calculate_similarity(text1: str, text2: str) -> float:
     """Calculate simple text similarity"""
-    words1 = set(text1.lower().split())
-    words2 = set(text2.lower().split())
+    words1 = text_words(text1)
+    words2 = text_words(text2)
     
     if not words1 or not words2:
         return 0.0
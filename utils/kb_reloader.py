@@ -0,0 +1,136 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from utils.answer_store import AnswerStore, is_answer_store
+from utils.helpers import validate_knowledge_base
+
+logger = logging.getLogger(__name__)
+
+
+def diff_knowledge_bases(old: Dict, new: Dict) -> Tuple[Set[str], Set[str], Set[str]]:
+    """Return the (added, removed, changed) topics between two knowledge bases"""
+    added = set(new) - set(old)
+    removed = set(old) - set(new)
+    changed = {key for key in set(new) & set(old) if new[key] != old[key]}
+    return added, removed, changed
+
+
+class KnowledgeBaseReloader:
+    """Reload knowledge_base.json (or its answer store) into running handlers without a restart.
+
+    reload() parses the file, diffs it against the loaded version and hands
+    each handler the new knowledge base plus the set of added or changed
+    topics, so only those entries are re-indexed. Handlers build their new
+    indexes before swapping them in, so lookups keep using the old version
+    until the new one is complete. A file that fails to parse is ignored and
+    the current knowledge base stays live.
+
+    With poll_interval > 0 a background thread reloads whenever the file's
+    modification time changes. An entry the handlers couldn't index (no
+    question, keywords that aren't a list) rejects the whole file, and a
+    handler that still fails to re-index is logged without stopping the
+    watcher.
+    """
+
+    def __init__(self, path: str, knowledge_base: Dict, handlers: List, poll_interval: float = 0):
+        self.path = path
+        self.knowledge_base = knowledge_base
+        self.handlers = handlers
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._mtime = self._current_mtime()
+        self._thread: Optional[threading.Thread] = None
+
+        self.reloads = 0
+        self.failures = 0
+        self.last_reload_seconds = 0.0
+
+    def _current_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def start(self) -> None:
+        """Start watching the file (no-op when polling is disabled)"""
+        if self.poll_interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="kb-reloader", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                mtime = self._current_mtime()
+                if mtime is not None and mtime != self._mtime:
+                    self.reload()
+            except Exception:
+                # Keep watching: the next edit to the file may well be fine
+                logger.exception("Knowledge base watcher failed to apply a change")
+
+    def reload(self) -> Optional[Dict]:
+        """Load the file and apply it; returns a summary, or None if the file was unusable"""
+        with self._lock:
+            self._mtime = self._current_mtime()
+            try:
+                if is_answer_store(self.path):
+                    knowledge_base = AnswerStore(self.path)
+                else:
+                    with open(self.path, 'r') as file:
+                        knowledge_base = json.load(file)
+                validate_knowledge_base(knowledge_base)
+            except (OSError, ValueError) as e:
+                self.failures += 1
+                logger.error(f"Knowledge base reload failed, keeping the current version: {e}")
+                return None
+
+            start = time.perf_counter()
+            added, removed, changed = diff_knowledge_bases(self.knowledge_base, knowledge_base)
+            if added or removed or changed:
+                try:
+                    for handler in self.handlers:
+                        handler.reload_knowledge_base(knowledge_base, added | changed)
+                except Exception:
+                    # Handlers build before they swap, so the failing one still serves the current
+                    # version; the next change to the file is diffed against that version again
+                    self.failures += 1
+                    logger.exception(f"Knowledge base reload failed while re-indexing in {type(handler).__name__}")
+                    return None
+                self.knowledge_base = knowledge_base
+            elapsed = time.perf_counter() - start
+
+            self.reloads += 1
+            self.last_reload_seconds = elapsed
+            summary = {
+                "entries": len(knowledge_base),
+                "added": len(added),
+                "removed": len(removed),
+                "changed": len(changed),
+                "seconds": elapsed,
+            }
+
+        logger.info(
+            f"Reloaded knowledge base in {elapsed * 1000:.1f} ms: {len(knowledge_base)} entries "
+            f"(+{len(added)} -{len(removed)} ~{len(changed)})"
+        )
+        return summary
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self.knowledge_base),
+                "reloads": self.reloads,
+                "failures": self.failures,
+                "last_reload_seconds": self.last_reload_seconds,
+            }
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,239 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from utils.helpers import load_knowledge_base
+from utils.metrics import REGISTRY
+from utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Resident bytes per loaded entry besides its answer: the entry dict, question and keyword
+# strings and their keyword index postings (measured with tracemalloc, see benchmarks/bench_kb_router.py)
+ENTRY_OVERHEAD = 3500
+
+PARTITION_LOAD = REGISTRY.histogram(
+    "helpbot_kb_partition_load_seconds", "Time to load and index a knowledge base partition", ("partition",)
+)
+PARTITION_EVICTIONS = REGISTRY.counter(
+    "helpbot_kb_partition_evictions_total", "Knowledge base partitions dropped (memory budget, or their file changed)",
+    ("partition",)
+)
+PARTITION_BYTES = REGISTRY.gauge(
+    "helpbot_kb_partition_bytes", "Estimated memory held by the loaded knowledge base partitions"
+)
+
+
+class PartitionSpec(NamedTuple):
+    name: str
+    path: str
+    channels: Tuple[str, ...]
+    teams: Tuple[str, ...]
+
+
+class _LoadedPartition:
+    __slots__ = ("handler", "size", "mtime", "entries")
+
+    def __init__(self, handler, size: int, mtime: Optional[float], entries: int):
+        self.handler = handler
+        self.size = size
+        self.mtime = mtime
+        self.entries = entries
+
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def estimate_partition_bytes(knowledge_base: Dict) -> int:
+    """Rough resident size of a loaded, indexed knowledge base"""
+    # An answer store keeps its answers on disk
+    answer_bytes = 0 if hasattr(knowledge_base, "answer_bytes") else sum(
+        len(data.get("answer", "")) for data in knowledge_base.values()
+    )
+    return len(knowledge_base) * ENTRY_OVERHEAD + answer_bytes
+
+
+def load_partition_specs(path: str) -> List[PartitionSpec]:
+    """Read a partition map: {"name": {"file": ..., "channels": [...], "teams": [...]}, ...}
+
+    Relative files are resolved against the map's directory.
+    """
+    with open(path, "r") as f:
+        config = json.load(f)
+    directory = os.path.dirname(os.path.abspath(path))
+    return [
+        PartitionSpec(
+            name, os.path.join(directory, partition["file"]),
+            tuple(partition.get("channels", ())), tuple(partition.get("teams", ()))
+        )
+        for name, partition in config.items()
+    ]
+
+
+class KnowledgeBaseRouter:
+    """Knowledge base partitions per channel and team, on top of the global knowledge base.
+
+    Each partition is its own knowledge base file, mapped to the channels
+    and teams it serves. A partition is loaded and indexed (by
+    build_handler, e.g. an EnhancedResponseHandler) the first time a
+    message from one of its channels or teams needs it; concurrent first
+    lookups share one load. Loaded partitions are kept in LRU order and the
+    least recently used are dropped once their estimated size passes
+    memory_budget bytes (the partition just loaded always stays).
+
+    find_best_match() searches only the partitions of the message's channel
+    and team; the global knowledge base is searched by the caller as
+    before and its match is passed in, so global answers still apply and a
+    partition answer wins ties. Every check_interval seconds, loaded
+    partitions whose file changed are dropped and reload on next use.
+    """
+
+    def __init__(self, partitions: List[PartitionSpec], build_handler: Callable[[Dict], object],
+                 memory_budget: int = 512 * 1024 * 1024, check_interval: float = 0):
+        self.partitions = {spec.name: spec for spec in partitions}
+        self.build_handler = build_handler
+        self.memory_budget = memory_budget
+        self.check_interval = check_interval
+
+        self._by_channel: Dict[str, List[str]] = {}
+        self._by_team: Dict[str, List[str]] = {}
+        for spec in partitions:
+            for channel in spec.channels:
+                self._by_channel.setdefault(channel, []).append(spec.name)
+            for team in spec.teams:
+                self._by_team.setdefault(team, []).append(spec.name)
+
+        self._loaded: "OrderedDict[str, _LoadedPartition]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loads = SingleFlight()
+        self._last_check = time.monotonic()
+        self.memory = 0
+
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+        self.evict_seconds = 0.0
+
+    def partitions_for(self, channel: Optional[str], team: Optional[str]) -> List[str]:
+        """Names of the partitions serving a channel and team, channel partitions first"""
+        names = list(self._by_channel.get(channel, ()))
+        for name in self._by_team.get(team, ()):
+            if name not in names:
+                names.append(name)
+        return names
+
+    def handlers_for(self, channel: Optional[str], team: Optional[str]) -> List[Tuple[str, object]]:
+        """(name, handler) of each partition serving a channel and team, loading any that aren't"""
+        names = self.partitions_for(channel, team)
+        if not names:
+            return []
+        if self.check_interval > 0 and time.monotonic() - self._last_check > self.check_interval:
+            self.refresh()
+        return [(name, self._handler(name)) for name in names]
+
+    def find_best_match(self, question: str, channel: Optional[str], team: Optional[str],
+                        global_match: Optional[Dict] = None) -> Optional[Dict]:
+        """Best of the global match and the matches from the channel's and team's partitions"""
+        best = None
+        for name, handler in self.handlers_for(channel, team):
+            match = handler.find_best_match(question)
+            if match is not None and (best is None or match["score"] > best["score"]):
+                best = dict(match, partition=name)
+        if best is None or (global_match is not None and global_match["score"] > best["score"]):
+            return global_match
+        return best
+
+    def _handler(self, name: str):
+        with self._lock:
+            loaded = self._loaded.get(name)
+            if loaded is not None:
+                self._loaded.move_to_end(name)
+                self.hits += 1
+                return loaded.handler
+        return self._loads.do(name, lambda: self._load(name))
+
+    def _load(self, name: str):
+        spec = self.partitions[name]
+        start = time.perf_counter()
+        mtime = _mtime(spec.path)
+        # A missing or broken file loads as an empty partition, retried once the file changes
+        knowledge_base = load_knowledge_base(spec.path)
+        loaded = _LoadedPartition(
+            self.build_handler(knowledge_base), estimate_partition_bytes(knowledge_base), mtime, len(knowledge_base)
+        )
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._loaded[name] = loaded
+            self.memory += loaded.size
+            self.loads += 1
+            self.load_seconds += elapsed
+            evicted = []
+            while self.memory > self.memory_budget and len(self._loaded) > 1:
+                evicted.append(self._loaded.popitem(last=False))
+                self.memory -= evicted[-1][1].size
+        if REGISTRY.enabled:
+            PARTITION_LOAD.labels(name).observe(elapsed)
+        logger.info(f"Loaded knowledge base partition {name}: {loaded.entries} entries, "
+                    f"~{loaded.size / 1e6:.1f} MB in {elapsed * 1000:.0f} ms")
+        self._release(evicted, "memory budget")
+        return loaded.handler
+
+    def _release(self, partitions: List[Tuple[str, _LoadedPartition]], reason: str) -> None:
+        if REGISTRY.enabled:
+            PARTITION_BYTES.labels().set(self.memory)
+        if not partitions:
+            return
+        names = [name for name, _ in partitions]
+        # Frees the indexes now unless a lookup in flight still holds a handler
+        start = time.perf_counter()
+        partitions.clear()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.evictions += len(names)
+            self.evict_seconds += elapsed
+        if REGISTRY.enabled:
+            for name in names:
+                PARTITION_EVICTIONS.labels(name).inc()
+        logger.info(f"Dropped knowledge base partitions {', '.join(names)} ({reason}) in {elapsed * 1000:.1f} ms")
+
+    def refresh(self) -> List[str]:
+        """Drop loaded partitions whose file changed; they reload on next use"""
+        with self._lock:
+            self._last_check = time.monotonic()
+            stale = [name for name, loaded in self._loaded.items()
+                     if _mtime(self.partitions[name].path) != loaded.mtime]
+            dropped = [(name, self._loaded.pop(name)) for name in stale]
+            self.memory -= sum(partition.size for _, partition in dropped)
+        self._release(dropped, "file changed")
+        return stale
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "partitions": len(self.partitions),
+                "loaded": list(self._loaded),
+                "memory": self.memory,
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "load_seconds": self.load_seconds,
+                "evict_seconds": self.evict_seconds,
+            }
+
+
+def create_kb_router(partitions_file: str, build_handler: Callable[[Dict], object], memory_budget: int,
+                     check_interval: float = 0) -> Optional[KnowledgeBaseRouter]:
+    """A KnowledgeBaseRouter over the partition map in partitions_file, or None when it is empty"""
+    if not partitions_file:
+        return None
+    return KnowledgeBaseRouter(load_partition_specs(partitions_file), build_handler, memory_budget, check_interval)
@@ -0,0 +1,197 @@
+import gc
+import json
+import logging
+import mmap
+import os
+import pickle
+import struct
+import sys
+import tempfile
+import time
+from typing import Dict, NamedTuple, Optional
+
+from utils.helpers import knowledge_base_version, load_knowledge_base
+from utils.keyword_index import KeywordIndex
+from utils.retrieval import SparseRetrievalEngine, create_retrieval_engine
+from utils.semantic_index import SemanticIndex, create_semantic_index
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"HBKBSNAP"
+# Bump when anything pickled into the snapshot changes shape, or how its indexes split words
+SNAPSHOT_FORMAT = 3
+# Array buffers start on this boundary so mapped NumPy arrays are aligned
+BUFFER_ALIGNMENT = 64
+
+
+class KnowledgeBaseSnapshot(NamedTuple):
+    knowledge_base: Dict
+    version: str
+    keyword_index: Optional[KeywordIndex]
+    retrieval_engine: Optional[SparseRetrievalEngine]
+    semantic_index: Optional[SemanticIndex]
+    from_snapshot: bool
+
+
+def _stamp(source_path: str, keyword_index: bool, scoring: Optional[str], semantic: bool) -> Optional[Dict]:
+    """What a snapshot must have been built from to be reused"""
+    try:
+        stat = os.stat(source_path)
+    except OSError:
+        return None
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "python": list(sys.version_info[:2]),
+        "source_mtime_ns": stat.st_mtime_ns,
+        "source_size": stat.st_size,
+        "keyword_index": keyword_index,
+        "scoring": scoring or None,
+        "semantic": semantic,
+    }
+
+
+def build_snapshot(knowledge_base: Dict, keyword_index: bool = False,
+                   scoring: Optional[str] = None, semantic: bool = False) -> KnowledgeBaseSnapshot:
+    """Build the indexes the handlers would otherwise build at startup"""
+    engine = None
+    try:
+        engine = create_retrieval_engine(knowledge_base, scoring)
+    except ImportError as e:
+        logger.warning(f"Retrieval engine not built: {e}")
+    return KnowledgeBaseSnapshot(
+        knowledge_base,
+        knowledge_base_version(knowledge_base),
+        KeywordIndex(knowledge_base) if keyword_index else None,
+        engine,
+        create_semantic_index(knowledge_base, semantic),
+        False,
+    )
+
+
+def write_snapshot(path: str, snapshot: KnowledgeBaseSnapshot, stamp: Dict) -> None:
+    """Write atomically: stamp, pickled indexes, then each NumPy array as raw aligned bytes.
+
+    Arrays go out of band (pickle protocol 5) so read_snapshot can map them
+    instead of copying them.
+    """
+    buffers = []
+    payload = pickle.dumps(
+        {
+            "knowledge_base": snapshot.knowledge_base,
+            "version": snapshot.version,
+            "keyword_index": snapshot.keyword_index,
+            "retrieval_engine": snapshot.retrieval_engine,
+            "semantic_index": snapshot.semantic_index,
+        },
+        protocol=5, buffer_callback=buffers.append,
+    )
+    raw_buffers = [buffer.raw() for buffer in buffers]
+    stamp_bytes = json.dumps(stamp, sort_keys=True).encode("utf-8")
+
+    header_size = (len(SNAPSHOT_MAGIC) + 4 + len(stamp_bytes) + 8 + len(payload)
+                   + 4 + 16 * len(raw_buffers))
+    offsets = []
+    offset = header_size
+    for raw in raw_buffers:
+        offset += -offset % BUFFER_ALIGNMENT
+        offsets.append(offset)
+        offset += raw.nbytes
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".kb_snapshot-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(struct.pack("<I", len(stamp_bytes)))
+            f.write(stamp_bytes)
+            f.write(struct.pack("<Q", len(payload)))
+            f.write(payload)
+            f.write(struct.pack("<I", len(raw_buffers)))
+            for buffer_offset, raw in zip(offsets, raw_buffers):
+                f.write(struct.pack("<QQ", buffer_offset, raw.nbytes))
+            for buffer_offset, raw in zip(offsets, raw_buffers):
+                f.write(b"\0" * (buffer_offset - f.tell()))
+                f.write(raw)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def read_snapshot(path: str, stamp: Dict) -> Optional[KnowledgeBaseSnapshot]:
+    """Load a snapshot built from exactly `stamp`, or None if it is missing, stale or unreadable.
+
+    Snapshots are pickles: only read files this bot wrote itself.
+    """
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    view = memoryview(mapped)
+    try:
+        if view[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            return None
+        position = len(SNAPSHOT_MAGIC)
+        (stamp_size,) = struct.unpack_from("<I", view, position)
+        position += 4
+        if json.loads(bytes(view[position:position + stamp_size])) != stamp:
+            return None
+        position += stamp_size
+
+        (payload_size,) = struct.unpack_from("<Q", view, position)
+        position += 8
+        payload = view[position:position + payload_size]
+        position += payload_size
+        (buffer_count,) = struct.unpack_from("<I", view, position)
+        position += 4
+        buffers = []
+        for _ in range(buffer_count):
+            buffer_offset, size = struct.unpack_from("<QQ", view, position)
+            position += 16
+            buffers.append(view[buffer_offset:buffer_offset + size])
+
+        # NumPy arrays come back as read-only views of the mapping, not copies. The
+        # collector is paused meanwhile: it would keep rescanning the new containers
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            data = pickle.loads(payload, buffers=buffers)
+        finally:
+            if gc_enabled:
+                gc.enable()
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable knowledge base snapshot {path}: {e}")
+        return None
+
+    return KnowledgeBaseSnapshot(
+        data["knowledge_base"], data["version"], data["keyword_index"], data["retrieval_engine"],
+        data["semantic_index"], True
+    )
+
+
+def load_knowledge_base_snapshot(source_path: str, snapshot_path: str = "", keyword_index: bool = False,
+                                 scoring: Optional[str] = None, semantic: bool = False) -> KnowledgeBaseSnapshot:
+    """The knowledge base in source_path with its indexes, from snapshot_path when that is current.
+
+    A snapshot is rebuilt (and rewritten) when the JSON file has changed
+    since it was written or it was built for other indexes. An empty
+    snapshot_path always builds from the JSON file.
+    """
+    start = time.perf_counter()
+    stamp = _stamp(source_path, keyword_index, scoring, semantic) if snapshot_path else None
+    if stamp is not None:
+        snapshot = read_snapshot(snapshot_path, stamp)
+        if snapshot is not None:
+            logger.info(f"Loaded knowledge base snapshot {snapshot_path} in {(time.perf_counter() - start) * 1000:.1f} ms")
+            return snapshot
+
+    snapshot = build_snapshot(load_knowledge_base(source_path), keyword_index, scoring, semantic)
+    if stamp is not None:
+        try:
+            write_snapshot(snapshot_path, snapshot, stamp)
+            logger.info(f"Wrote knowledge base snapshot {snapshot_path}")
+        except Exception as e:
+            logger.warning(f"Could not write knowledge base snapshot {snapshot_path}: {e}")
+    return snapshot
@@ -0,0 +1,149 @@
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Owner slot used for an entry's main "question" string (keywords use their list index)
+QUESTION_SLOT = -1
+
+
+class ScanResult(NamedTuple):
+    first_keyword_topic: Optional[str]
+    scores: Dict[str, float]
+
+
+class KeywordIndex:
+    """Aho-Corasick automaton over every knowledge base keyword and question.
+
+    Built once per knowledge base so a message is scanned a single time no
+    matter how many entries there are. The results reproduce the scoring of
+    EnhancedResponseHandler exactly: the first keyword hit in knowledge base
+    order, plus calculate_match_score for every entry that was hit.
+
+    Passing the previous index on a reload keeps its automaton whenever no
+    new keyword or question string appeared; only the owner table is redone.
+    """
+
+    def __init__(self, knowledge_base: Dict, previous: Optional["KeywordIndex"] = None):
+        self.knowledge_base = knowledge_base
+        self.topics: List[str] = list(knowledge_base.keys())
+
+        # Pattern ids are kept stable across reloads so the automaton can be reused
+        self.pattern_ids: Dict[str, int] = dict(previous.pattern_ids) if previous else {}
+        # pattern id -> list of (entry index, keyword index or QUESTION_SLOT)
+        self._owners: List[List[Tuple[int, int]]] = [[] for _ in self.pattern_ids]
+
+        new_patterns = False
+        for entry_index, key in enumerate(self.topics):
+            data = knowledge_base[key]
+            patterns = [(kw_index, keyword) for kw_index, keyword in enumerate(data["keywords"])]
+            patterns.append((QUESTION_SLOT, data["question"]))
+
+            for slot, pattern in patterns:
+                pattern = pattern.lower()
+                if pattern not in self.pattern_ids:
+                    self.pattern_ids[pattern] = len(self._owners)
+                    self._owners.append([])
+                    new_patterns = True
+                self._owners[self.pattern_ids[pattern]].append((entry_index, slot))
+
+        live_patterns = sum(1 for owners in self._owners if owners)
+        if previous and not new_patterns and live_patterns * 2 >= len(self._owners):
+            # Only answers or pattern ownership changed: the automaton is still valid.
+            # Patterns nobody owns any more just produce hits that are ignored.
+            self._goto, self._fail, self._outputs, self._always = (
+                previous._goto, previous._fail, previous._outputs, previous._always
+            )
+            self.rebuilt = False
+            return
+
+        if previous and live_patterns < len(self._owners):
+            # Rebuilding anyway, so drop the dead patterns and renumber
+            live = [(pattern, self._owners[pid]) for pattern, pid in self.pattern_ids.items() if self._owners[pid]]
+            self.pattern_ids = {pattern: pid for pid, (pattern, _) in enumerate(live)}
+            self._owners = [owners for _, owners in live]
+
+        self._build(self.pattern_ids)
+        self.rebuilt = True
+
+    def _build(self, pattern_ids: Dict[str, int]) -> None:
+        """Build the trie, failure links and merged outputs"""
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+        # Empty strings are contained in every message, so they never go in the trie
+        self._always: List[int] = []
+
+        for pattern, pattern_id in pattern_ids.items():
+            if not pattern:
+                self._always.append(pattern_id)
+                continue
+
+            state = 0
+            for char in pattern:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    outputs.append([])
+                state = next_state
+            outputs[state].append(pattern_id)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(char, 0)
+                outputs[next_state].extend(outputs[fail[next_state]])
+
+        self._goto = goto
+        self._fail = fail
+        self._outputs = [tuple(out) for out in outputs]
+
+    def matched_patterns(self, text: str) -> set:
+        """Return the ids of every pattern contained in text (one pass)"""
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+
+        matched = set(self._always)
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if outputs[state]:
+                matched.update(outputs[state])
+        return matched
+
+    def scan(self, question_lower: str) -> ScanResult:
+        """Scan a lowercased question and score every hit topic"""
+        first_hit: Optional[Tuple[int, int]] = None
+        keyword_hits: Dict[int, int] = {}
+        question_hits = set()
+
+        owners = self._owners
+        for pattern_id in self.matched_patterns(question_lower):
+            for entry_index, slot in owners[pattern_id]:
+                if slot == QUESTION_SLOT:
+                    question_hits.add(entry_index)
+                    continue
+                keyword_hits[entry_index] = keyword_hits.get(entry_index, 0) + 1
+                if first_hit is None or (entry_index, slot) < first_hit:
+                    first_hit = (entry_index, slot)
+
+        scores: Dict[str, float] = {}
+        for entry_index in sorted(question_hits.union(keyword_hits)):
+            # Same accumulation order as calculate_match_score so floats agree
+            score = 0
+            for _ in range(keyword_hits.get(entry_index, 0)):
+                score += 0.3
+            if entry_index in question_hits:
+                score += 0.5
+            scores[self.topics[entry_index]] = min(score, 1.0)
+
+        first_topic = self.topics[first_hit[0]] if first_hit else None
+        return ScanResult(first_topic, scores)
@@ -0,0 +1,98 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from utils.metrics import REGISTRY
+
+MATCH_MEMO = REGISTRY.counter(
+    "helpbot_match_memo_total", "Knowledge base lookups answered from the match memo (hit) or computed (miss)",
+    ("memo", "result")
+)
+
+# get() result for a question that isn't memoized (None is a memoized "no match")
+MISSING = object()
+
+
+class MatchMemo:
+    """Bounded LRU of match results keyed on the normalized question.
+
+    Only (topic, score) is kept, or None for "no match"; callers read the
+    answer from the current knowledge base. Every result is tagged with the
+    knowledge base version it was computed against: invalidate() bumps the
+    version, and put() drops results from a lookup that started before it.
+    """
+
+    def __init__(self, max_size: int = 10000, name: str = ""):
+        self.max_size = max_size
+        self.name = name
+        self.version = 0
+        self._entries: "OrderedDict[str, Optional[Tuple[str, float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, question: str):
+        """(topic, score), None for a memoized miss, or MISSING"""
+        with self._lock:
+            result = self._entries.get(question, MISSING)
+            if result is MISSING:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(question)
+                self.hits += 1
+        if REGISTRY.enabled:
+            MATCH_MEMO.labels(self.name, "miss" if result is MISSING else "hit").inc()
+        return result
+
+    def put(self, question: str, result: Optional[Tuple[str, float]], version: int) -> None:
+        """Remember result, computed against knowledge base `version` (read before the lookup)"""
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[question] = result
+            self._entries.move_to_end(question)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def lookup(self, question: str, knowledge_base: Dict,
+               find: Callable[[str], Optional[Dict]]) -> Optional[Dict]:
+        """The memoized match for question, or find(question) (remembered for next time)"""
+        version = self.version
+        result = self.get(question)
+        if result is None:
+            return None
+        if result is not MISSING:
+            topic, score = result
+            entry = knowledge_base.get(topic)
+            # A reload swaps the knowledge base just before invalidating; treat a vanished topic as a miss
+            if entry is not None:
+                return {"answer": entry["answer"], "score": score, "topic": topic}
+
+        match = find(question)
+        self.put(question, (match["topic"], match["score"]) if match else None, version)
+        return match
+
+    def invalidate(self) -> None:
+        """Forget everything; call when the knowledge base changes"""
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+def create_match_memo(max_size: int, name: str = "") -> Optional[MatchMemo]:
+    """A MatchMemo, or None when max_size is 0 (memoization off)"""
+    return MatchMemo(max_size, name) if max_size > 0 else None
@@ -0,0 +1,289 @@
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import deque
+from json.decoder import scanstring
+from typing import Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_CONVERSATIONS_PER_USER = 10
+
+# Every log line starts with the user id, as written by json.dumps
+_USER_PREFIX = b'{"user": "'
+
+
+class WriteBehindStore:
+    """Base class for conversation stores that persist in the background.
+
+    add_conversation only queues the record. A flusher thread writes queued
+    records in batches, either when batch_size records are waiting or every
+    flush_interval seconds. close() (also registered with atexit) writes
+    whatever is still pending.
+    """
+
+    def __init__(self, batch_size: int = 500, flush_interval: float = 1.0,
+                 max_per_user: int = MAX_CONVERSATIONS_PER_USER):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_per_user = max_per_user
+
+        self._pending: List[Tuple[str, Dict]] = []
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name=f"{type(self).__name__}-flusher", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def append(self, user_id: str, record: Dict) -> None:
+        """Queue a conversation record for the next flush"""
+        with self._condition:
+            self._pending.append((user_id, record))
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if not self._closed and len(self._pending) < self.batch_size:
+                    self._condition.wait(self.flush_interval)
+                if self._closed:
+                    return
+            self.flush()
+
+    def flush(self) -> None:
+        """Write all queued records now"""
+        with self._write_lock:
+            with self._condition:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                logger.error(f"Error saving memory batch of {len(batch)} records: {e}")
+
+    def close(self) -> None:
+        """Stop the flusher thread and write anything still queued"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
+        self._close()
+
+    def load(self) -> Dict[str, List[Dict]]:
+        raise NotImplementedError
+
+    def load_user(self, user_id: str) -> List[Dict]:
+        return self.load().get(user_id, [])
+
+    def _write_batch(self, batch: List[Tuple[str, Dict]]) -> None:
+        raise NotImplementedError
+
+    def _close(self) -> None:
+        pass
+
+
+class AppendLogStore(WriteBehindStore):
+    """Append-only JSON lines log, compacted once it grows well past its live size.
+
+    The byte offsets of each user's last max_per_user lines are indexed
+    when the log is opened and as lines are appended, so load_user reads
+    only those lines instead of scanning the log.
+    """
+
+    def __init__(self, path: str = "conversation_memory.log", compact_min_lines: int = 10000,
+                 compact_ratio: float = 4.0, **kwargs):
+        self.path = path
+        self.compact_min_lines = compact_min_lines
+        self.compact_ratio = compact_ratio
+        self._line_count = 0
+        self._compacted_size = 0
+        self._offsets: Dict[str, Deque[int]] = {}
+        super().__init__(**kwargs)
+
+        with self._write_lock:
+            self._index_log()
+
+    def _index_offset(self, index: Dict[str, Deque[int]], user_id: str, offset: int) -> None:
+        offsets = index.get(user_id)
+        if offsets is None:
+            offsets = index[user_id] = deque(maxlen=self.max_per_user)
+        offsets.append(offset)
+
+    def _index_log(self) -> None:
+        if not os.path.exists(self.path):
+            return
+
+        offset = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                self._line_count += 1
+                # Only the leading user id is parsed; a torn final line from a crash mid-write has no newline
+                if line.startswith(_USER_PREFIX) and line.endswith(b"\n"):
+                    try:
+                        user_id, _ = scanstring(line.decode(), len(_USER_PREFIX))
+                        self._index_offset(self._offsets, user_id, offset)
+                    except ValueError:
+                        pass
+                offset += len(line)
+
+    def _read_log(self) -> Dict[str, List[Dict]]:
+        memory: Dict[str, List[Dict]] = {}
+        if not os.path.exists(self.path):
+            return memory
+
+        with open(self.path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-write, skip it
+                    continue
+                history = memory.setdefault(entry["user"], [])
+                history.append(entry["record"])
+                if len(history) > self.max_per_user:
+                    del history[0]
+        return memory
+
+    def load(self) -> Dict[str, List[Dict]]:
+        with self._write_lock:
+            return self._read_log()
+
+    def load_user(self, user_id: str) -> List[Dict]:
+        """Logged history plus anything queued but not flushed yet"""
+        history: List[Dict] = []
+        with self._write_lock:
+            offsets = self._offsets.get(user_id)
+            if offsets:
+                with open(self.path, 'rb') as f:
+                    for offset in offsets:
+                        f.seek(offset)
+                        try:
+                            history.append(json.loads(f.readline())["record"])
+                        except ValueError:
+                            # Appended onto a torn line, so unreadable in a full scan too
+                            continue
+            with self._condition:
+                history.extend(record for pending_user, record in self._pending if pending_user == user_id)
+        return history[-self.max_per_user:]
+
+    def _write_lines(self, f, entries, index: Dict[str, Deque[int]]) -> int:
+        """Write (user_id, record) lines to the end of f, adding their offsets to index; returns the line count"""
+        offset = f.tell()
+        lines, positions = [], []
+        for user_id, record in entries:
+            line = (json.dumps({"user": user_id, "record": record}) + "\n").encode()
+            positions.append((user_id, offset))
+            offset += len(line)
+            lines.append(line)
+        f.write(b"".join(lines))
+        f.flush()
+        # Indexed only once written, so a failed write leaves no offsets past the end of the log
+        for user_id, offset in positions:
+            self._index_offset(index, user_id, offset)
+        return len(lines)
+
+    def _write_batch(self, batch: List[Tuple[str, Dict]]) -> None:
+        with open(self.path, 'ab') as f:
+            self._line_count += self._write_lines(f, batch, self._offsets)
+
+        if self._line_count > max(self.compact_min_lines, self._compacted_size * self.compact_ratio):
+            self._compact()
+
+    def _compact(self) -> None:
+        """Rewrite the log keeping only the last max_per_user records per user"""
+        memory = self._read_log()
+        temp_path = f"{self.path}.compact"
+        offsets: Dict[str, Deque[int]] = {}
+        with open(temp_path, 'wb') as f:
+            lines = self._write_lines(
+                f, ((user_id, record) for user_id, history in memory.items() for record in history), offsets
+            )
+        os.replace(temp_path, self.path)
+        self._offsets = offsets
+        logger.info(f"Compacted conversation log from {self._line_count} to {lines} lines")
+        self._line_count = self._compacted_size = lines
+
+
+class SQLiteStore(WriteBehindStore):
+    """SQLite database in WAL mode, trimmed to max_per_user rows per user"""
+
+    def __init__(self, path: str = "conversation_memory.db", **kwargs):
+        self.path = path
+        # One connection per process; WAL lets worker processes read while another writes
+        self._connection = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, "
+            "timestamp TEXT, question TEXT, response TEXT)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS conversations_user ON conversations (user_id, id)"
+        )
+        self._connection.commit()
+        super().__init__(**kwargs)
+
+    @staticmethod
+    def _record(row) -> Dict:
+        return {"timestamp": row[0], "question": row[1], "response": row[2]}
+
+    def load(self) -> Dict[str, List[Dict]]:
+        memory: Dict[str, List[Dict]] = {}
+        with self._write_lock:
+            rows = self._connection.execute(
+                "SELECT user_id, timestamp, question, response FROM conversations ORDER BY id"
+            )
+            for row in rows:
+                memory.setdefault(row[0], []).append(self._record(row[1:]))
+        return memory
+
+    def load_user(self, user_id: str) -> List[Dict]:
+        """Stored history plus anything this process has queued but not flushed yet"""
+        with self._write_lock:
+            rows = self._connection.execute(
+                "SELECT timestamp, question, response FROM conversations "
+                "WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+                (user_id, self.max_per_user)
+            ).fetchall()
+            with self._condition:
+                pending = [record for pending_user, record in self._pending if pending_user == user_id]
+        history = [self._record(row) for row in reversed(rows)] + pending
+        return history[-self.max_per_user:]
+
+    def _write_batch(self, batch: List[Tuple[str, Dict]]) -> None:
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO conversations (user_id, timestamp, question, response) VALUES (?, ?, ?, ?)",
+                [(user_id, r["timestamp"], r["question"], r["response"]) for user_id, r in batch]
+            )
+            # Drop everything older than the newest max_per_user rows of each touched user
+            self._connection.executemany(
+                "DELETE FROM conversations WHERE user_id = ? AND id <= ("
+                "SELECT id FROM conversations WHERE user_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                [(user_id, user_id, self.max_per_user) for user_id in {user_id for user_id, _ in batch}]
+            )
+
+    def _close(self) -> None:
+        self._connection.close()
+
+
+def create_memory_store(backend: str) -> Optional[WriteBehindStore]:
+    """Build the store named by backend; "json" (or empty) keeps the original JSON file"""
+    if not backend or backend == "json":
+        return None
+    if backend == "log":
+        return AppendLogStore()
+    if backend == "sqlite":
+        return SQLiteStore()
+    raise ValueError(f"Unknown memory backend: {backend}")
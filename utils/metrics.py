@@ -0,0 +1,322 @@
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers everything from a cached match to a slow AI completion
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (cumulative counts computed on read)"""
+
+    def __init__(self, name: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th percentile (0-100)"""
+        with self._lock:
+            total = self._count
+            counts = list(self._counts)
+        if not total:
+            return None
+
+        rank = q / 100 * total
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            cumulative: List[int] = []
+            running = 0
+            for count in self._counts:
+                running += count
+                cumulative.append(running)
+            return {
+                "buckets": dict(zip(self.buckets + (float("inf"),), cumulative)),
+                "sum": self._sum,
+                "count": self._count,
+            }
+
+
+class Counter:
+    """Monotonic counter"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Gauge:
+    """Value that goes up and down (queue depth, in-flight requests)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self._value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value -= amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class MetricFamily:
+    """A named metric split by label values; children are created on first use"""
+
+    TYPE = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str]):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        """Child metric for these label values (positional, in labelnames order)"""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _label_text(self, values: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.TYPE}"]
+        with self._lock:
+            children = sorted(self._children.items())
+        for values, child in children:
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values: Tuple[str, ...], child) -> List[str]:
+        raise NotImplementedError
+
+
+class HistogramFamily(MetricFamily):
+    TYPE = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self) -> Histogram:
+        return Histogram(self.name, self.buckets)
+
+    def _render_child(self, values: Tuple[str, ...], child: Histogram) -> List[str]:
+        snapshot = child.snapshot()
+        lines = []
+        for bound, count in snapshot["buckets"].items():
+            le = 'le="' + _format_bound(bound) + '"'
+            lines.append(f"{self.name}_bucket{self._label_text(values, le)} {count}")
+        lines.append(f"{self.name}_sum{self._label_text(values)} {snapshot['sum']}")
+        lines.append(f"{self.name}_count{self._label_text(values)} {snapshot['count']}")
+        return lines
+
+
+class CounterFamily(MetricFamily):
+    TYPE = "counter"
+
+    def _new_child(self) -> Counter:
+        return Counter(self.name)
+
+    def _render_child(self, values: Tuple[str, ...], child: Counter) -> List[str]:
+        return [f"{self.name}{self._label_text(values)} {child.value}"]
+
+
+class GaugeFamily(MetricFamily):
+    TYPE = "gauge"
+
+    def _new_child(self) -> Gauge:
+        return Gauge(self.name)
+
+    def _render_child(self, values: Tuple[str, ...], child: Gauge) -> List[str]:
+        return [f"{self.name}{self._label_text(values)} {child.value}"]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+class MetricsRegistry:
+    """Every metric family the process exposes, rendered in Prometheus text format"""
+
+    def __init__(self):
+        self._families: Dict[str, MetricFamily] = {}
+        self._lock = threading.Lock()
+        # Switched off, timed() blocks and answer counting do nothing (used to measure overhead)
+        self.enabled = True
+
+    def _register(self, family: MetricFamily) -> MetricFamily:
+        with self._lock:
+            existing = self._families.get(family.name)
+            if existing is not None:
+                return existing
+            self._families[family.name] = family
+            return family
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> HistogramFamily:
+        return self._register(HistogramFamily(name, help_text, labelnames, buckets))
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> CounterFamily:
+        return self._register(CounterFamily(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> GaugeFamily:
+        return self._register(GaugeFamily(name, help_text, labelnames))
+
+    def render(self) -> str:
+        with self._lock:
+            families = list(self._families.values())
+        lines = []
+        for family in families:
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# topic is only set on find_best_match, so series grow with the knowledge base size
+STAGE_SECONDS = REGISTRY.histogram(
+    "helpbot_stage_seconds", "Time spent in each stage of handling a Slack message",
+    ("stage", "handler", "topic")
+)
+ANSWERS = REGISTRY.counter(
+    "helpbot_answers_total", "Answers given, by source (kb, ai or unknown)", ("handler", "source")
+)
+
+# Which listener (mention, message, ask, ...) the current thread or task is serving
+_current_handler: contextvars.ContextVar = contextvars.ContextVar("metrics_handler", default="")
+
+
+def set_handler(name: str) -> None:
+    """Label the stages recorded from here on in this thread/task with handler=name"""
+    _current_handler.set(name)
+
+
+def current_handler() -> str:
+    return _current_handler.get()
+
+
+def observe_stage(stage: str, seconds: float, topic: str = "", handler: Optional[str] = None) -> None:
+    if not REGISTRY.enabled:
+        return
+    if handler is None:
+        handler = _current_handler.get()
+    STAGE_SECONDS.labels(stage, handler, topic).observe(seconds)
+
+
+class timed:
+    """Time a block as one stage; set .topic inside the block once it is known
+
+        with timed("find_best_match") as timer:
+            match = handler.find_best_match(text)
+            timer.topic = match["topic"] if match else ""
+    """
+
+    __slots__ = ("stage", "topic", "handler", "_start")
+
+    def __init__(self, stage: str, topic: str = "", handler: Optional[str] = None):
+        self.stage = stage
+        self.topic = topic
+        self.handler = handler
+
+    def __enter__(self) -> "timed":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        observe_stage(self.stage, time.perf_counter() - self._start, self.topic, self.handler)
+
+
+def answer_source(match: Optional[Dict]) -> str:
+    if not match:
+        return "unknown"
+    return "ai" if match.get("topic") == "ai_generated" else "kb"
+
+
+def record_answer(match: Optional[Dict]) -> None:
+    """Count a final answer as a knowledge base hit, AI fallback or unknown"""
+    if REGISTRY.enabled:
+        ANSWERS.labels(_current_handler.get(), answer_source(match)).inc()
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1", registry: MetricsRegistry = REGISTRY) -> ThreadingHTTPServer:
+    """Serve registry.render() at /metrics from a background thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
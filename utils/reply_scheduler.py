@@ -0,0 +1,369 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, Optional, Tuple, Union
+from utils.metrics import REGISTRY, set_handler
+
+logger = logging.getLogger(__name__)
+
+SCHEDULED_REPLIES = REGISTRY.counter(
+    "helpbot_scheduled_replies_total", "Delayed auto-replies, by outcome (dispatched, cancelled or failed)",
+    ("outcome",)
+)
+PENDING_REPLIES = REGISTRY.gauge(
+    "helpbot_scheduled_replies_pending", "Delayed auto-replies waiting for their delay to pass"
+)
+
+
+def _count_reply(outcome: str) -> None:
+    if REGISTRY.enabled:
+        SCHEDULED_REPLIES.labels(outcome).inc()
+
+
+def _set_pending(count: int) -> None:
+    if REGISTRY.enabled:
+        PENDING_REPLIES.labels().set(count)
+
+
+def _reply_time(reply_ts: Optional[str]) -> float:
+    """A Slack message ts as epoch seconds (now when unknown)"""
+    try:
+        return float(reply_ts)
+    except (TypeError, ValueError):
+        return time.time()
+
+
+def answers_help_request(answered_by: Optional[str], reply_ts: Optional[str], requester: Optional[str],
+                         asked_at: float) -> bool:
+    """Whether a thread reply answers the help message: someone other than the requester, posted after it"""
+    if answered_by is not None and answered_by == requester:
+        return False
+    return _reply_time(reply_ts) > asked_at
+
+
+class PendingReply:
+    __slots__ = ("channel", "thread_ts", "text", "requester", "due", "asked_at")
+
+    def __init__(self, channel: str, thread_ts: str, text: str, requester: Optional[str], due: float,
+                 asked_ts: Optional[str] = None):
+        self.channel = channel
+        self.thread_ts = thread_ts
+        self.text = text
+        self.requester = requester
+        self.due = due
+        # The help message's own ts: replies posted after it count, even ones handled before schedule()
+        self.asked_at = _reply_time(asked_ts or thread_ts)
+
+
+class ThreadAnswers:
+    """Who replied in which thread, for one process (SQLiteThreadAnswers shares it between processes).
+
+    A reply can be handled before the help message it answers is
+    scheduled (the message waited in the listener queue), so replies are
+    remembered for ttl seconds and checked again when the reply is due.
+    """
+
+    def __init__(self, ttl: float = 3600):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # (channel, thread_ts) -> ({user: latest reply ts}, when last marked), oldest first
+        self._threads: "OrderedDict[Tuple[str, str], Tuple[Dict[str, float], float]]" = OrderedDict()
+
+    def mark(self, channel: str, thread_ts: str, user: str, reply_ts: Optional[str] = None) -> None:
+        now = time.time()
+        with self._lock:
+            replies, _ = self._threads.pop((channel, thread_ts), ({}, 0.0))
+            replies[user] = max(replies.get(user, 0.0), _reply_time(reply_ts))
+            self._threads[(channel, thread_ts)] = (replies, now)
+            while self._threads and next(iter(self._threads.values()))[1] <= now - self.ttl:
+                self._threads.popitem(last=False)
+
+    def answered_by_other(self, channel: str, thread_ts: str, requester: Optional[str], since: float) -> bool:
+        """Whether someone other than the requester replied in the thread after `since` (epoch seconds)"""
+        with self._lock:
+            replies, _ = self._threads.get((channel, thread_ts), ({}, 0.0))
+            return any(user != requester and reply_time > since for user, reply_time in replies.items())
+
+
+class SQLiteThreadAnswers:
+    """Who replied in which thread, shared by every worker process.
+
+    With several HTTP workers the thread reply that should cancel an
+    auto-reply can be handled by a different process than the one holding
+    it, so ReplyScheduler records replies here and checks before posting.
+    Each user's latest reply ts per thread is kept, so replies from before
+    the help message don't count.
+    """
+
+    def __init__(self, path: str, ttl: float = 3600):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        # thread_replies replaces thread_answers, which had no reply ts
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS thread_replies ("
+            "channel TEXT NOT NULL, thread_ts TEXT NOT NULL, user TEXT NOT NULL, reply_ts REAL NOT NULL, "
+            "answered REAL NOT NULL, PRIMARY KEY (channel, thread_ts, user))"
+        )
+        self._connection.commit()
+
+    def mark(self, channel: str, thread_ts: str, user: str, reply_ts: Optional[str] = None) -> None:
+        now = time.time()
+        with self._lock:
+            try:
+                with self._connection:
+                    self._connection.execute(
+                        "INSERT INTO thread_replies (channel, thread_ts, user, reply_ts, answered) VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT (channel, thread_ts, user) DO UPDATE SET "
+                        "reply_ts = max(reply_ts, excluded.reply_ts), answered = excluded.answered",
+                        (channel, thread_ts, user, _reply_time(reply_ts), now)
+                    )
+                    self._connection.execute("DELETE FROM thread_replies WHERE answered <= ?", (now - self.ttl,))
+            except sqlite3.Error as e:
+                logger.error(f"Error recording thread reply: {e}")
+
+    def answered_by_other(self, channel: str, thread_ts: str, requester: Optional[str], since: float) -> bool:
+        """Whether someone other than the requester replied in the thread after `since` (epoch seconds)"""
+        with self._lock:
+            try:
+                row = self._connection.execute(
+                    "SELECT 1 FROM thread_replies WHERE channel = ? AND thread_ts = ? AND user != ? AND reply_ts > ? "
+                    "LIMIT 1",
+                    (channel, thread_ts, requester or "", since)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.error(f"Error checking thread replies: {e}")
+                return False
+        return row is not None
+
+
+class ReplyScheduler:
+    """Delay queue for auto-replies so listener threads never sleep.
+
+    schedule() returns immediately; a single timer thread posts each reply
+    with chat_postMessage once its delay expires. A reply is dropped if
+    someone other than the requester (and not a bot, the bot itself
+    included) answers in the thread after the help message, even when
+    that answer was handled before schedule(); pass shared
+    SQLiteThreadAnswers when other processes see some of the replies.
+    dispatched and failed count posts once Slack has accepted or refused them.
+    """
+
+    def __init__(self, client, answers: Optional[Union[ThreadAnswers, SQLiteThreadAnswers]] = None):
+        self.client = client
+        self.answers = answers if answers is not None else ThreadAnswers()
+
+        self._pending: Dict[Tuple[str, str], PendingReply] = {}
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._closed = False
+
+        self.dispatched = 0
+        self.cancelled = 0
+        self.failed = 0
+
+        self._thread = threading.Thread(target=self._run, name="reply-scheduler", daemon=True)
+        self._thread.start()
+
+    def schedule(self, channel: str, thread_ts: str, text: str, delay: float, requester: Optional[str] = None,
+                 asked_ts: Optional[str] = None) -> None:
+        """Post text in the thread after delay seconds unless cancelled first.
+
+        asked_ts is the help message's ts (defaults to thread_ts): thread replies after it cancel.
+        """
+        reply = PendingReply(channel, thread_ts, text, requester, time.monotonic() + delay, asked_ts)
+        with self._condition:
+            self._pending[(channel, thread_ts)] = reply
+            heapq.heappush(self._heap, (reply.due, next(self._sequence), reply))
+            _set_pending(len(self._pending))
+            self._condition.notify()
+
+    def cancel(self, channel: str, thread_ts: str, answered_by: Optional[str] = None,
+               reply_ts: Optional[str] = None, from_bot: bool = False) -> bool:
+        """Drop the pending reply for a thread; replies from the requester, from bots or from
+        before the help message don't count"""
+        if from_bot:
+            return False
+        if answered_by is not None:
+            self.answers.mark(channel, thread_ts, answered_by, reply_ts)
+
+        with self._condition:
+            reply = self._pending.get((channel, thread_ts))
+            if reply is None or not answers_help_request(answered_by, reply_ts, reply.requester, reply.asked_at):
+                return False
+            del self._pending[(channel, thread_ts)]
+            self.cancelled += 1
+            _set_pending(len(self._pending))
+        _count_reply("cancelled")
+
+        logger.info(f"Dropped pending auto-reply in {channel} ({thread_ts}), thread already answered")
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {
+                "pending": len(self._pending),
+                "dispatched": self.dispatched,
+                "cancelled": self.cancelled,
+                "failed": self.failed,
+            }
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _next_due(self) -> Optional[PendingReply]:
+        """Wait for the earliest reply to come due; None once closed"""
+        with self._condition:
+            while not self._closed:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+
+                due, _, reply = self._heap[0]
+                wait = due - time.monotonic()
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+
+                heapq.heappop(self._heap)
+                key = (reply.channel, reply.thread_ts)
+                # Skip cancelled replies and ones superseded by a newer schedule()
+                if self._pending.get(key) is reply:
+                    del self._pending[key]
+                    _set_pending(len(self._pending))
+                    return reply
+            return None
+
+    def _run(self) -> None:
+        set_handler("scheduled_reply")
+        while True:
+            reply = self._next_due()
+            if reply is None:
+                return
+
+            if self.answers.answered_by_other(reply.channel, reply.thread_ts, reply.requester, reply.asked_at):
+                # Answered before the reply was scheduled, or in a thread another worker process saw
+                with self._condition:
+                    self.cancelled += 1
+                _count_reply("cancelled")
+                continue
+
+            try:
+                result = self.client.chat_postMessage(
+                    channel=reply.channel,
+                    text=reply.text,
+                    thread_ts=reply.thread_ts
+                )
+            except Exception as e:
+                self._record_post(e)
+                continue
+            if isinstance(result, Future):
+                # A queued post (SlackOutbound) counts once Slack has answered
+                result.add_done_callback(lambda future: self._record_post(future.exception()))
+            else:
+                self._record_post(None)
+
+    def _record_post(self, error: Optional[BaseException]) -> None:
+        with self._condition:
+            if error is None:
+                self.dispatched += 1
+            else:
+                self.failed += 1
+        _count_reply("dispatched" if error is None else "failed")
+        if error is not None:
+            logger.error(f"Error posting scheduled reply: {error}")
+
+
+class AsyncReplyScheduler:
+    """asyncio counterpart of ReplyScheduler for an AsyncWebClient.
+
+    Each pending reply is a task sleeping on the event loop, so waiting costs
+    no thread at all. Replies are cancelled by the same rules.
+    """
+
+    def __init__(self, client, answers: Optional[ThreadAnswers] = None):
+        self.client = client
+        self.answers = answers if answers is not None else ThreadAnswers()
+
+        self._pending: Dict[Tuple[str, str], Tuple[asyncio.Task, PendingReply]] = {}
+
+        self.dispatched = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    def schedule(self, channel: str, thread_ts: str, text: str, delay: float, requester: Optional[str] = None,
+                 asked_ts: Optional[str] = None) -> None:
+        """Post text in the thread after delay seconds unless cancelled first (see ReplyScheduler.schedule)"""
+        key = (channel, thread_ts)
+        previous = self._pending.get(key)
+        if previous:
+            previous[0].cancel()
+
+        loop = asyncio.get_running_loop()
+        reply = PendingReply(channel, thread_ts, text, requester, loop.time() + delay, asked_ts)
+        self._pending[key] = (loop.create_task(self._post_later(reply, delay)), reply)
+        _set_pending(len(self._pending))
+
+    def cancel(self, channel: str, thread_ts: str, answered_by: Optional[str] = None,
+               reply_ts: Optional[str] = None, from_bot: bool = False) -> bool:
+        """Drop the pending reply for a thread; replies from the requester, from bots or from
+        before the help message don't count"""
+        if from_bot:
+            return False
+        if answered_by is not None:
+            self.answers.mark(channel, thread_ts, answered_by, reply_ts)
+
+        pending = self._pending.get((channel, thread_ts))
+        if pending is None or not answers_help_request(answered_by, reply_ts, pending[1].requester, pending[1].asked_at):
+            return False
+
+        del self._pending[(channel, thread_ts)]
+        pending[0].cancel()
+        self.cancelled += 1
+        _set_pending(len(self._pending))
+        _count_reply("cancelled")
+        logger.info(f"Dropped pending auto-reply in {channel} ({thread_ts}), thread already answered")
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "dispatched": self.dispatched,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+        }
+
+    async def _post_later(self, reply: PendingReply, delay: float) -> None:
+        set_handler("scheduled_reply")
+        await asyncio.sleep(delay)
+        key = (reply.channel, reply.thread_ts)
+        if self._pending.get(key, (None,))[0] is asyncio.current_task():
+            del self._pending[key]
+            _set_pending(len(self._pending))
+
+        if self.answers.answered_by_other(reply.channel, reply.thread_ts, reply.requester, reply.asked_at):
+            # Answered before the reply was scheduled
+            self.cancelled += 1
+            _count_reply("cancelled")
+            return
+
+        try:
+            await self.client.chat_postMessage(channel=reply.channel, text=reply.text, thread_ts=reply.thread_ts)
+            self.dispatched += 1
+            _count_reply("dispatched")
+        except Exception as e:
+            self.failed += 1
+            _count_reply("failed")
+            logger.error(f"Error posting scheduled reply: {e}")
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AIResponseCache:
+    """Two-level cache for AI answers: a bounded in-memory LRU with TTL in
+    front of a SQLite table that survives restarts.
+
+    Keys hash the normalized question together with the prompt and model
+    parameters, and every entry is tagged with the knowledge base version so
+    answers are dropped as soon as the knowledge base changes.
+    """
+
+    def __init__(self, path: str = "ai_response_cache.db", max_entries: int = 1000,
+                 ttl: float = 86400, kb_version: str = ""):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.kb_version = kb_version
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS ai_responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL, kb_version TEXT NOT NULL)"
+        )
+        self._connection.commit()
+        self._drop_stale_rows()
+
+    @staticmethod
+    def make_key(normalized_question: str, **params) -> str:
+        """Hash the normalized question with everything that shapes the answer"""
+        payload = json.dumps({"question": normalized_question, **params}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                response, created = cached
+                if now - created < self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return response
+                del self._memory[key]
+                self.evictions += 1
+
+            row = self._connection.execute(
+                "SELECT response, created FROM ai_responses WHERE key = ? AND kb_version = ? AND created > ?",
+                (key, self.kb_version, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, row[0], row[1])
+            return row[0]
+
+    def set(self, key: str, response: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+            try:
+                with self._connection:
+                    self._connection.execute(
+                        "INSERT OR REPLACE INTO ai_responses (key, response, created, kb_version) VALUES (?, ?, ?, ?)",
+                        (key, response, now, self.kb_version)
+                    )
+            except sqlite3.Error as e:
+                logger.error(f"Error saving AI response to cache: {e}")
+
+    def set_kb_version(self, kb_version: str) -> None:
+        """Invalidate every cached answer produced against another knowledge base"""
+        with self._lock:
+            if kb_version == self.kb_version:
+                return
+            self.kb_version = kb_version
+            self.evictions += len(self._memory)
+            self._memory.clear()
+        self._drop_stale_rows()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._memory),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def _remember(self, key: str, response: str, created: float) -> None:
+        self._memory[key] = (response, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _drop_stale_rows(self) -> None:
+        with self._lock:
+            with self._connection:
+                self._connection.execute(
+                    "DELETE FROM ai_responses WHERE kb_version != ? OR created <= ?",
+                    (self.kb_version, time.time() - self.ttl)
+                )
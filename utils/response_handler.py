@@ -1,11 +1,38 @@
 import logging
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Set
 from utils.helpers import calculate_similarity, clean_text
+from utils.fuzzy_index import FUZZY_SCORE_FACTOR, FuzzyIndex
+from utils.help_classifier import HelpRequestClassifier
+from utils.match_memo import MatchMemo
+from utils.metrics import timed
+from utils.retrieval import SparseRetrievalEngine, create_retrieval_engine
+from utils.semantic_index import SemanticIndex
+
+logger = logging.getLogger(__name__)
 
 class ResponseHandler:
-    def __init__(self, knowledge_base: Dict, confidence_threshold: float = 0.3):
+    def __init__(self, knowledge_base: Dict, confidence_threshold: float = 0.3, retrieval: Optional[str] = None,
+                 retrieval_engine: Optional[SparseRetrievalEngine] = None, match_memo: Optional[MatchMemo] = None,
+                 fuzzy_index: Optional[FuzzyIndex] = None, semantic_index: Optional[SemanticIndex] = None):
         self.knowledge_base = knowledge_base
         self.confidence_threshold = confidence_threshold
+        # Remembers the topic and score per normalized question until the knowledge base changes
+        self.match_memo = match_memo
+        # Second chance for questions with misspelled words, rebuilt on reload
+        self.fuzzy_index = fuzzy_index
+        # Last local stage: hashed n-gram vectors for questions worded unlike any keyword
+        self.semantic_index = semantic_index
+        
+        # Optional vectorized engine ("jaccard" or "tfidf"); None keeps the plain loop.
+        # A prebuilt engine (from a knowledge base snapshot) is used if it has the right scoring.
+        self.retrieval_engine = None
+        if retrieval_engine is not None and retrieval_engine.scoring == retrieval:
+            self.retrieval_engine = retrieval_engine
+        else:
+            try:
+                self.retrieval_engine = create_retrieval_engine(knowledge_base, retrieval)
+            except ImportError as e:
+                logger.warning(f"Retrieval engine disabled, using keyword loop: {e}")
         
         # Help keywords to detect help requests
         self.help_keywords = [
@@ -14,31 +41,83 @@ class ResponseHandler:
             "trouble with", "problem with", "issue with", "anyone know",
             "need help", "looking for", "where can i", "how can i"
         ]
+        
+        # Help phrases compiled into one pattern for the channel firehose
+        self.help_classifier = HelpRequestClassifier(self.help_keywords)
+    
+    def reload_knowledge_base(self, knowledge_base: Dict, changed: Optional[Set[str]] = None):
+        """Swap in a new knowledge base; only entries in `changed` are re-indexed"""
+        engine = self.retrieval_engine
+        if engine:
+            engine = SparseRetrievalEngine(knowledge_base, engine.scoring, previous=engine, changed=changed)
+        # Each lookup reads the engine (or the dict) once, so these assignments are atomic swaps
+        fuzzy_index = self.fuzzy_index and FuzzyIndex(knowledge_base, previous=self.fuzzy_index)
+        semantic_index = self.semantic_index and SemanticIndex(
+            knowledge_base, previous=self.semantic_index, changed=changed
+        )
+        self.retrieval_engine = engine
+        self.fuzzy_index = fuzzy_index
+        self.semantic_index = semantic_index
+        self.knowledge_base = knowledge_base
+        if self.match_memo:
+            self.match_memo.invalidate()
     
     def is_help_request(self, text: str) -> bool:
         """Check if message appears to be a help request"""
-        if not text:
-            return False
-            
-        clean_msg = clean_text(text)
-        
-        # Check for help keywords
-        if any(keyword in clean_msg for keyword in self.help_keywords):
-            return True
-        
-        # Check for question marks (but not in URLs)
-        if '?' in text and '://' not in text:
-            return True
-            
-        return False
+        return self.help_classifier.is_help_request(text)
     
     def find_best_match(self, question: str) -> Optional[Dict]:
         """Find the best matching answer from knowledge base"""
-        clean_question = clean_text(question)
+        with timed("clean_text"):
+            clean_question = clean_text(question)
+        
+        if self.match_memo:
+            return self.match_memo.lookup(clean_question, self.knowledge_base, self._find_best_match)
+        return self._find_best_match(clean_question)
+    
+    def _find_best_match(self, clean_question: str) -> Optional[Dict]:
+        match = self._exact_match(clean_question)
+        if match is None and self.fuzzy_index:
+            with timed("fuzzy_match"):
+                match = self._fuzzy_match(clean_question)
+        if match is None and self.semantic_index:
+            with timed("semantic_match"):
+                match = self._semantic_match(clean_question)
+        return match
+    
+    def _fuzzy_match(self, clean_question: str) -> Optional[Dict]:
+        """Match again with misspelled words corrected, at a discounted score"""
+        corrected, corrections = self.fuzzy_index.correct(clean_question)
+        if not corrections:
+            return None
+        match = self._exact_match(corrected)
+        if match is None or match["score"] * FUZZY_SCORE_FACTOR < self.confidence_threshold:
+            return None
+        return dict(match, score=match["score"] * FUZZY_SCORE_FACTOR)
+    
+    def _semantic_match(self, clean_question: str) -> Optional[Dict]:
+        """Closest entry by hashed n-gram vectors, if it clears the semantic threshold"""
+        index = self.semantic_index  # read once so a reload can't swap it mid-lookup
+        results = index.search(clean_question)
+        if not results:
+            return None
+        topic, score = results[0]
+        return {
+            "answer": index.knowledge_base[topic]["answer"],
+            "score": score,
+            "topic": topic
+        }
+    
+    def _exact_match(self, clean_question: str) -> Optional[Dict]:
+        if self.retrieval_engine:
+            matches = self._engine_matches(clean_question, top_k=1)
+            return matches[0] if matches else None
+        
         best_match = None
         best_score = 0.0
+        knowledge_base = self.knowledge_base
         
-        for key, data in self.knowledge_base.items():
+        for key, data in knowledge_base.items():
             # Check against the main question
             question_score = calculate_similarity(clean_question, data["question"])
             
@@ -58,4 +137,26 @@ class ResponseHandler:
                     "topic": key
                 }
         
-        return best_match
\ No newline at end of file
+        return best_match
+    
+    def find_top_matches(self, question: str, top_k: int = 3) -> List[Dict]:
+        """Return the top_k answers above the confidence threshold using the retrieval engine"""
+        if not self.retrieval_engine:
+            match = self.find_best_match(question)
+            return [match] if match else []
+        
+        return self._engine_matches(clean_text(question), top_k)
+    
+    def _engine_matches(self, clean_question: str, top_k: int) -> List[Dict]:
+        engine = self.retrieval_engine  # read once so a reload can't swap it mid-lookup
+        results = engine.search(
+            clean_question, top_k=top_k, threshold=self.confidence_threshold
+        )
+        return [
+            {
+                "answer": engine.knowledge_base[key]["answer"],
+                "score": score,
+                "topic": key
+            }
+            for key, score in results
+        ]
@@ -0,0 +1,185 @@
+import math
+from typing import Dict, List, Optional, Set, Tuple
+
+from utils.helpers import text_words
+
+# numpy is optional (ResponseHandler falls back to its loop) and slow to import,
+# so it is only imported once an engine is built
+np = None
+
+
+def _import_numpy() -> None:
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+
+
+SCORING_METHODS = ("jaccard", "tfidf")
+
+
+class SparseRetrievalEngine:
+    """Vectorized matcher over knowledge base questions and keywords.
+
+    Every entry contributes one row for its question and one row per keyword.
+    The rows are stored as a term -> row postings matrix (CSR layout), so a
+    question is scored against the whole knowledge base with a handful of
+    NumPy operations over just the rows that share a term with it.
+
+    "jaccard" reproduces utils.helpers.calculate_similarity exactly, taking the
+    best of the question and keyword rows like ResponseHandler does. "tfidf"
+    uses idf-weighted cosine similarity instead, which is also in [0, 1] so
+    the same confidence threshold applies.
+    """
+
+    def __init__(self, knowledge_base: Dict, scoring: str = "jaccard",
+                 previous: Optional["SparseRetrievalEngine"] = None, changed: Optional[Set[str]] = None):
+        try:
+            _import_numpy()
+        except ImportError:
+            raise ImportError("numpy is required for the sparse retrieval engine") from None
+        if scoring not in SCORING_METHODS:
+            raise ValueError(f"Unknown scoring method: {scoring}")
+
+        self.knowledge_base = knowledge_base
+        self.scoring = scoring
+        self.topics: List[str] = list(knowledge_base.keys())
+
+        # Term ids only ever grow, so rows tokenized for an earlier version stay valid.
+        # On reload only entries in `changed` (or new ones) are tokenized again.
+        self.vocabulary: Dict[str, int] = dict(previous.vocabulary) if previous else {}
+        self._entry_rows: Optional[Dict[str, List[List[int]]]] = {}
+
+        for key in self.topics:
+            rows = None
+            if previous is not None and changed is not None and key not in changed:
+                rows = previous.entry_rows().get(key)
+            if rows is None:
+                data = knowledge_base[key]
+                rows = [self._tokenize(text) for text in [data["question"]] + list(data.get("keywords", []))]
+            self._entry_rows[key] = rows
+
+        self._link()
+
+    def __getstate__(self) -> Dict:
+        # Per-entry rows are only needed on a reload, so a snapshot keeps them as flat arrays
+        entry_rows = self.entry_rows()
+        rows = [terms for key in self.topics for terms in entry_rows[key]]
+        state = dict(self.__dict__, _entry_rows=None)
+        state["_packed_rows"] = (
+            np.fromiter((len(entry_rows[key]) for key in self.topics), dtype=np.int32, count=len(self.topics)),
+            np.fromiter((len(terms) for terms in rows), dtype=np.int32, count=len(rows)),
+            np.fromiter((term for terms in rows for term in terms), dtype=np.int64),
+        )
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        # Unpickled from a knowledge base snapshot: __init__ (and its numpy import) is skipped
+        _import_numpy()
+        self.__dict__.update(state)
+
+    def entry_rows(self) -> Dict[str, List[List[int]]]:
+        """Term ids of each entry's question and keyword rows, by topic"""
+        if self._entry_rows is None:
+            rows_per_entry, row_lengths, flat_terms = self._packed_rows
+            flat_terms = flat_terms.tolist()
+            row_ends = np.cumsum(row_lengths).tolist()
+            entry_ends = np.cumsum(rows_per_entry).tolist()
+            rows = [flat_terms[end - length:end] for end, length in zip(row_ends, row_lengths.tolist())]
+            self._entry_rows = {
+                key: rows[end - count:end] for key, end, count in zip(self.topics, entry_ends, rows_per_entry.tolist())
+            }
+        return self._entry_rows
+
+    def _tokenize(self, text: str) -> List[int]:
+        vocabulary = self.vocabulary
+        return [vocabulary.setdefault(word, len(vocabulary)) for word in text_words(text)]
+
+    def _link(self) -> None:
+        """Build the postings matrix and weights from the per-entry rows"""
+        row_terms = [terms for key in self.topics for terms in self._entry_rows[key]]
+        row_lengths = np.fromiter((len(terms) for terms in row_terms), dtype=np.int64, count=len(row_terms))
+        flat_terms = np.fromiter(
+            (term for terms in row_terms for term in terms), dtype=np.int64, count=int(row_lengths.sum())
+        )
+        row_ids = np.repeat(np.arange(len(row_terms), dtype=np.int32), row_lengths)
+
+        # Group postings by term (stable, so rows stay ascending within a term)
+        order = np.argsort(flat_terms, kind="stable")
+        self.term_postings = row_ids[order]
+        self.term_indptr = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        self.term_indptr[1:] = np.cumsum(np.bincount(flat_terms, minlength=len(self.vocabulary)))
+
+        self.row_entry = np.repeat(
+            np.arange(len(self.topics), dtype=np.int32),
+            [len(self._entry_rows[key]) for key in self.topics]
+        )
+        self.row_sizes = row_lengths.astype(np.float64)
+
+        # idf weights and row norms are only needed for tf-idf scoring
+        row_count = max(len(row_terms), 1)
+        document_frequency = np.diff(self.term_indptr).astype(np.float64)
+        self.idf = np.log((1 + row_count) / (1 + document_frequency)) + 1.0
+        squared = self.idf ** 2
+        self.row_norms = np.sqrt(np.bincount(row_ids, weights=squared[flat_terms], minlength=len(row_terms)))
+
+    def _query_terms(self, question: str) -> Tuple[List[int], int]:
+        words = text_words(question)
+        return [self.vocabulary[w] for w in words if w in self.vocabulary], len(words)
+
+    def score_entries(self, question: str) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Return (entry indices, scores) for every entry sharing a term with question"""
+        term_ids, query_size = self._query_terms(question)
+        empty = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64))
+        if not term_ids:
+            return empty
+
+        term_ids = np.asarray(term_ids)
+        starts = self.term_indptr[term_ids]
+        ends = self.term_indptr[term_ids + 1]
+        # Terms left over from entries removed by a reload have no postings; drop them
+        # so they don't count towards the tf-idf query norm either
+        live = ends > starts
+        if not live.any():
+            return empty
+        term_ids, starts, ends = term_ids[live], starts[live], ends[live]
+        postings = np.concatenate([self.term_postings[s:e] for s, e in zip(starts, ends)])
+
+        if self.scoring == "jaccard":
+            rows, overlap = np.unique(postings, return_counts=True)
+            overlap = overlap.astype(np.float64)
+            scores = overlap / (self.row_sizes[rows] + query_size - overlap)
+        else:
+            weights = np.repeat(self.idf[term_ids] ** 2, ends - starts)
+            rows, inverse = np.unique(postings, return_inverse=True)
+            dot = np.bincount(inverse, weights=weights)
+            query_norm = math.sqrt(float(np.sum(self.idf[term_ids] ** 2)))
+            scores = dot / (self.row_norms[rows] * query_norm)
+
+        # Rows of one entry are contiguous, so a per-entry max is a reduceat
+        entries = self.row_entry[rows]
+        boundaries = np.flatnonzero(np.r_[True, entries[1:] != entries[:-1]])
+        return entries[boundaries], np.maximum.reduceat(scores, boundaries)
+
+    def search(self, question: str, top_k: int = 1, threshold: float = 0.0) -> List[Tuple[str, float]]:
+        """Return up to top_k (topic, score) pairs scoring at least threshold, best first"""
+        entries, scores = self.score_entries(question)
+        keep = (scores >= threshold) & (scores > 0)
+        entries, scores = entries[keep], scores[keep]
+        if not len(scores):
+            return []
+
+        if top_k == 1:
+            # argmax keeps the first entry on ties, like the original loop
+            best = int(np.argmax(scores))
+            return [(self.topics[entries[best]], float(scores[best]))]
+
+        order = np.lexsort((entries, -scores))[:top_k]
+        return [(self.topics[entries[i]], float(scores[i])) for i in order]
+
+
+def create_retrieval_engine(knowledge_base: Dict, scoring: Optional[str]) -> Optional[SparseRetrievalEngine]:
+    """Build the engine named by scoring, or None when it is disabled"""
+    if not scoring:
+        return None
+    return SparseRetrievalEngine(knowledge_base, scoring)
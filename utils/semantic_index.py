@@ -0,0 +1,153 @@
+import logging
+import zlib
+from typing import Dict, List, Optional, Set, Tuple
+
+from utils.helpers import clean_text
+
+logger = logging.getLogger(__name__)
+
+# numpy is optional and slow to import, as in utils.retrieval
+np = None
+
+
+def _import_numpy() -> None:
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+
+
+DIMENSIONS = 512
+NGRAM_SIZES = (3, 4)
+# Answers describe the topic too, but less precisely than its question and keywords
+ANSWER_WEIGHT = 0.3
+# Cosine similarity a semantic match needs
+SEMANTIC_THRESHOLD = 0.3
+# With many entries some unrelated one always scores well by chance, so the best score must
+# also stand this many standard deviations above the question's mean score
+SEMANTIC_MIN_ZSCORE = 5.5
+ZSCORE_MIN_ENTRIES = 1000
+# Words every entry and every question share; they would only add noise
+STOP_WORDS = frozenset(
+    "a an and are at be can could do does for from how i in is it me my of on or our please the to "
+    "we what when where who why with you your".split()
+)
+
+
+def _features(text: str) -> List[int]:
+    """Hashed character n-grams of the words in text (each word padded with spaces)"""
+    features = []
+    for word in text.split():
+        if word in STOP_WORDS:
+            continue
+        encoded = f" {word} ".encode("utf-8")
+        for size in NGRAM_SIZES:
+            for i in range(len(encoded) - size + 1):
+                features.append(zlib.crc32(encoded[i:i + size]))
+    return features
+
+
+def _add(vector, text: str, weight: float) -> None:
+    for feature in _features(text):
+        # The top bit picks the sign so colliding n-grams tend to cancel out
+        vector[feature % DIMENSIONS] += -weight if feature & 0x80000000 else weight
+
+
+def embed(text: str):
+    """Unit-length float32 vector of a question (already cleaned)"""
+    _import_numpy()
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    _add(vector, text, 1.0)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+def embed_entry(data: Dict):
+    """Unit-length vector of a knowledge base entry: its question, keywords and (lightly) its answer"""
+    _import_numpy()
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for text in [data["question"], *data.get("keywords", [])]:
+        _add(vector, clean_text(text), 1.0)
+    _add(vector, clean_text(data.get("answer", "")), ANSWER_WEIGHT)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class SemanticIndex:
+    """Hashed character n-gram vectors of every knowledge base entry, searched by dot product.
+
+    Nothing leaves the process: each entry is embedded locally into a
+    DIMENSIONS-wide float32 row and a question is scored against all rows
+    with one matrix-vector product. The n-grams catch different word forms
+    and partial overlaps ("reimbursed" -> reimbursement, "networking" ->
+    network) that exact keyword matching misses; they do not know synonyms.
+
+    The matrix pickles out of band, so from a knowledge base snapshot it is
+    a read-only memory map shared with the page cache rather than a copy.
+    Passing the previous index on a reload re-embeds only `changed` entries.
+    """
+
+    def __init__(self, knowledge_base: Dict, previous: Optional["SemanticIndex"] = None,
+                 changed: Optional[Set[str]] = None):
+        try:
+            _import_numpy()
+        except ImportError:
+            raise ImportError("numpy is required for the semantic index") from None
+
+        self.knowledge_base = knowledge_base
+        self.topics: List[str] = list(knowledge_base.keys())
+        self.matrix = np.empty((len(self.topics), DIMENSIONS), dtype=np.float32)
+
+        reusable = {}
+        if previous is not None and changed is not None:
+            reusable = {topic: row for row, topic in enumerate(previous.topics) if topic not in changed}
+        for row, topic in enumerate(self.topics):
+            previous_row = reusable.get(topic)
+            if previous_row is not None:
+                self.matrix[row] = previous.matrix[previous_row]
+            else:
+                self.matrix[row] = embed_entry(knowledge_base[topic])
+
+    def __setstate__(self, state: Dict) -> None:
+        # Unpickled from a knowledge base snapshot: __init__ (and its numpy import) is skipped
+        _import_numpy()
+        self.__dict__.update(state)
+
+    def search(self, question: str, top_k: int = 1, threshold: float = SEMANTIC_THRESHOLD) -> List[Tuple[str, float]]:
+        """Up to top_k (topic, cosine similarity) pairs clearing threshold (and the noise floor), best first"""
+        return self.search_batch([question], top_k, threshold)[0]
+
+    def search_batch(self, questions: List[str], top_k: int = 1,
+                     threshold: float = SEMANTIC_THRESHOLD) -> List[List[Tuple[str, float]]]:
+        """search() for many questions with one matrix product"""
+        if not len(self.topics):
+            return [[] for _ in questions]
+        queries = np.stack([embed(question) for question in questions])
+        scores = queries @ self.matrix.T
+
+        if len(self.topics) >= ZSCORE_MIN_ENTRIES:
+            floors = scores.mean(axis=1) + SEMANTIC_MIN_ZSCORE * scores.std(axis=1)
+        else:
+            floors = np.zeros(len(questions), dtype=np.float32)
+
+        results = []
+        for row, floor in zip(scores, np.maximum(floors, threshold).tolist()):
+            if top_k == 1:
+                best = [int(np.argmax(row))]
+            else:
+                k = min(top_k, len(row))
+                candidates = np.argpartition(-row, k - 1)[:k]
+                best = candidates[np.argsort(-row[candidates], kind="stable")].tolist()
+            results.append([(self.topics[i], float(row[i])) for i in best if row[i] >= floor])
+        return results
+
+
+def create_semantic_index(knowledge_base: Dict, enabled: bool = True) -> Optional[SemanticIndex]:
+    """A SemanticIndex, or None when disabled or numpy is missing"""
+    if not enabled:
+        return None
+    try:
+        return SemanticIndex(knowledge_base)
+    except ImportError as e:
+        logger.warning(f"Semantic matching disabled: {e}")
+        return None
@@ -0,0 +1,448 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Deque, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.metrics import REGISTRY, current_handler, observe_stage
+
+logger = logging.getLogger(__name__)
+
+SLACK_CALLS = REGISTRY.counter(
+    "helpbot_slack_calls_total",
+    "Slack Web API calls from the outbound queue, by method and outcome (sent, merged, retried, rate_limited or failed)",
+    ("method", "outcome")
+)
+
+# (requests per second, burst) per Web API method. chat.postMessage is limited per
+# channel (about 1/s) plus a workspace-wide cap; the others follow their Slack tier.
+METHOD_RATE_LIMITS = {
+    "chat.postMessage": (5.0, 20),
+    "chat.update": (50 / 60, 5),    # Tier 3
+    "views.publish": (100 / 60, 10),  # Tier 4
+}
+DEFAULT_METHOD_RATE_LIMIT = (20 / 60, 3)  # Tier 2
+
+# Slack truncates very long messages; merged replies stay under this
+MAX_MERGED_LENGTH = 3500
+
+
+class SlackOutboundError(Exception):
+    """A Slack API call failed for good (after retries, or with a non-retryable error)"""
+
+
+def _copy_outcome(source: Future, target: Future) -> None:
+    error = source.exception()
+    if error is not None:
+        target.set_exception(error)
+    else:
+        target.set_result(source.result())
+
+
+def log_failure(future: Future, description: str) -> None:
+    """Log `description` if the call behind a fire-and-forget future fails for good"""
+    def check(done: Future) -> None:
+        error = done.exception()
+        if error is not None:
+            logger.error(f"{description} was not delivered: {error}")
+    future.add_done_callback(check)
+
+
+class TokenBucket:
+    """rate tokens per second, holding at most burst"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available (0 means one is available now)"""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def block(self, until: float) -> None:
+        """Hold off entirely until `until` (a Retry-After from Slack)"""
+        self.blocked_until = max(self.blocked_until, until)
+        self.tokens = 0.0
+
+
+class OutboundMessage:
+    __slots__ = ("method", "channel", "payload", "futures", "handler", "enqueued", "attempts", "not_before")
+
+    def __init__(self, method: str, channel: str, payload: Dict, handler: str):
+        self.method = method
+        self.channel = channel
+        self.payload = payload
+        self.futures: List[Future] = [Future()]
+        self.handler = handler
+        self.enqueued = time.monotonic()
+        self.attempts = 0
+        self.not_before = 0.0
+
+
+class SlackOutbound:
+    """Shared outbound queue for Slack Web API calls.
+
+    Calls are queued per channel and sent by a few worker threads over one
+    pooled requests.Session. A channel has at most one call in flight (so
+    its messages stay in order) and each call waits for a token from both
+    its channel's bucket and its method's bucket.
+
+    A 429 holds the channel back for Retry-After seconds and the call is
+    retried; 5xx and connection errors are retried with
+    exponential backoff. When more than merge_backlog calls are waiting,
+    replies queued for the same thread are merged into one message.
+
+    chat_postMessage() has the WebClient signature, so this can stand in
+    for app.client wherever only posting is needed (e.g. ReplyScheduler).
+    """
+
+    def __init__(self, token: str, base_url: str = "https://slack.com/api/", workers: int = 4,
+                 channel_rate: float = 1.0, channel_burst: int = 3, merge_backlog: int = 20,
+                 max_retries: int = 4, timeout: float = 10.0):
+        self.token = token
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.channel_rate = channel_rate
+        self.channel_burst = channel_burst
+        self.merge_backlog = merge_backlog
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {token}"
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._queues: Dict[str, Deque[OutboundMessage]] = {}
+        self._channel_buckets: Dict[str, TokenBucket] = {}
+        self._method_buckets: Dict[str, TokenBucket] = {}
+        self._in_flight = set()
+        self._backlog = 0
+        self._condition = threading.Condition()
+        self._closed = False
+
+        self.sent = 0
+        self.merged = 0
+        self.retried = 0
+        self.rate_limited = 0
+        self.failed = 0
+
+        self._threads = [
+            threading.Thread(target=self._run, name=f"slack-outbound-{i}", daemon=True) for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def call(self, method: str, channel: str, **payload) -> Future:
+        """Queue a Web API call; the future resolves to Slack's response body"""
+        message = OutboundMessage(method, channel, dict(payload, channel=channel), current_handler())
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("SlackOutbound is closed")
+            self._queues.setdefault(channel, deque()).append(message)
+            self._backlog += 1
+            self._condition.notify()
+        return message.futures[0]
+
+    def post_message(self, channel: str, text: str, thread_ts: Optional[str] = None, **kwargs) -> Future:
+        """Queue a chat.postMessage"""
+        if thread_ts:
+            kwargs["thread_ts"] = thread_ts
+        return self.call("chat.postMessage", channel, text=text, **kwargs)
+
+    chat_postMessage = post_message
+
+    def can_send_now(self, method: str, channel: str, reserve: int = 0) -> bool:
+        """Whether a call queued now would go out without waiting, leaving reserve more method calls' worth"""
+        with self._condition:
+            if channel in self._queues or channel in self._in_flight:
+                return False
+            now = time.monotonic()
+            channel_bucket = self._bucket(self._channel_buckets, channel, self.channel_rate, self.channel_burst)
+            method_bucket = self._method_bucket(method)
+            return (channel_bucket.wait_time(now) <= 0 and method_bucket.wait_time(now) <= 0
+                    and method_bucket.tokens >= 1 + reserve)
+
+    def _bucket(self, buckets: Dict[str, TokenBucket], key: str, rate: float, burst: float) -> TokenBucket:
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(rate, burst)
+        return bucket
+
+    def _method_bucket(self, method: str) -> TokenBucket:
+        rate, burst = METHOD_RATE_LIMITS.get(method, DEFAULT_METHOD_RATE_LIMIT)
+        return self._bucket(self._method_buckets, method, rate, burst)
+
+    def _next_message(self) -> Optional[OutboundMessage]:
+        """Take the next sendable message, waiting as long as needed; None once closed and drained"""
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                wait = None
+                for channel, queue in self._queues.items():
+                    if channel in self._in_flight:
+                        continue
+                    message = queue[0]
+                    channel_bucket = self._bucket(self._channel_buckets, channel, self.channel_rate, self.channel_burst)
+                    method_bucket = self._method_bucket(message.method)
+                    delay = max(message.not_before - now, channel_bucket.wait_time(now), method_bucket.wait_time(now))
+                    if delay <= 0:
+                        channel_bucket.take()
+                        method_bucket.take()
+                        queue.popleft()
+                        self._backlog -= 1
+                        if self._backlog >= self.merge_backlog:
+                            self._merge_thread_replies(message, queue)
+                        if not queue:
+                            del self._queues[channel]
+                        self._in_flight.add(channel)
+                        return message
+                    wait = delay if wait is None else min(wait, delay)
+
+                if self._closed and not self._queues and not self._in_flight:
+                    return None
+                self._condition.wait(wait)
+
+    def _merge_thread_replies(self, message: OutboundMessage, queue: Deque[OutboundMessage]) -> None:
+        """Fold later replies to the same thread into message (the queue is backed up)"""
+        thread_ts = message.payload.get("thread_ts")
+        if message.method != "chat.postMessage" or not thread_ts:
+            return
+
+        texts = [message.payload["text"]]
+        length = len(texts[0])
+        kept = deque()
+        for other in queue:
+            if (other.method == "chat.postMessage" and other.payload.get("thread_ts") == thread_ts
+                    and set(other.payload) == {"channel", "text", "thread_ts"}
+                    and length + len(other.payload["text"]) < MAX_MERGED_LENGTH):
+                texts.append(other.payload["text"])
+                length += len(other.payload["text"])
+                message.futures.extend(other.futures)
+                self._backlog -= 1
+                self._count(message.method, "merged")
+            else:
+                kept.append(other)
+
+        if len(texts) > 1:
+            message.payload = dict(message.payload, text="\n\n".join(texts))
+            queue.clear()
+            queue.extend(kept)
+
+    def _run(self) -> None:
+        while True:
+            message = self._next_message()
+            if message is None:
+                return
+
+            retry_at = None
+            try:
+                retry_at = self._send(message)
+            except Exception as e:
+                # Anything _send didn't expect fails this message only; the worker keeps going
+                logger.exception(f"Unexpected error sending Slack {message.method} to {message.channel}")
+                self._fail(message, f"{type(e).__name__}: {e}")
+            finally:
+                with self._condition:
+                    self._in_flight.discard(message.channel)
+                    if retry_at is not None:
+                        # Back to the front of its channel so ordering is kept
+                        message.not_before = retry_at
+                        self._queues.setdefault(message.channel, deque()).appendleft(message)
+                        self._backlog += 1
+                    self._condition.notify_all()
+
+    def _send(self, message: OutboundMessage) -> Optional[float]:
+        """Make the call; returns when to retry, or None once the futures are resolved"""
+        message.attempts += 1
+        start = time.perf_counter()
+        try:
+            response = self.session.post(self.base_url + message.method, json=message.payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            return self._retry_or_fail(message, f"{type(e).__name__}: {e}")
+        finally:
+            observe_stage("slack_post", time.perf_counter() - start, handler=message.handler)
+
+        if response.status_code == 429:
+            retry_after = float(response.headers.get("Retry-After", 1))
+            self._count(message.method, "rate_limited")
+            with self._condition:
+                until = time.monotonic() + retry_after
+                self._bucket(self._channel_buckets, message.channel, self.channel_rate, self.channel_burst).block(until)
+            logger.warning(f"Slack rate limited {message.method} in {message.channel}, retrying in {retry_after}s")
+            return self._retry_or_fail(message, "ratelimited", delay=retry_after)
+        if response.status_code >= 500:
+            return self._retry_or_fail(message, f"HTTP {response.status_code}")
+
+        try:
+            body = response.json()
+        except ValueError:
+            body = {"ok": False, "error": f"HTTP {response.status_code}"}
+        if body.get("ok"):
+            self._count(message.method, "sent")
+            for future in message.futures:
+                future.set_result(body)
+        else:
+            self._fail(message, body.get("error", "unknown_error"))
+        return None
+
+    def _retry_or_fail(self, message: OutboundMessage, reason: str, delay: Optional[float] = None) -> Optional[float]:
+        if message.attempts > self.max_retries:
+            self._fail(message, reason)
+            return None
+        self._count(message.method, "retried")
+        if delay is None:
+            delay = min(30.0, 0.5 * 2 ** (message.attempts - 1)) * random.uniform(0.5, 1.0)
+        return time.monotonic() + delay
+
+    def _fail(self, message: OutboundMessage, reason: str) -> None:
+        self._count(message.method, "failed")
+        logger.error(f"Slack {message.method} to {message.channel} failed after {message.attempts} attempt(s): {reason}")
+        for future in message.futures:
+            if not future.done():
+                future.set_exception(SlackOutboundError(reason))
+
+    def _count(self, method: str, outcome: str) -> None:
+        """Bump one of the sent, merged, retried, rate_limited or failed counters"""
+        with self._condition:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+        if REGISTRY.enabled:
+            SLACK_CALLS.labels(method, outcome).inc()
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {
+                "queued": self._backlog,
+                "in_flight": len(self._in_flight),
+                "sent": self.sent,
+                "merged": self.merged,
+                "retried": self.retried,
+                "rate_limited": self.rate_limited,
+                "failed": self.failed,
+            }
+
+    def close(self) -> None:
+        """Send everything still queued, then stop the workers"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self.session.close()
+
+
+class StreamingReply:
+    """One reply that grows while its answer is generated.
+
+    The first update() posts a placeholder; later ones edit it with
+    chat.update, no more than one per interval seconds and only when the
+    edit can go out at once, still leaving budget for another reply to
+    finish: chat.update has a small workspace-wide limit, and an edit
+    waiting behind other replies' edits would show stale text late.
+    Updates are dropped rather than queued, so the latest text wins.
+    finish() replaces it all with the final text; it waits at most
+    finish_timeout seconds for the placeholder to be posted, and edits it
+    later (from the outbound worker) if it still hasn't been.
+
+    A streamed reply costs at least two edits. When that budget isn't
+    there the reply doesn't start (started stays False) and the answer
+    should be posted whole instead.
+    """
+
+    def __init__(self, outbound: SlackOutbound, channel: str, prefix: str = "",
+                 placeholder: str = "_Thinking…_", interval: float = 1.0, thread_ts: Optional[str] = None,
+                 finish_timeout: float = 10.0):
+        self.outbound = outbound
+        self.channel = channel
+        self.prefix = prefix
+        self.placeholder = placeholder
+        self.interval = interval
+        self.thread_ts = thread_ts
+        self.finish_timeout = finish_timeout
+        self.updates = 0
+        self._posted: Optional[Future] = None
+        self._declined = False
+        self._last_update = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def started(self) -> bool:
+        return self._posted is not None
+
+    def update(self, text: str) -> None:
+        """Show text (the answer so far) if the throttle allows; never blocks"""
+        with self._lock:
+            if self._declined:
+                return
+            if self._posted is None:
+                if not self.outbound.can_send_now("chat.update", self.channel, reserve=1):
+                    self._declined = True
+                    return
+                self._posted = self.outbound.post_message(
+                    self.channel, self.prefix + (f"{text} …" if text else self.placeholder), self.thread_ts
+                )
+                return
+            if not text or not self._posted.done() or self._posted.exception() is not None:
+                return
+            now = time.monotonic()
+            if now - self._last_update < self.interval:
+                return
+            if not self.outbound.can_send_now("chat.update", self.channel, reserve=1):
+                return
+            self._last_update = now
+            self.updates += 1
+            self.outbound.call(
+                "chat.update", self.channel, ts=self._posted.result()["ts"], text=f"{self.prefix}{text} …"
+            )
+
+    def finish(self, text: str) -> Future:
+        """Replace the reply with text (or post it, if the placeholder never made it)"""
+        with self._lock:
+            posted = self._posted
+        if posted is None:
+            return self.outbound.post_message(self.channel, text, self.thread_ts)
+
+        try:
+            posted.exception(self.finish_timeout)
+        except FutureTimeoutError:
+            # Still queued (e.g. rate limited): edit it once it lands rather than hold the listener thread
+            logger.warning(f"Streamed reply placeholder in {self.channel} not posted after {self.finish_timeout}s")
+            finished = Future()
+            posted.add_done_callback(
+                lambda _: self._replace(posted, text).add_done_callback(lambda done: _copy_outcome(done, finished))
+            )
+            return finished
+        return self._replace(posted, text)
+
+    def _replace(self, posted: Future, text: str) -> Future:
+        """Edit the posted placeholder to text, or post text if the placeholder failed"""
+        if posted.exception() is None:
+            # Edits to a channel go out in order, so this lands after any update still queued
+            return self.outbound.call("chat.update", self.channel, ts=posted.result()["ts"], text=text)
+        return self.outbound.post_message(self.channel, text, self.thread_ts)
+
+
+class AsyncSlackOutbound:
+    """Awaitable chat_postMessage on top of a SlackOutbound (for AsyncReplyScheduler)"""
+
+    def __init__(self, outbound: SlackOutbound):
+        self.outbound = outbound
+
+    async def chat_postMessage(self, channel: str, text: str, thread_ts: Optional[str] = None, **kwargs) -> Dict:
+        return await asyncio.wrap_future(self.outbound.chat_postMessage(channel, text, thread_ts, **kwargs))
@@ -0,0 +1,220 @@
+import contextvars
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Executor, Future
+from typing import Callable, Dict, List, Optional
+
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first
+EXPLICIT = 0  # someone asked the bot: mentions, /ask, /history
+NORMAL = 1    # everything else, including thread replies that cancel pending auto-replies
+PASSIVE = 2   # channel messages screened for help requests nobody addressed to the bot
+PRIORITY_NAMES = {EXPLICIT: "explicit", NORMAL: "normal", PASSIVE: "passive"}
+
+EXPLICIT_COMMANDS = ("/ask", "/history")
+# Weight of the newest queue wait in the smoothed wait admission control looks at
+WAIT_SMOOTHING = 0.2
+
+QUEUE_DEPTH = REGISTRY.gauge(
+    "helpbot_work_queue_depth", "Listener calls waiting for a worker thread, by priority", ("priority",)
+)
+QUEUE_WAIT = REGISTRY.histogram(
+    "helpbot_work_queue_wait_seconds", "Time listener calls waited for a worker thread, by priority", ("priority",)
+)
+SHED = REGISTRY.counter(
+    "helpbot_work_shed_total", "Listener calls turned down under load, by priority and reason (depth, wait, expired)",
+    ("priority", "reason")
+)
+
+# Priority of the request being dispatched in this thread, set by the Bolt middleware
+_request_priority: contextvars.ContextVar = contextvars.ContextVar("request_priority", default=NORMAL)
+
+
+def request_priority(body: Dict) -> int:
+    """Priority of a Slack payload (event callback or slash command body)"""
+    command = body.get("command")
+    if command:
+        return EXPLICIT if command in EXPLICIT_COMMANDS else NORMAL
+
+    event = body.get("event") or {}
+    if event.get("type") == "app_mention":
+        return EXPLICIT
+    if event.get("type") == "message":
+        # A reply in someone else's thread may cancel an auto-reply; that stays cheap and timely
+        if event.get("thread_ts") and event.get("thread_ts") != event.get("ts"):
+            return NORMAL
+        return PASSIVE
+    return NORMAL
+
+
+def set_request_priority(priority: int) -> None:
+    """Priority for the listener calls submitted from this thread from now on"""
+    _request_priority.set(priority)
+
+
+class _WorkItem:
+    __slots__ = ("future", "fn", "args", "kwargs", "priority", "enqueued")
+
+    def __init__(self, future: Future, fn: Callable, args, kwargs, priority: int):
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.enqueued = time.monotonic()
+
+
+class PriorityExecutor(Executor):
+    """Listener pool for Bolt that runs explicit requests before passive ones.
+
+    Pass it as App(listener_executor=...) and add prioritize_requests() as
+    global middleware: the middleware records the priority of each request
+    in the dispatching thread, and submit() queues the listener calls Bolt
+    makes right after by that priority (FIFO within one priority).
+
+    Admission control only ever turns down PASSIVE work. A passive call is
+    refused while shed_depth calls are already queued or the smoothed wait
+    for a worker is above max_wait, and one that still waited longer than
+    max_wait when a worker picks it up is dropped: an auto-reply that late
+    has lost its point. Refused calls get a cancelled future. Explicit and
+    normal calls are always queued, and passive calls never occupy the last
+    worker thread, so an explicit request doesn't wait for a busy pool.
+    """
+
+    def __init__(self, workers: int = 5, shed_depth: int = 100, max_wait: float = 5.0):
+        self.workers = workers
+        self.shed_depth = shed_depth
+        self.max_wait = max_wait
+        self.passive_limit = max(1, workers - 1)
+
+        self._heap: List = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._shutdown = False
+        self._running_passive = 0
+        self.smoothed_wait = 0.0
+
+        self.queued = {priority: 0 for priority in PRIORITY_NAMES}
+        self.completed = {priority: 0 for priority in PRIORITY_NAMES}
+        self.shed = {}
+
+        self._threads = [
+            threading.Thread(target=self._run, name=f"listener-{i}", daemon=True) for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        return self.submit_with_priority(_request_priority.get(), fn, *args, **kwargs)
+
+    def submit_with_priority(self, priority: int, fn: Callable, *args, **kwargs) -> Future:
+        future = Future()
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new work after shutdown")
+            reason = self._refusal(priority)
+            if reason is None:
+                heapq.heappush(self._heap, (priority, next(self._sequence), _WorkItem(future, fn, args, kwargs, priority)))
+                self.queued[priority] += 1
+                self._condition.notify()
+        if reason is not None:
+            self._record_shed(priority, reason)
+            future.cancel()
+            return future
+        if REGISTRY.enabled:
+            QUEUE_DEPTH.labels(PRIORITY_NAMES[priority]).inc()
+        return future
+
+    def _refusal(self, priority: int) -> Optional[str]:
+        if priority != PASSIVE:
+            return None
+        if len(self._heap) >= self.shed_depth:
+            return "depth"
+        # With nothing queued there is no backlog, however long the last calls waited
+        if self._heap and self.smoothed_wait > self.max_wait:
+            return "wait"
+        return None
+
+    def _record_shed(self, priority: int, reason: str) -> None:
+        key = (PRIORITY_NAMES[priority], reason)
+        with self._condition:
+            self.shed[key] = self.shed.get(key, 0) + 1
+        if REGISTRY.enabled:
+            SHED.labels(*key).inc()
+
+    def _next_item(self) -> Optional[_WorkItem]:
+        """Highest priority queued call, or None once shut down and drained"""
+        with self._condition:
+            # The heap top is passive only when everything queued is
+            while not self._heap or (self._heap[0][0] == PASSIVE and self._running_passive >= self.passive_limit):
+                if self._shutdown and not self._heap:
+                    return None
+                self._condition.wait()
+            _, _, item = heapq.heappop(self._heap)
+            if item.priority == PASSIVE:
+                self._running_passive += 1
+            self.queued[item.priority] -= 1
+            waited = time.monotonic() - item.enqueued
+            self.smoothed_wait += WAIT_SMOOTHING * (waited - self.smoothed_wait)
+        if REGISTRY.enabled:
+            name = PRIORITY_NAMES[item.priority]
+            QUEUE_DEPTH.labels(name).dec()
+            QUEUE_WAIT.labels(name).observe(waited)
+        if item.priority == PASSIVE and waited > self.max_wait:
+            self._record_shed(item.priority, "expired")
+            item.future.cancel()
+        return item
+
+    def _run(self) -> None:
+        while True:
+            item = self._next_item()
+            if item is None:
+                return
+            if item.future.set_running_or_notify_cancel():
+                try:
+                    result = item.fn(*item.args, **item.kwargs)
+                except BaseException as e:
+                    item.future.set_exception(e)
+                else:
+                    item.future.set_result(result)
+            with self._condition:
+                if not item.future.cancelled():
+                    self.completed[item.priority] += 1
+                if item.priority == PASSIVE:
+                    self._running_passive -= 1
+                    self._condition.notify()
+            item = None  # don't keep the last call's arguments alive while idle
+
+    def stats(self) -> Dict:
+        with self._condition:
+            return {
+                "queued": {PRIORITY_NAMES[priority]: count for priority, count in self.queued.items()},
+                "completed": {PRIORITY_NAMES[priority]: count for priority, count in self.completed.items()},
+                "shed": {f"{priority}/{reason}": count for (priority, reason), count in sorted(self.shed.items())},
+                "smoothed_wait": self.smoothed_wait,
+            }
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._condition:
+            self._shutdown = True
+            if cancel_futures:
+                for _, _, item in self._heap:
+                    item.future.cancel()
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+def prioritize_requests(body: Dict, next: Callable) -> None:
+    """Bolt global middleware: tag this request's listener calls with request_priority(body)"""
+    # Bolt submits the listeners after every global middleware has returned, in this
+    # same thread, so the priority is set here and not reset
+    set_request_priority(request_priority(body))
+    next()